@@ -0,0 +1,28 @@
+from django.core.management import BaseCommand
+
+from tapir.accounts.models import TapirUser
+
+
+class Command(BaseCommand):
+    help = (
+        "Checks that the keycloak accounts of all users still exist and recreates the ones that were deleted in "
+        "keycloak. Saving a user only contacts keycloak when the email or the names changed."
+    )
+
+    def handle(self, *args, **options):
+        recreated = 0
+        for user in TapirUser.objects.exclude(keycloak_id=None).exclude(email=""):
+            if user.keycloak_account_exists():
+                continue
+
+            print(f"Recreating the keycloak account of {user}")
+            try:
+                user.sync_keycloak_account()
+            except Exception as e:
+                print(e)
+                continue
+            recreated += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Recreated {recreated} keycloak accounts")
+        )
@@ -1,4 +1,5 @@
 import logging
+import re
 import time
 
 from django.conf import settings
@@ -7,10 +8,23 @@ from jwt import decode
 from keycloak import KeycloakOpenID
 
 from tapir.accounts.models import TapirUser
+from tapir.accounts.user_cache import get_authenticated_user
 
 logger = logging.getLogger(__name__)
 
 
+def is_public_tapir_mail_path(path: str) -> bool:
+    """
+    Tracking pixels and images of the media library are embedded in the sent emails, they are accessible without login.
+    """
+    return bool(
+        re.match(settings.TAPIR_MAIL_PATH + r"/?api/tracking/(.*)/track/?", path)
+        or re.match(
+            settings.TAPIR_MAIL_PATH + r"/?api/media_library/get_file/(.*)", path
+        )
+    )
+
+
 class KeycloakMiddleware(MiddlewareMixin):
     """KeyCloak Middleware for authentication and authorization."""
 
@@ -39,6 +53,8 @@ class KeycloakMiddleware(MiddlewareMixin):
         request.error = False
         if "token" not in request.COOKIES:
             logger.debug(f"No authorization found. Using public user.")
+        elif is_public_tapir_mail_path(request.path):
+            logger.debug("Public path, skipping authentication.")
         else:
             access_token = request.COOKIES.get("token")
             try:
@@ -59,14 +75,7 @@ class KeycloakMiddleware(MiddlewareMixin):
             self.auth_failed("Could not get id from token: ", data)
         else:
             try:
-                request.user = TapirUser.objects.get(keycloak_id=keycloak_id)
-                request.user.email_verified = data.get("email_verified", False)
-                roles = data.get("realm_access", {}).get("roles", [])
-                request.user.roles = [
-                    role
-                    for role in roles
-                    if role not in settings.KEYCLOAK_NON_TAPIR_ROLES
-                ]
+                request.user = get_authenticated_user(data)
             except TapirUser.DoesNotExist as e:
                 self.auth_failed("Could not find matching TapirUser", e)
                 request.error = True
@@ -6,6 +6,8 @@ from functools import partial
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.urls import reverse, reverse_lazy
 from django.utils import translation
 from django.utils.translation import gettext_lazy as _
@@ -23,6 +25,9 @@ from tapir.utils.user_utils import UserUtils
 
 log = logging.getLogger(__name__)
 
+# fields that are stored in keycloak as well and must be kept in sync
+KEYCLOAK_SYNCED_FIELDS = ["email", "first_name", "last_name"]
+
 
 class KeycloakUserQuerySet(models.QuerySet):
     def delete(self, *args, **kwargs):
@@ -109,13 +114,16 @@ class KeycloakUser(AbstractUser):
             super().save(*args, **kwargs)
             return
 
+        loaded_values = getattr(self, "_keycloak_loaded_values", None)
+        if self.keycloak_id is not None and loaded_values is not None:
+            # the account was linked when the user was loaded: only sync what changed since then, without asking keycloak
+            self.update_keycloak_user(loaded_values)
+            super().save(*args, **kwargs)
+            self._keycloak_loaded_values = self.get_keycloak_synced_values()
+            return
+
         kc = self.get_keycloak_client()
-        has_kc_account = self.keycloak_id is not None
-        if has_kc_account:
-            try:  # try fetch the keycloak user to see if it exists
-                kc.get_user(self.keycloak_id)
-            except:
-                has_kc_account = False
+        has_kc_account = self.keycloak_account_exists(kc)
 
         if not has_kc_account:  # Keycloak User does not exist yet --> create
             data = {
@@ -159,26 +167,74 @@ class KeycloakUser(AbstractUser):
 
         else:  # Update --> change of keycloak data if necessary
             original = type(self).objects.get(id=self.id)
-            email_changed = original.email != self.email
-            first_name_changed = original.first_name != self.first_name
-            last_name_changed = original.last_name != self.last_name
-
-            if first_name_changed or last_name_changed:
-                data = {"firstName": self.first_name, "lastName": self.last_name}
-                kc.update_user(user_id=self.keycloak_id, payload=data)
-
-            if email_changed:
-                if self.email_verified():
-                    self.start_email_change_process(self.email, original.email)
-                    # important: reset the email to the original email before persisting. The actual change happens after the user click the confirmation link
-                    self.email = original.email
-                else:  # in this case, don't start the email change process, just send the keycloak email to the new address and resend the link
-                    kc.update_user(
-                        user_id=self.keycloak_id, payload={"email": self.email}
-                    )
-                    self.send_verify_email()
+            self.update_keycloak_user(original.get_keycloak_synced_values())
 
         super().save(*args, **kwargs)
+        self._keycloak_loaded_values = self.get_keycloak_synced_values()
+
+    def keycloak_account_exists(self, kc=None) -> bool:
+        if self.keycloak_id is None:
+            return False
+        kc = kc or self.get_keycloak_client()
+        try:  # try fetch the keycloak user to see if it exists
+            kc.get_user(self.keycloak_id)
+        except:
+            return False
+        return True
+
+    def sync_keycloak_account(self):
+        """
+        Saves the user without the fast path of save: the keycloak account is looked up and recreated if it was deleted
+        in keycloak. Regular saves don't contact keycloak when the email and the names are unchanged, so they don't
+        notice a deleted account.
+        """
+        self._keycloak_loaded_values = None
+        self.save()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        loaded_values = dict(zip(field_names, values))
+        if all(field in loaded_values for field in KEYCLOAK_SYNCED_FIELDS):
+            instance._keycloak_loaded_values = {
+                field: loaded_values[field] for field in KEYCLOAK_SYNCED_FIELDS
+            }
+        return instance
+
+    def get_keycloak_synced_values(self) -> dict:
+        return {field: getattr(self, field) for field in KEYCLOAK_SYNCED_FIELDS}
+
+    def update_keycloak_user(self, original_values: dict):
+        """
+        Applies the changes of the fields that are stored in keycloak. Keycloak itself is updated by a celery task
+        after the current transaction is committed, so that saving a user does not wait for keycloak.
+
+        :param original_values: the values of KEYCLOAK_SYNCED_FIELDS as they are stored in the database and in keycloak
+        """
+        email_changed = original_values["email"] != self.email
+        name_changed = (
+            original_values["first_name"] != self.first_name
+            or original_values["last_name"] != self.last_name
+        )
+        send_verify_email = False
+
+        if email_changed:
+            if self.email_verified():
+                self.start_email_change_process(self.email, original_values["email"])
+                # important: reset the email to the original email before persisting. The actual change happens after the user click the confirmation link
+                self.email = original_values["email"]
+            else:  # in this case, don't start the email change process, just send the keycloak email to the new address and resend the link
+                send_verify_email = True
+
+        if not name_changed and not send_verify_email:
+            return
+
+        from tapir.accounts.tasks import sync_keycloak_user
+
+        user_id = self.id
+        transaction.on_commit(
+            lambda: sync_keycloak_user.delay(user_id, send_verify_email)
+        )
 
     def delete(self, *args, **kwargs):
         kc = self.get_keycloak_client()
@@ -267,6 +323,10 @@ class TapirUser(KeycloakUser):
     def change_email(self, new_email: str):
         TapirUser.objects.filter(id=self.id).update(email=new_email, username=new_email)
         super().change_email(new_email)
+        if self.keycloak_id:
+            from tapir.accounts.user_cache import invalidate_authenticated_user
+
+            invalidate_authenticated_user(self.keycloak_id)
 
     def get_display_name(self):
         return UserUtils.build_display_name(self.first_name, self.last_name)
@@ -289,6 +349,18 @@ class TapirUser(KeycloakUser):
         return True
 
 
+@receiver(post_save)
+@receiver(post_delete)
+def on_tapir_user_change(sender, instance, **kwargs):
+    # sent with the concrete class as sender, e.g. Member
+    if not isinstance(instance, TapirUser) or not instance.keycloak_id:
+        return
+
+    from tapir.accounts.user_cache import invalidate_authenticated_user
+
+    invalidate_authenticated_user(instance.keycloak_id)
+
+
 def generate_random_secret():
     return generate(size=36)
 
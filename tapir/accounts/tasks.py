@@ -0,0 +1,37 @@
+from celery import shared_task
+
+from tapir.accounts.models import TapirUser
+
+
+@shared_task(autoretry_for=(Exception,), retry_backoff=True, max_retries=5)
+def sync_keycloak_user(user_id: str, send_verify_email: bool = False):
+    """
+    Pushes the name and email of a user to keycloak, see KeycloakUser.update_keycloak_user.
+    Retried with an exponential backoff if keycloak can't be reached.
+    """
+
+    user = TapirUser.objects.filter(id=user_id).first()
+    if user is None or user.keycloak_id is None:
+        print(
+            f"[task] sync_keycloak_user: skipping {user_id}, because it has no keycloak account (anymore)"
+        )
+        return
+
+    kc = user.get_keycloak_client()
+    if not user.keycloak_account_exists(kc):
+        print(
+            f"[task] sync_keycloak_user: the keycloak account of {user_id} doesn't exist anymore, recreating it"
+        )
+        user.sync_keycloak_account()
+        return
+
+    kc.update_user(
+        user_id=user.keycloak_id,
+        payload={
+            "email": user.email,
+            "firstName": user.first_name,
+            "lastName": user.last_name,
+        },
+    )
+    if send_verify_email:
+        user.send_verify_email()
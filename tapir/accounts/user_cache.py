@@ -0,0 +1,73 @@
+import copy
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from tapir.accounts.models import TapirUser
+
+AUTHENTICATED_USER_CACHE_KEY = "authenticated_user"
+# shared between the processes and invalidated when the user is saved
+AUTHENTICATED_USER_CACHE_TIMEOUT = 60
+# per process: other processes don't see the invalidation, so this must stay short
+LOCAL_CACHE_TIMEOUT = 5
+
+_local_cache: dict[str, tuple[float, int, TapirUser, list[str]]] = {}
+
+
+def get_tapir_roles(token_data: dict) -> list[str]:
+    """
+    :param token_data: the decoded keycloak access token
+    :return: the realm roles of the token that are relevant for tapir
+    """
+    roles = token_data.get("realm_access", {}).get("roles", [])
+    return [role for role in roles if role not in settings.KEYCLOAK_NON_TAPIR_ROLES]
+
+
+def get_authenticated_user(token_data: dict) -> TapirUser:
+    """
+    Returns the user of a keycloak access token, with roles and email_verified set from the token.
+    The user and the roles are cached per (keycloak id, token issue time), first in the process, then in the shared cache.
+
+    :param token_data: the decoded keycloak access token
+    :return: a user instance that belongs to the request only
+    :raises TapirUser.DoesNotExist: if no user has the keycloak id of the token
+    """
+    keycloak_id = token_data["sub"]
+    issued_at = token_data.get("iat")
+    cache_key = f"{AUTHENTICATED_USER_CACHE_KEY}:{keycloak_id}"
+
+    entry = _local_cache.get(keycloak_id)
+    if entry is None or entry[0] < time.monotonic() or entry[1] != issued_at:
+        cached = cache.get(cache_key)
+        if cached is None or cached[0] != issued_at:
+            cached = (
+                issued_at,
+                TapirUser.objects.get(keycloak_id=keycloak_id),
+                get_tapir_roles(token_data),
+            )
+            cache.set(cache_key, cached, AUTHENTICATED_USER_CACHE_TIMEOUT)
+        entry = (time.monotonic() + LOCAL_CACHE_TIMEOUT,) + cached
+        _local_cache[keycloak_id] = entry
+
+    _, _, user, roles = entry
+    # the cached instance is shared between requests, don't let them modify it
+    user = copy.copy(user)
+    user.roles = list(roles)
+    user.email_verified = token_data.get("email_verified", False)
+    return user
+
+
+def _delete_authenticated_user(keycloak_id: str):
+    _local_cache.pop(keycloak_id, None)
+    cache.delete(f"{AUTHENTICATED_USER_CACHE_KEY}:{keycloak_id}")
+
+
+def invalidate_authenticated_user(keycloak_id: str):
+    """
+    Removes the cached user of a keycloak id. Removes it again after the current transaction commits,
+    so that a request that loaded the old user in between does not keep it cached.
+    """
+    _delete_authenticated_user(keycloak_id)
+    transaction.on_commit(lambda: _delete_authenticated_user(keycloak_id))
@@ -2,6 +2,7 @@ from django.core.management import BaseCommand
 from django.db import transaction
 
 from tapir.configuration.models import TapirParameterDefinitionImporter
+from tapir.configuration.parameter import import_parameter_definitions
 
 
 class Command(BaseCommand):
@@ -13,4 +14,4 @@ class Command(BaseCommand):
 
         for cls in TapirParameterDefinitionImporter.__subclasses__():
             self.stdout.write(" - " + cls.__module__ + "." + cls.__name__)
-            cls.import_definitions(cls)
+        import_parameter_definitions()
@@ -1,6 +1,8 @@
 import re
+import threading
 
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.dispatch import Signal
 
 from tapir.configuration.models import (
     TapirParameter,
@@ -8,6 +10,9 @@ from tapir.configuration.models import (
     TapirParameterDefinitionImporter,
 )
 
+# Sent with the list of changed keys when parameters are changed with bulk operations that don't send post_save
+parameters_changed = Signal()
+
 
 def validate_format_string(value: str, allowed_vars: [str]):
     """
@@ -50,13 +55,34 @@ class ParameterMetaInfo:
     initialized = False
 
     def initialize(self):
-        for cls in TapirParameterDefinitionImporter.__subclasses__():
-            cls.import_definitions(cls)
+        import_parameter_definitions()
         self.initialized = True
 
 
 meta_info = ParameterMetaInfo()
 
+# while import_parameter_definitions runs, parameter_definition collects the parameters here instead of saving them one by one
+_pending_definitions = threading.local()
+
+
+def import_parameter_definitions():
+    """
+    Runs import_definitions() of all TapirParameterDefinitionImporter subclasses.
+    The parameters are stored with one select and at most one bulk insert and one bulk update, instead of a get and a save per parameter.
+    """
+    _pending_definitions.parameters = []
+    try:
+        for cls in TapirParameterDefinitionImporter.__subclasses__():
+            cls.import_definitions(cls)
+        parameters = _pending_definitions.parameters
+    finally:
+        _pending_definitions.parameters = None
+
+    created, updated = __create_or_update_parameters(parameters)
+    print(
+        f"Parameter definitions: {len(created)} created, {len(updated)} updated, {len(parameters) - len(created) - len(updated)} unchanged"
+    )
+
 
 def get_parameter_meta(key: str) -> ParameterMeta | None:
     if not meta_info.initialized:
@@ -92,56 +118,71 @@ def parameter_definition(
 ):
     __validate_initial_value(datatype, initial_value, key, meta.validators)
 
-    param = __create_or_update_parameter(
-        category,
-        datatype,
-        description,
-        initial_value,
-        key,
-        label,
-        order_priority,
+    param = TapirParameter(
+        key=key,
+        label=label,
+        description=description,
+        category=category,
+        order_priority=order_priority,
+        datatype=datatype.value,
+        value=str(initial_value),
     )
+    pending_parameters = getattr(_pending_definitions, "parameters", None)
+    if pending_parameters is not None:
+        pending_parameters.append(param)
+    else:
+        __create_or_update_parameters([param])
 
     meta_info.parameters[param.key] = meta
 
 
-def __create_or_update_parameter(
-    category,
-    datatype,
-    description,
-    initial_value,
-    key,
-    label,
-    order_priority,
-):
-    try:
-        param = TapirParameter.objects.get(pk=key)
-        param.label = label
-        param.description = description
-        param.category = category
-        if param.datatype != datatype.value:
-            param.datatype = datatype.value
-            param.value = initial_value  # only update value with initial value if the datatype changed!
-
-        param.order_priority = order_priority
+def __create_or_update_parameters(
+    definitions: [TapirParameter],
+) -> tuple[[TapirParameter], [TapirParameter]]:
+    """
+    Stores the parameter definitions. Existing parameters keep their value, unless the datatype changed.
 
-        print("\t[update] ", key)
+    :param definitions: unsaved parameters with the values of the definition
+    :return: (created parameters, updated parameters)
+    """
+    existing = TapirParameter.objects.in_bulk(
+        [definition.key for definition in definitions]
+    )
 
-        param.save()
-    except ObjectDoesNotExist:
-        print("******* [create] ", key)
-
-        param = TapirParameter.objects.create(
-            key=key,
-            label=label,
-            description=description,
-            category=category,
-            order_priority=order_priority,
-            datatype=datatype.value,
-            value=str(initial_value),
+    created = []
+    updated = []
+    for definition in definitions:
+        param = existing.get(definition.key)
+        if param is None:
+            created.append(definition)
+            continue
+
+        changed = False
+        for field in ["label", "description", "category", "order_priority"]:
+            if getattr(param, field) != getattr(definition, field):
+                setattr(param, field, getattr(definition, field))
+                changed = True
+        if param.datatype != definition.datatype:
+            param.datatype = definition.datatype
+            param.value = (
+                definition.value
+            )  # only update value with initial value if the datatype changed!
+            changed = True
+
+        if changed:
+            updated.append(param)
+
+    TapirParameter.objects.bulk_create(created)
+    TapirParameter.objects.bulk_update(
+        updated,
+        ["label", "description", "category", "order_priority", "datatype", "value"],
+    )
+    if created or updated:
+        parameters_changed.send(
+            sender=TapirParameter, keys=[param.key for param in created + updated]
         )
 
-    return param
+    return created, updated
 
 
 def __validate_initial_value(datatype, initial_value, key, validators):
@@ -5,6 +5,7 @@ from django.views import generic
 
 from tapir.configuration.forms import ParameterForm
 from tapir.configuration.models import TapirParameter
+from tapir.configuration.parameter import parameters_changed
 
 
 class ParameterView(PermissionRequiredMixin, generic.FormView):
@@ -28,5 +29,9 @@ class ParameterView(PermissionRequiredMixin, generic.FormView):
             TapirParameter.objects.filter(pk=field.name).update(
                 value=str(form.cleaned_data[field.name])
             )
+        parameters_changed.send(
+            sender=TapirParameter,
+            keys=[field.name for field in form.visible_fields()],
+        )
 
         return response
@@ -0,0 +1,48 @@
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import (
+    ManifestFilesMixin,
+    StaticFilesStorage,
+    staticfiles_storage,
+)
+
+
+class TapirStaticFilesStorage(ManifestFilesMixin, StaticFilesStorage):
+    """
+    collectstatic stores a copy of every file with the hash of its content in the file name
+    (e.g. core/css/base.55e7cbb9ba48.css) and writes the mapping to staticfiles.json.
+
+    The hashed names are only used by the tapir_static template tag, see get_hashed_static_path.
+    Everything else (django's static tag, form media, admin) keeps the plain names, so nothing
+    breaks when collectstatic did not run, e.g. in tests.
+    """
+
+    # url() references inside css files are not rewritten: some third party stylesheets
+    # reference files that are not shipped, which would make collectstatic fail.
+    patterns = ()
+    manifest_strict = False
+
+    def url(self, name, force=False):
+        return StaticFilesStorage.url(self, name)
+
+
+@lru_cache(maxsize=None)
+def get_static_manifest() -> dict[str, str]:
+    """
+    The mapping of static paths to their hashed names, read from staticfiles.json once per process.
+    Empty if the manifest does not exist (collectstatic did not run) or another storage is configured.
+    """
+    if not hasattr(staticfiles_storage, "load_manifest"):
+        return {}
+    return staticfiles_storage.load_manifest()
+
+
+def get_hashed_static_path(path: str) -> str:
+    """
+    Returns the content hashed name of a static file, or the path itself if it is not in the manifest.
+    In DEBUG the files are served from the app directories, where the hashed copies don't exist.
+    """
+    if settings.DEBUG:
+        return path
+    return get_static_manifest().get(path, path)
@@ -5,13 +5,13 @@ from django.apps import apps
 from django.utils.encoding import iri_to_uri
 from django.utils.html import conditional_escape
 
-from django.conf import settings
+from tapir.core.storage import get_hashed_static_path
 
 register = template.Library()
 
 
 # copied from django/templatetags/static.py
-#  and adjusted to attach a version string for cache busting
+#  and adjusted to use the content hashed file names for cache busting
 class PrefixNode(template.Node):
     def __repr__(self):
         return "<PrefixNode for %r>" % self.name
@@ -106,7 +106,7 @@ class StaticNode(template.Node):
 
     def url(self, context):
         path = self.path.resolve(context)
-        return f"{self.handle_simple(path)}?v={settings.TAPIR_VERSION}"
+        return self.handle_simple(get_hashed_static_path(path))
 
     def render(self, context):
         url = self.url(context)
@@ -74,6 +74,7 @@ MIDDLEWARE = [
     "tapir.accounts.middleware.KeycloakMiddleware",
     "tapir.wirgarten.middleware.error.GlobalServerErrorHandlerMiddleware",
     "tapir.wirgarten.middleware.mailing.TapirMailPermissionMiddleware",
+    "tapir.wirgarten.middleware.calendar_context.CalendarContextMiddleware",
 ]
 
 X_FRAME_OPTIONS = "ALLOWALL"
@@ -135,6 +136,8 @@ def get_tapir_mail_static_dir():
 
 STATIC_URL = "/static/"
 STATIC_ROOT = "static"
+# writes content hashed copies and a manifest on collectstatic, used by the tapir_static template tag
+STATICFILES_STORAGE = "tapir.core.storage.TapirStaticFilesStorage"
 STATICFILES_DIRS = [
     get_tapir_mail_static_dir(),
 ]
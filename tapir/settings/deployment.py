@@ -19,7 +19,7 @@ if not DEBUG:
     print(
         f"Tapir Version: {TAPIR_VERSION}"
         if TAPIR_VERSION
-        else "\033[93m>>> WARNING: TAPIR_VERSION is not set, cache busting will not work!\033[0m"
+        else "\033[93m>>> WARNING: TAPIR_VERSION is not set!\033[0m"
     )
 
 
@@ -36,9 +36,11 @@ CELERY_RESULT_BACKEND = env.str("CELERY_RESULT_BACKEND", default="redis://redis:
 CELERY_BEAT_SCHEDULE = {
     "execute_scheduled_tasks": {
         "task": "tapir.wirgarten.tasks.execute_scheduled_tasks",
-        "schedule": celery.schedules.crontab(
-            minute=[5],
-        ),  # every hour
+        "schedule": datetime.timedelta(minutes=1),
+    },
+    "send_outbox_emails": {
+        "task": "tapir.wirgarten.tasks.send_outbox_emails",
+        "schedule": datetime.timedelta(minutes=1),
     },
     "export_supplier_list_csv": {
         "task": "tapir.wirgarten.tasks.export_supplier_list_csv",
@@ -58,6 +60,15 @@ CELERY_BEAT_SCHEDULE = {
             # once a week, Tuesday at 03:00
         ),
     },
+    "record_weekly_deliveries": {
+        "task": "tapir.wirgarten.tasks.record_weekly_deliveries",
+        "schedule": celery.schedules.crontab(
+            day_of_week="tuesday",
+            minute=0,
+            hour=3,
+            # once a week, Tuesday at 03:00, together with the pick list
+        ),
+    },
     "export_payments_per_product_type": {
         "task": "tapir.wirgarten.tasks.export_payment_parts_csv",
         "schedule": celery.schedules.crontab(day_of_month=1, minute=0, hour=3),
@@ -66,6 +77,26 @@ CELERY_BEAT_SCHEDULE = {
         "task": "tapir.wirgarten.tasks.generate_member_numbers",
         "schedule": celery.schedules.crontab(day_of_month=1, minute=0, hour=3),
     },
+    "rebuild_coop_share_ledgers": {
+        "task": "tapir.wirgarten.tasks.rebuild_coop_share_ledgers",
+        "schedule": celery.schedules.crontab(minute=30, hour=1),
+    },
+    "rebuild_member_financial_summaries": {
+        "task": "tapir.wirgarten.tasks.rebuild_member_financial_summaries",
+        "schedule": celery.schedules.crontab(minute=0, hour=2),
+    },
+    "rebuild_member_segment_memberships": {
+        "task": "tapir.wirgarten.tasks.rebuild_member_segment_memberships",
+        "schedule": celery.schedules.crontab(minute=5, hour=0),
+    },
+    "send_contract_end_reminders": {
+        "task": "tapir.wirgarten.tasks.send_contract_end_reminders",
+        "schedule": celery.schedules.crontab(minute=0, hour=7),
+    },
+    "synchronize_waitlist_segments": {
+        "task": "tapir.wirgarten.tasks.synchronize_waitlist_segments",
+        "schedule": celery.schedules.crontab(minute=30, hour=2),
+    },
     "resolve_segment_and_create_email_dispatches_task": {
         "task": "tapir_mail.tasks.resolve_segment_and_create_email_dispatches_task",
         "schedule": datetime.timedelta(minutes=1),
@@ -80,6 +111,17 @@ CELERY_BEAT_SCHEDULE = {
     },
 }
 
+SCHEDULED_TASKS_BATCH_SIZE = (
+    500  # job runs 1x/minute --> 500 * 60 = 30,000 scheduled tasks per hour maximum
+)
+
+# claimed scheduled tasks whose execution didn't start within this time are claimed again
+SCHEDULED_TASKS_CLAIM_TIMEOUT = datetime.timedelta(minutes=15)
+
+EMAIL_OUTBOX_BATCH_SIZE = (
+    100  # emails per run of send_outbox_emails, all sent over one SMTP connection
+)
+
 EMAIL_DISPATCH_BATCH_SIZE = (
     200  # job runs 1x/minute --> 200 * 60 = 12,000 emails per hour maximum
 )
@@ -305,6 +305,30 @@ class DurationModelMixinQuerySet(models.QuerySet):
         )
 
 
+## QuerySet for models whose rows are valid from `valid_from` until the next row with the same key starts,
+## e.g. the price of a product or the pickup location of a member.
+class ValidFromQuerySet(models.QuerySet):
+    ## Filter the rows that are effective on the given date: per key, the row with the latest valid_from <= effective_date.
+    # The latest rows of all keys are found with a single DISTINCT ON query, which can be answered from the (key, valid_from) index.
+    # Filters applied before calling this narrow the candidates, filters applied after it narrow the result.
+    #
+    # @param key the field that identifies the timeline, e.g. "product_id" or "member_id"
+    # @param effective_date the date that the returned rows should be effective on
+    # @return the effective row of each key that has one
+    def effective_at(self, key: str, effective_date=None) -> ValidFromQuerySet:
+        if not effective_date:
+            # if no effective date was given, use today as the default
+            effective_date = date.today()
+        latest = (
+            self.filter(valid_from__lte=effective_date)
+            # the same direction for both columns, so that the index can be scanned backwards
+            .order_by(f"-{key}", "-valid_from")
+            .distinct(key)
+            .values("pk")
+        )
+        return self.model._default_manager.filter(pk__in=latest)
+
+
 ## Mixin to represent a model that is active inbetween two dates
 class DurationModelMixin(models.Model):
     start_date = models.DateField(db_index=True)
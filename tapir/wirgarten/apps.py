@@ -6,10 +6,22 @@ class WirgartenConfig(AppConfig):
     name = "tapir.wirgarten"
 
     def ready(self) -> None:
+        # registers the signal receivers that keep the denormalized and cached data up to date
+        from .service import (  # noqa: F401
+            calendar_context,
+            dashboard_statistics,
+            member_financial_summary,
+            member_page_cache,
+            member_segments,
+            opening_times,
+            pickup_location_map,
+            solidarity,
+        )
+
         try:
-            from .tapirmail import configure_mail_module
+            from .tapirmail import register_mail_module
 
-            configure_mail_module()
+            register_mail_module()
         except Exception as e:
             print(e)
             pass
@@ -1,17 +1,17 @@
 import json
-from datetime import datetime
+from datetime import date, datetime
 
 from dateutil.relativedelta import relativedelta
 from django import forms
 from django.core.exceptions import ValidationError
 from django.db import transaction
-from django.db.models import DecimalField, F, OuterRef, Subquery, Sum
+from django.db.models import Sum
+from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 
 from tapir.configuration.parameter import get_parameter_value
 from tapir.wirgarten.constants import NO_DELIVERY
 from tapir.wirgarten.models import (
-    MemberPickupLocation,
     PickupLocation,
     PickupLocationCapability,
     PickupLocationOpeningTime,
@@ -22,6 +22,7 @@ from tapir.wirgarten.models import (
 from tapir.wirgarten.parameters import Parameter
 from tapir.wirgarten.service.delivery import (
     get_active_pickup_location_capabilities,
+    get_member_ids_at_pickup_location,
     get_next_delivery_date,
 )
 from tapir.wirgarten.service.products import (
@@ -41,6 +42,26 @@ def get_pickup_locations_map_data(pickup_locations, location_capabilities):
     )
 
 
+def build_pickup_locations_map_data(reference_date: date) -> str:
+    """
+    :param reference_date: the date for which the capabilities of the locations are shown
+    :return: the map data of all pickup locations as JSON string, see get_cached_pickup_location_map_data
+    """
+    location_capabilities = get_active_pickup_location_capabilities(
+        reference_date=reference_date
+    ).values(
+        "pickup_location_id",
+        "product_type_id",
+        "max_capacity",
+        "product_type__name",
+        "product_type__icon_link",
+    )
+    return get_pickup_locations_map_data(
+        PickupLocation.objects.prefetch_related("opening_times").order_by("name"),
+        location_capabilities,
+    )
+
+
 def get_current_capacity(
     capability, reference_date=None, additional_subscription_filter=None
 ):
@@ -52,39 +73,32 @@ def get_current_capacity(
     if reference_date is None:
         reference_date = get_today()
 
-    latest_member_pickup_location = (
-        MemberPickupLocation.objects.filter(
-            member=OuterRef("member"), valid_from__lte=reference_date
-        )
-        .order_by("-valid_from")
-        .values("pickup_location_id")[:1]
-    )
-
     sub_qs = get_active_subscriptions(reference_date)
 
     if additional_subscription_filter:
         sub_qs = additional_subscription_filter(sub_qs)
 
-    total_price = (
-        sub_qs.annotate(
-            latest_pickup_location_id=Subquery(latest_member_pickup_location)
-        )
-        .filter(
-            latest_pickup_location_id=capability["pickup_location_id"],
-            product__type_id=capability["product_type_id"],
-        )
-        .annotate(
-            latest_price=Subquery(
-                ProductPrice.objects.filter(
-                    product=OuterRef("product"), valid_from__lte=reference_date
-                )
-                .order_by("-valid_from")
-                .values("price")[:1],
-                output_field=DecimalField(decimal_places=2),
+    quantities_per_product = (
+        sub_qs.filter(
+            member_id__in=get_member_ids_at_pickup_location(
+                capability["pickup_location_id"], reference_date
             ),
-            total_price_per_subscription=F("latest_price") * F("quantity"),
+            product__type_id=capability["product_type_id"],
         )
-        .aggregate(total_price=Sum("total_price_per_subscription"))["total_price"]
+        .order_by()
+        .values("product_id")
+        .annotate(total_quantity=Sum("quantity"))
+    )
+    quantities_per_product = {
+        row["product_id"]: row["total_quantity"] for row in quantities_per_product
+    }
+    product_prices = ProductPrice.objects.filter(
+        product_id__in=list(quantities_per_product.keys())
+    ).effective_at("product_id", reference_date)
+
+    total_price = sum(
+        product_price.price * quantities_per_product[product_price.product_id]
+        for product_price in product_prices
     )
 
     return float(total_price) if total_price else 0
@@ -155,17 +169,10 @@ def pickup_location_to_dict(location_capabilities, pickup_location):
             ]
         ),
         "members": get_active_subscriptions(next_delivery_date)
-        .annotate(
-            latest_pickup_location_id=Subquery(
-                MemberPickupLocation.objects.filter(
-                    member=OuterRef("member"), valid_from__lte=next_delivery_date
-                )
-                .order_by("-valid_from")
-                .values("pickup_location_id")[:1]
-            )
-        )
         .filter(
-            latest_pickup_location_id=pickup_location.id,
+            member_id__in=get_member_ids_at_pickup_location(
+                pickup_location.id, next_delivery_date
+            )
         )
         .values("member_id")
         .distinct()
@@ -180,7 +187,7 @@ class PickupLocationWidget(forms.Select):
     def __init__(
         self,
         pickup_locations,
-        location_capabilities,
+        reference_date,
         selected_product_types,
         initial,
         *args,
@@ -189,9 +196,12 @@ class PickupLocationWidget(forms.Select):
         super(PickupLocationWidget, self).__init__(*args, **kwargs)
 
         self.attrs["selected_product_types"] = selected_product_types
-        self.attrs["data"] = get_pickup_locations_map_data(
-            pickup_locations, location_capabilities
+        # the map data is loaded asynchronously from a cached endpoint, the map only shows the given locations
+        self.attrs["data_url"] = (
+            reverse("wirgarten:pickup_location_map_data")
+            + f"?reference_date={reference_date.isoformat()}"
         )
+        self.attrs["location_ids"] = json.dumps([pl.id for pl in pickup_locations])
         self.attrs["initial"] = initial
 
 
@@ -266,7 +276,7 @@ class PickupLocationChoiceField(forms.ModelChoiceField):
             initial=0,
             widget=PickupLocationWidget(
                 pickup_locations=possible_locations,
-                location_capabilities=location_capabilities,
+                reference_date=reference_date,
                 selected_product_types=selected_product_types,
                 initial=initial.get("initial", None),
             ),
@@ -35,6 +35,10 @@ from tapir.wirgarten.service.member import (
     get_or_create_mandate_ref,
     send_order_confirmation,
 )
+from tapir.wirgarten.service.member_financial_summary import (
+    refresh_member_financial_summary_on_commit,
+)
+from tapir.wirgarten.service.member_page_cache import bump_member_version
 from tapir.wirgarten.service.payment import (
     get_active_subscriptions_grouped_by_product_type,
     get_automatically_calculated_solidarity_excess,
@@ -63,7 +67,7 @@ SOLIDARITY_PRICES = [
 ]
 
 
-def get_available_solidarity(reference_date: date = get_today()) -> float:
+def get_available_solidarity(reference_date: date = None) -> float:
     val = get_parameter_value(Parameter.HARVEST_NEGATIVE_SOLIPRICE_ENABLED)
     if val == 0:  # disabled
         return 0.0
@@ -765,6 +769,9 @@ class AdditionalProductForm(forms.Form):
 
         Subscription.objects.bulk_create(self.subs)
         Member.objects.filter(id=member_id).update(sepa_consent=get_now())
+        # bulk_create and update send no signals
+        refresh_member_financial_summary_on_commit(member_id)
+        bump_member_version(member_id)
 
         new_pickup_location = self.cleaned_data.get("pickup_location")
         change_date = self.cleaned_data.get("pickup_location_change_date")
@@ -0,0 +1,41 @@
+import datetime
+
+from dateutil.relativedelta import relativedelta
+from django.core.management import BaseCommand
+
+from tapir.wirgarten.models import GrowingPeriod
+from tapir.wirgarten.service.delivery import get_next_delivery_date, record_deliveries
+from tapir.wirgarten.utils import format_date, get_today
+
+
+class Command(BaseCommand):
+    help = "Generates the delivery history (Deliveries) for past weeks. Weeks that are already recorded are skipped."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--from",
+            dest="from_date",
+            type=datetime.date.fromisoformat,
+            help="First day to generate the history for (YYYY-MM-DD). Default: start of the first growing period",
+        )
+
+    def handle(self, *args, **options):
+        start_date = options["from_date"]
+        if start_date is None:
+            first_growing_period = GrowingPeriod.objects.order_by("start_date").first()
+            if first_growing_period is None:
+                self.stdout.write(self.style.WARNING("No growing period found"))
+                return
+            start_date = first_growing_period.start_date
+
+        today = get_today()
+        delivery_date = get_next_delivery_date(start_date)
+        total = 0
+        # one transaction per week, so that an interrupted backfill can simply be restarted
+        while delivery_date < today:
+            count = record_deliveries(delivery_date)
+            total += count
+            self.stdout.write(f"{format_date(delivery_date)}: {count} deliveries")
+            delivery_date += relativedelta(days=7)
+
+        self.stdout.write(self.style.SUCCESS(f"Recorded {total} deliveries"))
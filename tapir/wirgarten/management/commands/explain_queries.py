@@ -0,0 +1,192 @@
+import json
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from tapir.wirgarten.models import (
+    CoopShareTransaction,
+    Deliveries,
+    EmailOutboxEntry,
+    MemberPickupLocation,
+    MemberSegmentMembership,
+    Payment,
+    ProductCapacity,
+    ProductPrice,
+    ScheduledTask,
+    WaitingListEntry,
+)
+from tapir.wirgarten.service.products import get_active_subscriptions
+from tapir.wirgarten.utils import get_now, get_today
+
+# the values don't need to exist, the plan only depends on the shape of the query
+PLACEHOLDER_ID = "0"
+
+
+def get_query_catalogue():
+    """
+    :return: list of (name, queryset) of the selective queries that the service layer runs often.
+        Each of them must be answerable with an index.
+    """
+    today = get_today()
+    return [
+        (
+            "active subscriptions of a member",
+            get_active_subscriptions(today).filter(member_id=PLACEHOLDER_ID),
+        ),
+        (
+            "current pickup location of a member",
+            MemberPickupLocation.objects.filter(
+                member_id=PLACEHOLDER_ID, valid_from__lte=today
+            ).order_by("-valid_from")[:1],
+        ),
+        (
+            "current price of a product",
+            ProductPrice.objects.filter(
+                product_id=PLACEHOLDER_ID, valid_from__lte=today
+            ).order_by("-valid_from")[:1],
+        ),
+        (
+            "coop share purchases of a member",
+            CoopShareTransaction.objects.filter(
+                member_id=PLACEHOLDER_ID,
+                valid_at__lte=today,
+                transaction_type=CoopShareTransaction.CoopShareTransactionType.PURCHASE,
+            ),
+        ),
+        (
+            "payment of a mandate reference",
+            Payment.objects.filter(
+                mandate_ref_id=PLACEHOLDER_ID, due_date=today, type=PLACEHOLDER_ID
+            ),
+        ),
+        (
+            "due scheduled tasks",
+            ScheduledTask.objects.filter(
+                status=ScheduledTask.STATUS_PENDING, eta__lte=get_now()
+            ),
+        ),
+        (
+            "pending outbox emails",
+            EmailOutboxEntry.objects.filter(
+                status=EmailOutboxEntry.STATUS_PENDING
+            ).order_by("created_at"),
+        ),
+        (
+            "waiting list entries of an email",
+            WaitingListEntry.objects.filter(
+                email=PLACEHOLDER_ID,
+                type=WaitingListEntry.WaitingListType.HARVEST_SHARES,
+            ),
+        ),
+        (
+            "capacity of a product type in a growing period",
+            ProductCapacity.objects.filter(
+                period_id=PLACEHOLDER_ID, product_type_id=PLACEHOLDER_ID
+            ),
+        ),
+        (
+            "deliveries of a member",
+            Deliveries.objects.filter(
+                member_id=PLACEHOLDER_ID, delivery_date__lte=today
+            ),
+        ),
+        (
+            "coop members segment",
+            MemberSegmentMembership.objects.filter(is_coop_member=True),
+        ),
+    ]
+
+
+def explain(queryset) -> dict:
+    """
+    :param queryset: the query to explain
+    :return: the root node of the query plan, as returned by EXPLAIN (FORMAT JSON)
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+def find_sequential_scans(plan: dict) -> list[str]:
+    """
+    :param plan: a node of the query plan
+    :return: the names of the tables that the node or one of its children reads with a sequential scan
+    """
+    tables = []
+    if plan["Node Type"] == "Seq Scan":
+        tables.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        tables.extend(find_sequential_scans(child))
+    return tables
+
+
+def get_table_sizes(tables) -> dict[str, int]:
+    """
+    :param tables: the table names
+    :return: dict of table name -> estimated number of rows, from the planner statistics
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relname, reltuples FROM pg_class WHERE relname = ANY(%s)",
+            [list(tables)],
+        )
+        return {name: int(rows) for name, rows in cursor.fetchall()}
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs EXPLAIN for the representative queries of the service layer and fails if one of them needs a sequential scan. "
+        "Sequential scans are disabled while planning, so a remaining one means that no usable index exists, "
+        "independent of how much data is in the database. Meant to catch index regressions in CI."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-rows",
+            type=int,
+            default=0,
+            help="Only report sequential scans on tables with at least this many rows (estimated). Default: 0, report all",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Query plans can only be checked on PostgreSQL")
+
+        catalogue = get_query_catalogue()
+        problems = []
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+            for name, queryset in catalogue:
+                plan = explain(queryset)
+                if options["verbosity"] >= 2:
+                    self.stdout.write(f"{name}:\n{json.dumps(plan, indent=2)}")
+
+                tables = find_sequential_scans(plan)
+                if options["min_rows"] > 0:
+                    # tables that were never analyzed have no estimate and are skipped as well
+                    table_sizes = get_table_sizes(tables)
+                    tables = [
+                        table
+                        for table in tables
+                        if table_sizes.get(table, 0) >= options["min_rows"]
+                    ]
+                problems.extend(
+                    f"{name}: sequential scan on {table}" for table in tables
+                )
+
+        if problems:
+            for problem in problems:
+                self.stdout.write(self.style.ERROR(problem))
+            raise CommandError(
+                f"{len(problems)} sequential scans found, an index is missing"
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"All {len(catalogue)} queries can use an index")
+        )
@@ -0,0 +1,18 @@
+from django.core.management import BaseCommand
+
+from tapir.wirgarten.models import MemberFinancialSummary
+from tapir.wirgarten.service.member_financial_summary import (
+    refresh_member_financial_summaries,
+)
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the financial summaries (coop shares, monthly payment, pickup location) of all members"
+
+    def handle(self, *args, **options):
+        refresh_member_financial_summaries()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {MemberFinancialSummary.objects.count()} member financial summaries"
+            )
+        )
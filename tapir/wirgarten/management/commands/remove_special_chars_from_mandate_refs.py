@@ -4,6 +4,7 @@ from tapir.wirgarten.models import (
     CoopShareTransaction,
     Subscription,
 )
+from tapir.wirgarten.service.member_page_cache import bump_global_version
 from unidecode import unidecode
 from django.db import transaction
 from django.core.management import BaseCommand
@@ -46,3 +47,6 @@ class Command(BaseCommand):
                     subs.update(mandate_ref=mandate_ref)
 
                 orig_mandate_ref.delete()
+
+        # queryset updates send no signals, the mandate references are shown on the member pages
+        bump_global_version()
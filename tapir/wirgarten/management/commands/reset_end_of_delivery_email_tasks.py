@@ -1,22 +1,23 @@
 from celery import Celery
 from django.core.management import BaseCommand
-from django.db.models import Max
 
 from django.conf import settings
 from tapir.wirgarten.models import ScheduledTask
-from tapir.wirgarten.service.tasks import schedule_task_unique
-from tapir.wirgarten.tasks import send_email_member_contract_end_reminder
-from tapir.wirgarten.utils import get_today
 
 app = Celery("tapir", broker=settings.CELERY_BROKER_URL)
 
+CONTRACT_END_REMINDER_TASK = (
+    "tapir.wirgarten.tasks.send_email_member_contract_end_reminder"
+)
+
 
 class Command(BaseCommand):
-    help = "Resets the end of delivery email tasks for all members"
+    help = (
+        "Removes the end of delivery email tasks that were scheduled per member. "
+        "The reminders are sent by the periodic send_contract_end_reminders task instead."
+    )
 
     def handle(self, *args, **options):
-        from tapir.wirgarten.models import Member
-
         celery = app.control.inspect()
 
         revoked_tasks = set(
@@ -25,64 +26,26 @@ class Command(BaseCommand):
 
         scheduled_tasks = celery.scheduled()
 
-        self.stdout.write(
-            f"Found {len(scheduled_tasks) - len(revoked_tasks)} scheduled tasks"
-        )
-
-        tasks_by_member_id = {}
+        revoked_count = 0
         if scheduled_tasks:
             for worker, tasks in scheduled_tasks.items():
                 for task in tasks:
                     if (
-                        task["request"]["name"]
-                        == "tapir.wirgarten.tasks.send_email_member_contract_end_reminder"
+                        task["request"]["name"] == CONTRACT_END_REMINDER_TASK
                         and task["request"]["id"] not in revoked_tasks
                     ):
-                        member_id = (
-                            task["request"]["args"][0]
-                            if task["request"]["args"]
-                            else task["request"]["kwargs"]["member_id"]
+                        self.stdout.write(
+                            f"Revoking task {task['request']['id']} scheduled for {task['eta']}"
                         )
-                        tasks_by_member_id.setdefault(member_id, []).append(task)
+                        app.control.revoke(task["request"]["id"], terminate=True)
+                        revoked_count += 1
 
-        members_with_max_subscription_end_date = Member.objects.annotate(
-            max_subscription_end_date=Max("subscription__end_date")
-        ).filter(max_subscription_end_date__isnull=False)
-
-        today = get_today()
-        ScheduledTask.objects.filter(
-            task_function="tapir.wirgarten.tasks.send_email_member_contract_end_reminder"
+        deleted_count, _ = ScheduledTask.objects.filter(
+            task_function=CONTRACT_END_REMINDER_TASK
         ).delete()
 
-        for member in members_with_max_subscription_end_date:
-            self.stdout.write(f"\n{member}")
-            self.stdout.write(
-                f"  Subscription end date: {member.max_subscription_end_date}"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Revoked {revoked_count} celery tasks and deleted {deleted_count} scheduled tasks"
             )
-            tasks = tasks_by_member_id.pop(member.id, None)
-            if tasks is not None:
-                self.stdout.write(f"  Revoking {len(tasks)} scheduled tasks:")
-                for task in tasks:
-                    self.stdout.write(f"    - {task['eta']}")
-                    app.control.revoke(task["request"]["id"], terminate=True)
-            else:
-                self.stdout.write(self.style.WARNING("  >>> No scheduled tasks found"))
-
-            if member.max_subscription_end_date < today:
-                self.stdout.write(
-                    self.style.WARNING(
-                        "  >>> Subscription already ended, no need to schedule a new task"
-                    )
-                )
-                continue
-            else:
-                schedule_task_unique(
-                    task=send_email_member_contract_end_reminder,
-                    eta=member.max_subscription_end_date,
-                    kwargs={"member_id": member.id},
-                )
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f"  >>> New task scheduled for {member.max_subscription_end_date}"
-                    )
-                )
+        )
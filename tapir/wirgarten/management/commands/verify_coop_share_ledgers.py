@@ -0,0 +1,42 @@
+from django.core.management import BaseCommand
+
+from tapir.wirgarten.service.coop_share_ledger import (
+    find_coop_share_ledger_differences,
+    rebuild_coop_share_ledgers,
+)
+
+
+class Command(BaseCommand):
+    help = "Recalculates the coop share ledgers from the coop share transactions and lists the members whose stored ledger differs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Rebuild the ledgers of the members with differences",
+        )
+
+    def handle(self, *args, **options):
+        differences = find_coop_share_ledger_differences()
+        if not differences:
+            self.stdout.write(self.style.SUCCESS("All coop share ledgers are correct"))
+            return
+
+        for member_id, field, stored_value, expected_value in differences:
+            self.stdout.write(
+                f"{member_id}: {field} is {stored_value}, expected {expected_value}"
+            )
+
+        member_ids = sorted({member_id for member_id, _, _, _ in differences})
+        if not options["fix"]:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{len(member_ids)} coop share ledgers differ. Run with --fix to rebuild them."
+                )
+            )
+            return
+
+        rebuild_coop_share_ledgers(member_ids)
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt {len(member_ids)} coop share ledgers")
+        )
@@ -0,0 +1,15 @@
+from tapir.wirgarten.service.calendar_context import calendar_context_scope
+
+
+class CalendarContextMiddleware:
+    """
+    Loads the growing periods and calendar parameters at most once per request, no matter how often views,
+    forms and templates ask for the current growing period or the next contract, payment or delivery date.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with calendar_context_scope():
+            return self.get_response(request)
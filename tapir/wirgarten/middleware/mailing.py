@@ -1,9 +1,9 @@
-import re
-
 from django.conf import settings
 from django.core.exceptions import PermissionDenied
 
+from tapir.accounts.middleware import is_public_tapir_mail_path
 from tapir.wirgarten.constants import Permission
+from tapir.wirgarten.tapirmail import ensure_pickup_location_filters
 
 
 class TapirMailPermissionMiddleware:
@@ -12,12 +12,7 @@ class TapirMailPermissionMiddleware:
 
     def __call__(self, request):
         # PUBLIC TRACKING PIXEL LINK ACCESS
-        if re.match(
-            settings.TAPIR_MAIL_PATH + r"/?api/tracking/(.*)/track/?", request.path
-        ) or re.match(
-            settings.TAPIR_MAIL_PATH + r"/?api/media_library/get_file/(.*)",
-            request.path,
-        ):
+        if is_public_tapir_mail_path(request.path):
             return self.get_response(request)
 
         # REQUIRE PERMISSION FOR ALL OTHER PATHS
@@ -26,4 +21,7 @@ class TapirMailPermissionMiddleware:
         ) and not request.user.has_perm(Permission.Email.MANAGE):
             raise PermissionDenied()
 
+        if request.path.startswith(settings.TAPIR_MAIL_PATH):
+            ensure_pickup_location_filters()
+
         return self.get_response(request)
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wirgarten", "0040_subscription_price_override"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scheduledtask",
+            name="max_retries",
+            field=models.PositiveSmallIntegerField(default=3),
+        ),
+        migrations.AddField(
+            model_name="scheduledtask",
+            name="retry_count",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="scheduledtask",
+            index=models.Index(
+                fields=["status", "eta"], name="idx_scheduledtask_status_eta"
+            ),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 3.2.25 on 2026-10-18 11:00
+
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import migrations, models
+
+
+def fill_dedup_keys(apps, schema_editor):
+    ScheduledTask = apps.get_model("wirgarten", "ScheduledTask")
+
+    seen_keys = set()
+    # newest first: older duplicates were superseded and are removed
+    for task in ScheduledTask.objects.order_by("-created_at"):
+        payload = json.dumps(
+            [task.task_function, list(task.task_args), task.task_kwargs],
+            sort_keys=True,
+            cls=DjangoJSONEncoder,
+        )
+        dedup_key = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        if dedup_key in seen_keys:
+            task.delete()
+            continue
+        seen_keys.add(dedup_key)
+        task.dedup_key = dedup_key
+        task.save(update_fields=["dedup_key"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wirgarten", "0041_scheduledtask_retries"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scheduledtask",
+            name="dedup_key",
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.RunPython(fill_dedup_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="scheduledtask",
+            name="dedup_key",
+            field=models.CharField(max_length=64, unique=True),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 3.2.25 on 2026-10-18 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wirgarten", "0042_scheduledtask_dedup_key"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MemberFinancialSummary",
+            fields=[
+                (
+                    "member",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="financial_summary",
+                        serialize=False,
+                        to="wirgarten.member",
+                    ),
+                ),
+                (
+                    "coop_shares_total_value",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                (
+                    "monthly_payment",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "pickup_location",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="wirgarten.pickuplocation",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="memberfinancialsummary",
+            index=models.Index(
+                fields=["coop_shares_total_value"],
+                name="idx_memberfinsum_coop_shares",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="memberfinancialsummary",
+            index=models.Index(
+                fields=["monthly_payment"], name="idx_memberfinsum_monthly_pay"
+            ),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 3.2.25 on 2026-10-18 13:00
+
+import functools
+
+from django.db import migrations, models
+
+import tapir.core.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wirgarten", "0043_memberfinancialsummary"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EmailOutboxEntry",
+            fields=[
+                (
+                    "id",
+                    models.CharField(
+                        default=functools.partial(
+                            tapir.core.models.generate_id, *(), **{}
+                        ),
+                        max_length=10,
+                        primary_key=True,
+                        serialize=False,
+                        unique=True,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("to_email", models.JSONField(default=list)),
+                ("subject", models.TextField()),
+                ("body", models.TextField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("PENDING", "Pending"),
+                            ("SENT", "Sent"),
+                            ("FAILED", "Failed"),
+                        ],
+                        default="PENDING",
+                        max_length=20,
+                    ),
+                ),
+                ("attempts", models.PositiveSmallIntegerField(default=0)),
+                ("error_message", models.TextField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("sent_at", models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="emailoutboxentry",
+            index=models.Index(
+                fields=["status", "created_at"], name="idx_emailoutbox_status_created"
+            ),
+        ),
+    ]
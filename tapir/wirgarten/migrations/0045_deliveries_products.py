@@ -0,0 +1,25 @@
+# Generated by Django 3.2.25 on 2026-10-18 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wirgarten", "0044_emailoutboxentry"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="deliveries",
+            name="products",
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddConstraint(
+            model_name="deliveries",
+            constraint=models.UniqueConstraint(
+                fields=("member", "delivery_date"),
+                name="unique_deliveries_member_date",
+            ),
+        ),
+    ]
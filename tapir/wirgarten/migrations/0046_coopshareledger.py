@@ -0,0 +1,84 @@
+# Generated by Django 3.2.25 on 2026-10-18 15:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, Max, Min, Q, Sum
+from django.utils import timezone
+
+
+def fill_coop_share_ledgers(apps, schema_editor):
+    CoopShareLedger = apps.get_model("wirgarten", "CoopShareLedger")
+    CoopShareTransaction = apps.get_model("wirgarten", "CoopShareTransaction")
+    Member = apps.get_model("wirgarten", "Member")
+
+    valid = Q(valid_at__lte=timezone.localdate())
+    aggregates = {
+        row["member_id"]: row
+        for row in CoopShareTransaction.objects.values("member_id").annotate(
+            ledger_quantity=Sum("quantity", filter=valid),
+            ledger_total_value=Sum(F("quantity") * F("share_price"), filter=valid),
+            ledger_entry_date=Min(
+                "valid_at",
+                filter=Q(transaction_type__in=["purchase", "transfer_in"]),
+            ),
+            ledger_valid_from=Max("valid_at", filter=valid),
+            ledger_valid_until=Min("valid_at", filter=~valid),
+        )
+    }
+
+    ledgers = []
+    for member_id in Member.objects.values_list("id", flat=True):
+        row = aggregates.get(member_id, {})
+        ledgers.append(
+            CoopShareLedger(
+                member_id=member_id,
+                quantity=row.get("ledger_quantity") or 0,
+                total_value=row.get("ledger_total_value") or 0,
+                entry_date=row.get("ledger_entry_date"),
+                balance_valid_from=row.get("ledger_valid_from"),
+                balance_valid_until=row.get("ledger_valid_until"),
+            )
+        )
+    CoopShareLedger.objects.bulk_create(ledgers, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wirgarten", "0045_deliveries_products"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CoopShareLedger",
+            fields=[
+                (
+                    "member",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="coop_share_ledger",
+                        serialize=False,
+                        to="wirgarten.member",
+                    ),
+                ),
+                ("quantity", models.IntegerField(default=0)),
+                (
+                    "total_value",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                ("entry_date", models.DateField(null=True)),
+                ("balance_valid_from", models.DateField(null=True)),
+                ("balance_valid_until", models.DateField(null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="coopsharetransaction",
+            index=models.Index(
+                fields=["member", "valid_at", "transaction_type"],
+                name="idx_coopsharetx_member_valid",
+            ),
+        ),
+        migrations.RunPython(fill_coop_share_ledgers, migrations.RunPython.noop),
+    ]
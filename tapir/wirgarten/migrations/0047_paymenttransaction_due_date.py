@@ -0,0 +1,26 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wirgarten", "0046_coopshareledger"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="paymenttransaction",
+            name="due_date",
+            field=models.DateField(null=True),
+        ),
+        migrations.AddConstraint(
+            model_name="paymenttransaction",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("due_date__isnull", False)),
+                fields=("type", "due_date"),
+                name="unique_payment_transaction_type_due_date",
+            ),
+        ),
+    ]
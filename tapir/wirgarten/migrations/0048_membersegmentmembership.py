@@ -0,0 +1,59 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wirgarten", "0047_paymenttransaction_due_date"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MemberSegmentMembership",
+            fields=[
+                (
+                    "member",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="segment_membership",
+                        serialize=False,
+                        to="wirgarten.member",
+                    ),
+                ),
+                ("is_coop_member", models.BooleanField(default=False)),
+                ("has_active_subscription", models.BooleanField(default=False)),
+                ("valid_for", models.DateField()),
+                (
+                    "pickup_location",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="wirgarten.pickuplocation",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="membersegmentmembership",
+            index=models.Index(
+                fields=["is_coop_member"], name="idx_membersegment_coop"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="membersegmentmembership",
+            index=models.Index(
+                fields=["has_active_subscription"],
+                name="idx_membersegment_active_sub",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="membersegmentmembership",
+            index=models.Index(
+                fields=["valid_for"], name="idx_membersegment_valid_for"
+            ),
+        ),
+    ]
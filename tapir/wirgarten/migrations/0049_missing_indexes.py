@@ -0,0 +1,26 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wirgarten", "0048_membersegmentmembership"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="productcapacity",
+            index=models.Index(
+                fields=["period", "product_type"],
+                name="idx_prodcapacity_period_type",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="waitinglistentry",
+            index=models.Index(
+                fields=["email", "type"], name="idx_waitinglist_email_type"
+            ),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 3.2.25 on 2026-10-18 20:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+import functools
+import tapir.core.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wirgarten", "0049_missing_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ContractEndReminder",
+            fields=[
+                (
+                    "id",
+                    models.CharField(
+                        default=functools.partial(
+                            tapir.core.models.generate_id, *(), **{}
+                        ),
+                        max_length=10,
+                        primary_key=True,
+                        serialize=False,
+                        unique=True,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("contract_end_date", models.DateField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("SENT", "Sent"), ("FAILED", "Failed")],
+                        max_length=20,
+                    ),
+                ),
+                ("error_message", models.TextField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "member",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="wirgarten.member",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="contractendreminder",
+            constraint=models.UniqueConstraint(
+                fields=("member", "contract_end_date"),
+                name="unique_contract_end_reminder",
+            ),
+        ),
+    ]
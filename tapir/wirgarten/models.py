@@ -1,16 +1,16 @@
 import datetime
+import hashlib
+import json
 from functools import partial
 
 from dateutil.relativedelta import relativedelta
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models, transaction
 from django.db.models import (
-    F,
     Index,
     JSONField,
-    OuterRef,
-    Subquery,
-    Sum,
+    Q,
     UniqueConstraint,
 )
 from django.utils import timezone
@@ -21,6 +21,7 @@ from tapir.accounts.models import TapirUser, KeycloakUserManager
 from tapir.configuration.parameter import get_parameter_value
 from tapir.core.models import TapirModel
 from tapir.log.models import LogEntry, UpdateModelLogEntry
+from tapir.utils.models import ValidFromQuerySet
 from tapir.wirgarten.constants import NO_DELIVERY, DeliveryCycle
 from tapir.wirgarten.parameters import OPTIONS_WEEKDAYS, Parameter
 from tapir.wirgarten.utils import format_currency, format_date, get_today
@@ -63,13 +64,24 @@ class PickupLocation(TapirModel):
     def __str__(self):
         return self.name
 
-    @property
-    def opening_times_html(self):
+    def get_prefetched_opening_times(self):
+        """
+        :return: the opening times sorted by day, if they were loaded with prefetch_related("opening_times"), else None
+        """
+        prefetched = getattr(self, "_prefetched_objects_cache", {}).get("opening_times")
+        if prefetched is None:
+            return None
+        return sorted(prefetched, key=lambda ot: (ot.day_of_week, ot.open_time))
+
+    @staticmethod
+    def render_opening_times_html(opening_times) -> str:
+        """
+        :param opening_times: objects with day_of_week, open_time and close_time, sorted by day
+        :return: the opening times as HTML table
+        """
         result = "<table>"
         last_day = None
-        for ot in PickupLocationOpeningTime.objects.filter(
-            pickup_location_id=self.id
-        ).order_by("day_of_week"):
+        for ot in opening_times:
             open_time = ot.open_time.strftime("%H:%M")
             close_time = ot.close_time.strftime("%H:%M")
 
@@ -80,16 +92,17 @@ class PickupLocation(TapirModel):
             last_day = ot.day_of_week
         return result + "</table>"
 
-    @property
-    def delivery_date_offset(self):
-        opening_times = PickupLocationOpeningTime.objects.filter(
-            pickup_location_id=self.id
-        ).order_by("day_of_week")
-        delivery_day = get_parameter_value(Parameter.DELIVERY_DAY)
+    @staticmethod
+    def calculate_delivery_date_offset(opening_days, delivery_day: int) -> int:
+        """
+        :param opening_days: the days of week on which the location is open
+        :param delivery_day: the day of week of the delivery (Parameter.DELIVERY_DAY)
+        :return: days between the delivery day and the first opening day, 0 if the location has no opening times
+        """
         smallest_offset = None
-        for ot in opening_times:
-            offset = ot.day_of_week - delivery_day
-            if ot.day_of_week < delivery_day:
+        for day_of_week in opening_days:
+            offset = day_of_week - delivery_day
+            if day_of_week < delivery_day:
                 offset += 7
             smallest_offset = (
                 min(smallest_offset, offset) if smallest_offset is not None else offset
@@ -97,6 +110,28 @@ class PickupLocation(TapirModel):
 
         return smallest_offset if smallest_offset is not None else 0
 
+    @property
+    def opening_times_html(self):
+        opening_times = self.get_prefetched_opening_times()
+        if opening_times is None:
+            from tapir.wirgarten.service.opening_times import get_opening_times_html
+
+            return get_opening_times_html(self.id)
+        return self.render_opening_times_html(opening_times)
+
+    @property
+    def delivery_date_offset(self):
+        from tapir.wirgarten.service.calendar_context import get_calendar_context
+        from tapir.wirgarten.service.opening_times import get_opening_times
+
+        opening_times = self.get_prefetched_opening_times()
+        if opening_times is None:
+            opening_times = get_opening_times(self.id)
+        return self.calculate_delivery_date_offset(
+            [ot.day_of_week for ot in opening_times],
+            get_calendar_context().delivery_day,
+        )
+
 
 class PickupLocationOpeningTime(TapirModel):
     pickup_location = models.ForeignKey(
@@ -222,7 +257,13 @@ class ProductCapacity(TapirModel):
     )
     capacity = models.DecimalField(decimal_places=2, max_digits=20, null=False)
 
-    indexes = [Index(fields=["period"], name="idx_productcapacity_period")]
+    class Meta:
+        indexes = [
+            Index(
+                fields=["period", "product_type"],
+                name="idx_prodcapacity_period_type",
+            )
+        ]
 
 
 class MemberQuerySet(models.QuerySet):
@@ -315,11 +356,6 @@ class Member(TapirUser):
                 else None
             )
 
-    @classmethod
-    def generate_member_no(cls):
-        max_member_no = cls.objects.aggregate(models.Max("member_no"))["member_no__max"]
-        return (max_member_no or 0) + 1
-
     @transaction.atomic
     def save(self, *args, **kwargs):
         if "bypass_keycloak" not in kwargs:
@@ -345,64 +381,46 @@ class Member(TapirUser):
         return False
 
     def coop_shares_total_value(self):
-        today = get_today()
-        return (
-            self.coopsharetransaction_set.filter(valid_at__lte=today).aggregate(
-                total_value=Sum(F("quantity") * F("share_price"))
-            )["total_value"]
-            or 0.0
-        )
+        from tapir.wirgarten.service.coop_share_ledger import get_coop_share_ledger
+
+        # 0.0 for members without shares, as before the ledger
+        return get_coop_share_ledger(self.id).total_value or 0.0
 
     @property
     def coop_shares_quantity(self):
-        today = get_today()
-        return (
-            self.coopsharetransaction_set.filter(valid_at__lte=today).aggregate(
-                quantity=Sum(F("quantity"))
-            )["quantity"]
-            or 0
-        )
+        from tapir.wirgarten.service.coop_share_ledger import get_coop_share_ledger
+
+        return get_coop_share_ledger(self.id).quantity
 
     def monthly_payment(self):
         from tapir.wirgarten.service.products import get_active_subscriptions
 
-        today = get_today()
-        return (
+        subscriptions = list(
             get_active_subscriptions()
             .filter(member_id=self.id)
-            .annotate(
-                product_price=Subquery(
-                    ProductPrice.objects.filter(
-                        product_id=OuterRef("product_id"), valid_from__lte=today
-                    )
-                    .order_by("-valid_from")
-                    .values("price")[:1],
-                    output_field=models.FloatField(),
-                ),
+            .values_list("product_id", "quantity", "solidarity_price")
+        )
+        product_prices = dict(
+            ProductPrice.objects.filter(
+                product_id__in={subscription[0] for subscription in subscriptions}
             )
-            .aggregate(
-                total_value=Sum(
-                    F("product_price") * F("quantity") * (1 + F("solidarity_price"))
-                )
-            )["total_value"]
+            .effective_at("product_id", get_today())
+            .values_list("product_id", "price")
         )
 
+        # like a SQL sum: subscriptions without a valid price are skipped, None if nothing is left
+        payments = [
+            float(product_prices[product_id]) * quantity * (1 + solidarity_price)
+            for product_id, quantity, solidarity_price in subscriptions
+            if product_id in product_prices
+        ]
+        return sum(payments) if payments else None
+
     @property
     def coop_entry_date(self):
-        try:
-            earliest_coopsharetransaction = self.coopsharetransaction_set.filter(
-                transaction_type__in=[
-                    CoopShareTransaction.CoopShareTransactionType.PURCHASE,
-                    CoopShareTransaction.CoopShareTransactionType.TRANSFER_IN,
-                ]
-            ).earliest("valid_at")
-            return (
-                earliest_coopsharetransaction.valid_at
-                if earliest_coopsharetransaction
-                else None
-            )
-        except CoopShareTransaction.DoesNotExist:
-            return None
+        from tapir.wirgarten.service.coop_share_ledger import get_coop_share_ledger
+
+        return get_coop_share_ledger(self.id).entry_date
 
     @property
     def base_subscriptions_text(self):
@@ -473,6 +491,8 @@ class MemberPickupLocation(TapirModel):
     pickup_location = models.ForeignKey(PickupLocation, on_delete=models.DO_NOTHING)
     valid_from = models.DateField()
 
+    objects = ValidFromQuerySet.as_manager()
+
     class Meta:
         unique_together = (
             "member",
@@ -533,6 +553,8 @@ class ProductPrice(TapirModel):
     )
     valid_from = models.DateField(null=False, editable=False)
 
+    objects = ValidFromQuerySet.as_manager()
+
     class Meta:
         constraints = [
             UniqueConstraint(
@@ -656,23 +678,28 @@ class Subscription(TapirModel, Payable, AdminConfirmableMixin):
         if not hasattr(self, "_total_price"):
             from tapir.wirgarten.service.products import get_product_price
 
-            price = get_product_price(self.product, reference_date).price
-
-            if self.solidarity_price_absolute is not None:
-                self._total_price = round(
-                    float(self.quantity) * float(price)
-                    + float(self.solidarity_price_absolute),
-                    2,
-                )
-            else:
-                self._total_price = round(
-                    float(self.quantity)
-                    * float(price)
-                    * float(1 + self.solidarity_price),
-                    2,
-                )
+            self._total_price = self.calculate_total_price(
+                get_product_price(self.product, reference_date).price
+            )
         return self._total_price
 
+    def calculate_total_price(self, product_price) -> float:
+        """
+        The monthly price of the subscription for the given product price, without the price override.
+        """
+        if self.solidarity_price_absolute is not None:
+            return round(
+                float(self.quantity) * float(product_price)
+                + float(self.solidarity_price_absolute),
+                2,
+            )
+        return round(
+            float(self.quantity)
+            * float(product_price)
+            * float(1 + self.solidarity_price),
+            2,
+        )
+
     @property
     def total_price_without_soli(self):
         today = get_today()
@@ -748,6 +775,47 @@ class ExportedFile(TapirModel):
     created_at = models.DateTimeField(auto_now_add=True, null=False)
 
 
+class EmailOutboxEntry(TapirModel):
+    """
+    A rendered email waiting to be sent by the send_outbox_emails celery task.
+    """
+
+    STATUS_PENDING = "PENDING"
+    STATUS_SENT = "SENT"
+    STATUS_FAILED = "FAILED"
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_SENT, "Sent"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    MAX_ATTEMPTS = 3
+
+    to_email = JSONField(default=list)
+    subject = models.TextField()
+    body = models.TextField()
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error_message = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            Index(
+                fields=["status", "created_at"], name="idx_emailoutbox_status_created"
+            )
+        ]
+
+    def __str__(self):
+        return (
+            f"{self.subject} | to: {', '.join(self.to_email)} | status: {self.status}"
+        )
+
+
 class PaymentTransaction(TapirModel):
     """
     A payment transaction. This is usually created once a month by a task, when the payments are due.
@@ -757,6 +825,17 @@ class PaymentTransaction(TapirModel):
     created_at = models.DateTimeField(null=False, default=partial(timezone.now))
     file = models.ForeignKey(ExportedFile, on_delete=models.DO_NOTHING, null=False)
     type = models.CharField(max_length=32, null=True)
+    due_date = models.DateField(null=True)
+
+    class Meta:
+        constraints = [
+            # the monthly export creates at most one transaction per type and due date, so that it can be resumed
+            UniqueConstraint(
+                fields=["type", "due_date"],
+                condition=Q(due_date__isnull=False),
+                name="unique_payment_transaction_type_due_date",
+            )
+        ]
 
 
 class Payment(TapirModel):
@@ -897,10 +976,35 @@ class CoopShareTransaction(TapirModel, Payable, AdminConfirmableMixin):
                 }
             )
 
+    class Meta:
+        indexes = [
+            Index(
+                fields=["member", "valid_at", "transaction_type"],
+                name="idx_coopsharetx_member_valid",
+            )
+        ]
+
+    @transaction.atomic
     def save(self, *args, **kwargs):
+        from tapir.wirgarten.service.coop_share_ledger import (
+            refresh_coop_share_ledger,
+        )
+
         # Call the clean method to validate the model instance before saving.
         self.clean()
         super().save(*args, **kwargs)
+        refresh_coop_share_ledger(self.member_id)
+
+    @transaction.atomic
+    def delete(self, *args, **kwargs):
+        from tapir.wirgarten.service.coop_share_ledger import (
+            refresh_coop_share_ledger,
+        )
+
+        member_id = self.member_id
+        result = super().delete(*args, **kwargs)
+        refresh_coop_share_ledger(member_id)
+        return result
 
     def __str__(self):
         prefix = f"[{format_date(self.timestamp)}] {abs(self.quantity)} Genossenschaftsanteile"
@@ -919,7 +1023,7 @@ class CoopShareTransaction(TapirModel, Payable, AdminConfirmableMixin):
 
 class Deliveries(TapirModel):
     """
-    History of deliveries.
+    History of deliveries. Written weekly by the record_deliveries task, see service/delivery.py.
     """
 
     member = models.ForeignKey(Member, on_delete=models.DO_NOTHING, null=False)
@@ -927,6 +1031,139 @@ class Deliveries(TapirModel):
     pickup_location = models.ForeignKey(
         PickupLocation, on_delete=models.DO_NOTHING, null=False
     )
+    # snapshot of the delivered products: [{"product_name": str, "product_type_name": str, "quantity": int}]
+    products = JSONField(default=list)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=["member", "delivery_date"],
+                name="unique_deliveries_member_date",
+            )
+        ]
+
+
+class MemberFinancialSummary(models.Model):
+    """
+    Denormalized per-member figures for the member list. Kept up to date by
+    tapir.wirgarten.service.member_financial_summary and rebuilt every night.
+    """
+
+    member = models.OneToOneField(
+        Member,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="financial_summary",
+    )
+    coop_shares_total_value = models.DecimalField(
+        decimal_places=2, max_digits=12, default=0
+    )
+    monthly_payment = models.DecimalField(decimal_places=2, max_digits=12, default=0)
+    pickup_location = models.ForeignKey(
+        PickupLocation, on_delete=models.SET_NULL, null=True
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            Index(
+                fields=["coop_shares_total_value"],
+                name="idx_memberfinsum_coop_shares",
+            ),
+            Index(fields=["monthly_payment"], name="idx_memberfinsum_monthly_pay"),
+        ]
+
+
+class CoopShareLedger(models.Model):
+    """
+    Running balance of the coop shares of a member. Updated in the same transaction as every CoopShareTransaction
+    save or delete, see tapir.wirgarten.service.coop_share_ledger.
+
+    The balance only contains the transactions that were valid when it was calculated. It stays correct between
+    balance_valid_from (the latest valid_at that is included) and balance_valid_until (the next valid_at that is not).
+    """
+
+    member = models.OneToOneField(
+        Member,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="coop_share_ledger",
+    )
+    quantity = models.IntegerField(default=0)
+    total_value = models.DecimalField(decimal_places=2, max_digits=12, default=0)
+    entry_date = models.DateField(null=True)
+    balance_valid_from = models.DateField(null=True)
+    balance_valid_until = models.DateField(null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def is_balance_valid_at(self, reference_date: datetime.date) -> bool:
+        return (
+            self.balance_valid_from is None or self.balance_valid_from <= reference_date
+        ) and (
+            self.balance_valid_until is None
+            or reference_date < self.balance_valid_until
+        )
+
+
+class MemberSegmentMembership(models.Model):
+    """
+    Per-member flags that the tapir mail segments and filters are resolved from, see
+    tapir.wirgarten.service.member_segments. The flags are only correct for the day in valid_for:
+    rows of earlier days are recalculated before the segments are resolved again.
+    """
+
+    member = models.OneToOneField(
+        Member,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="segment_membership",
+    )
+    is_coop_member = models.BooleanField(default=False)
+    has_active_subscription = models.BooleanField(default=False)
+    pickup_location = models.ForeignKey(
+        PickupLocation, on_delete=models.SET_NULL, null=True
+    )
+    valid_for = models.DateField()
+
+    class Meta:
+        indexes = [
+            Index(fields=["is_coop_member"], name="idx_membersegment_coop"),
+            Index(
+                fields=["has_active_subscription"],
+                name="idx_membersegment_active_sub",
+            ),
+            Index(fields=["valid_for"], name="idx_membersegment_valid_for"),
+        ]
+
+
+class ContractEndReminder(TapirModel):
+    """
+    The result of the contract end reminder of a member for one contract end date, see
+    tapir.wirgarten.service.contract_end_reminder. Members with a SENT reminder for their end date are not reminded again.
+    SENT means that the email was written to the EmailOutboxEntry table, the SMTP delivery is tracked there.
+    """
+
+    STATUS_SENT = "SENT"
+    STATUS_FAILED = "FAILED"
+
+    STATUS_CHOICES = [
+        (STATUS_SENT, "Sent"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    member = models.ForeignKey(Member, on_delete=models.CASCADE, null=False)
+    contract_end_date = models.DateField(null=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    error_message = models.TextField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=["member", "contract_end_date"],
+                name="unique_contract_end_reminder",
+            )
+        ]
 
 
 class TaxRate(TapirModel):
@@ -1066,6 +1303,9 @@ class WaitingListEntry(TapirModel):
     created_at = models.DateTimeField(auto_now_add=True, null=False)
     privacy_consent = models.DateTimeField(null=False)
 
+    class Meta:
+        indexes = [Index(fields=["email", "type"], name="idx_waitinglist_email_type")]
+
 
 class QuestionaireTrafficSourceOption(TapirModel):
     name = models.CharField(max_length=100)
@@ -1104,6 +1344,9 @@ class ScheduledTask(TapirModel):
         (STATUS_FAILED, "Failed"),
     ]
 
+    # the delay before the first retry, doubled for every further retry
+    RETRY_BACKOFF = datetime.timedelta(minutes=5)
+
     task_function = models.CharField(max_length=255)
     task_args = JSONField(blank=True, default=list)
     task_kwargs = JSONField(blank=True, default=dict)
@@ -1112,25 +1355,65 @@ class ScheduledTask(TapirModel):
         max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING
     )
     error_message = models.TextField(blank=True, null=True)
+    retry_count = models.PositiveSmallIntegerField(default=0)
+    max_retries = models.PositiveSmallIntegerField(default=3)
+    # hash of task_function, task_args and task_kwargs: there is at most one task per function call
+    dedup_key = models.CharField(max_length=64, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [Index(fields=["status", "eta"], name="idx_scheduledtask_status_eta")]
+
+    @staticmethod
+    def build_dedup_key(task_function: str, task_args, task_kwargs) -> str:
+        payload = json.dumps(
+            [task_function, list(task_args), task_kwargs],
+            sort_keys=True,
+            cls=DjangoJSONEncoder,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def save(self, *args, **kwargs):
+        self.dedup_key = self.build_dedup_key(
+            self.task_function, self.task_args, self.task_kwargs
+        )
+        super().save(*args, **kwargs)
+
     def execute(self):
-        from importlib import import_module
+        """
+        Executes the task function. The task must already be claimed (status IN_PROGRESS) by the caller.
+        If the function fails, the task is rescheduled with an exponential backoff until max_retries is reached.
+        The function runs in a savepoint, so that the status can still be saved if it fails with a database error.
+        The result is only saved if the task is still IN_PROGRESS: if it was rescheduled in the meantime
+        (schedule_tasks_unique sets it back to PENDING with a new eta), the reschedule wins.
+        """
+        from tapir.wirgarten.service.tasks import resolve_task_function
 
-        module_name, function_name = self.task_function.rsplit(".", 1)
-        module = import_module(module_name)
-        function = getattr(module, function_name)
         try:
-            self.status = self.STATUS_IN_PROGRESS
-            self.save()
-            function(*self.task_args, **self.task_kwargs)
+            function = resolve_task_function(self.task_function)
+            with transaction.atomic():
+                function(*self.task_args, **self.task_kwargs)
             self.status = self.STATUS_DONE
+            self.error_message = None
         except Exception as e:
-            self.status = self.STATUS_FAILED
             self.error_message = str(e)
+            if self.retry_count < self.max_retries:
+                self.status = self.STATUS_PENDING
+                self.eta = timezone.now() + self.RETRY_BACKOFF * (2**self.retry_count)
+                self.retry_count += 1
+            else:
+                self.status = self.STATUS_FAILED
         finally:
-            self.save()
+            ScheduledTask.objects.filter(
+                id=self.id, status=self.STATUS_IN_PROGRESS
+            ).update(
+                status=self.status,
+                error_message=self.error_message,
+                eta=self.eta,
+                retry_count=self.retry_count,
+                updated_at=timezone.now(),
+            )
 
     def __str__(self):
         return f"{self.task_function} | eta: {self.eta} | status: {self.status}"
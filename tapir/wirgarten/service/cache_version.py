@@ -0,0 +1,39 @@
+from django.core.cache import cache
+from django.db import transaction
+
+from tapir.core.models import generate_id
+from tapir.wirgarten.utils import get_now
+
+
+def _new_version() -> tuple[str, int]:
+    return generate_id(), int(get_now().timestamp())
+
+
+def get_version(cache_key: str) -> tuple[str, int]:
+    """
+    Returns the version of cached data. The version is meant to be part of the cache keys of the data,
+    so that bumping it invalidates all of them at once.
+
+    :param cache_key: the cache key under which the version is stored
+    :return: (version token, last modification time as unix timestamp)
+    """
+    version = cache.get(cache_key)
+    if version is None:
+        # unknown (e.g. after a cache flush): treat it as changed now
+        version = _new_version()
+        if not cache.add(cache_key, version, None):
+            version = cache.get(cache_key) or version
+    return version
+
+
+def bump_version(cache_key: str, on_commit: bool = True):
+    """
+    Marks the data of a version as changed.
+
+    :param cache_key: the cache key under which the version is stored
+    :param on_commit: bump again after the current transaction commits, so that data that was loaded
+        with the old state in between is not cached under the new version
+    """
+    cache.set(cache_key, _new_version(), None)
+    if on_commit:
+        transaction.on_commit(lambda: cache.set(cache_key, _new_version(), None))
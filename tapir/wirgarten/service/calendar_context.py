@@ -0,0 +1,138 @@
+import contextvars
+from contextlib import contextmanager
+from datetime import date
+from functools import cached_property
+
+from django.db import connection
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from tapir.configuration.models import TapirParameter
+from tapir.configuration.parameter import get_parameter_value, parameters_changed
+from tapir.wirgarten.models import GrowingPeriod
+from tapir.wirgarten.parameters import Parameter
+from tapir.wirgarten.service.cache_version import bump_version, get_version
+from tapir.wirgarten.utils import get_today
+
+CALENDAR_VERSION_CACHE_KEY = "calendar_context_version"
+# the parameters that the contract and delivery dates are calculated from
+CALENDAR_PARAMETERS = {Parameter.DELIVERY_DAY, Parameter.PAYMENT_DUE_DAY}
+
+
+class CalendarContext:
+    """
+    Loads the growing periods and the calendar parameters once and answers the growing period and
+    contract date lookups from memory. Only valid for one day and one configuration version,
+    use get_calendar_context() to get the right one.
+    """
+
+    def __init__(self, today: date = None, version: str = None):
+        self.today = today if today is not None else get_today()
+        self.version = version
+
+    @cached_property
+    def growing_periods(self) -> list[GrowingPeriod]:
+        return list(GrowingPeriod.objects.order_by("start_date"))
+
+    @cached_property
+    def delivery_day(self) -> int:
+        return get_parameter_value(Parameter.DELIVERY_DAY)
+
+    @cached_property
+    def payment_due_day(self) -> int:
+        return get_parameter_value(Parameter.PAYMENT_DUE_DAY)
+
+    def get_current_growing_period(
+        self, reference_date: date = None
+    ) -> GrowingPeriod | None:
+        if reference_date is None:
+            reference_date = self.today
+
+        for growing_period in self.growing_periods:
+            if growing_period.start_date <= reference_date <= growing_period.end_date:
+                return growing_period
+        return None
+
+    def get_next_growing_period(
+        self, reference_date: date = None
+    ) -> GrowingPeriod | None:
+        if reference_date is None:
+            reference_date = self.today
+
+        for growing_period in self.growing_periods:
+            if growing_period.start_date > reference_date:
+                return growing_period
+        return None
+
+
+_scoped_context = contextvars.ContextVar("calendar_context", default=None)
+_process_context = None
+
+
+def _get_process_context() -> CalendarContext:
+    global _process_context
+    today = get_today()
+    version, _ = get_version(CALENDAR_VERSION_CACHE_KEY)
+    context = _process_context
+    if context is None or context.today != today or context.version != version:
+        context = CalendarContext(today, version)
+        _process_context = context
+    return context
+
+
+def get_calendar_context() -> CalendarContext:
+    """
+    :return: the context of the current request (see calendar_context_scope) if there is one.
+        Otherwise the context that is shared by the process, as long as the date and the configuration don't change.
+        Inside of a transaction a new context is returned, the shared one doesn't see uncommitted changes.
+    """
+    context = _scoped_context.get()
+    if context is not None and context.today == get_today():
+        return context
+    if connection.in_atomic_block:
+        return CalendarContext()
+    return _get_process_context()
+
+
+@contextmanager
+def calendar_context_scope():
+    """
+    Uses one calendar context for everything that runs inside, e.g. a request. Only the configuration version is checked once at the start.
+    """
+    if connection.in_atomic_block:
+        context = CalendarContext()
+    else:
+        context = _get_process_context()
+    token = _scoped_context.set(context)
+    try:
+        yield context
+    finally:
+        _scoped_context.reset(token)
+
+
+def invalidate_calendar_context():
+    """
+    Marks the calendar contexts of all processes as outdated.
+    """
+    if _scoped_context.get() is not None:
+        # replaced instead of cleared: the scoped context may be the one that is shared by the process
+        _scoped_context.set(CalendarContext())
+    bump_version(CALENDAR_VERSION_CACHE_KEY)
+
+
+@receiver(post_save, sender=GrowingPeriod)
+@receiver(post_delete, sender=GrowingPeriod)
+def on_growing_period_change(sender, instance, **kwargs):
+    invalidate_calendar_context()
+
+
+@receiver(post_save, sender=TapirParameter)
+def on_parameter_saved(sender, instance, **kwargs):
+    if instance.key in CALENDAR_PARAMETERS:
+        invalidate_calendar_context()
+
+
+@receiver(parameters_changed)
+def on_parameters_changed(sender, keys, **kwargs):
+    if CALENDAR_PARAMETERS.intersection(keys):
+        invalidate_calendar_context()
@@ -0,0 +1,149 @@
+from datetime import date
+from typing import List
+
+from dateutil.relativedelta import relativedelta
+from django.db import transaction
+from django.db.models import Exists, Max, OuterRef, Prefetch, Q
+from tapir_mail.triggers.transactional_trigger import TransactionalTrigger
+
+from tapir.configuration.parameter import get_parameter_value
+from tapir.wirgarten.models import ContractEndReminder, Member, Subscription
+from tapir.wirgarten.parameters import Parameter
+from tapir.wirgarten.service.delivery import get_next_delivery_date
+from tapir.wirgarten.service.email import send_email
+from tapir.wirgarten.service.products import get_active_subscriptions
+from tapir.wirgarten.tapirmail import Events
+from tapir.wirgarten.utils import format_subscription_list_html, get_today
+
+
+def get_members_due_for_contract_end_reminder(
+    reference_date: date = None,
+    contract_end_until: date = None,
+    member_ids: List[str] | None = None,
+):
+    """
+    Selects the members whose active contracts end soon and that have no follow-up contract, with a single query.
+    The active subscriptions are prefetched with their products into member.active_subscriptions.
+
+    :param reference_date: the day the reminders are sent, today if None
+    :param contract_end_until: the latest contract end date that is reminded. If None: the day before the next delivery,
+        so that the reminder is sent once the last delivery before the contract end is over.
+    :param member_ids: only consider these members, all members if None
+    :return: the members, annotated with contract_end_date
+    """
+    if reference_date is None:
+        reference_date = get_today()
+    if contract_end_until is None:
+        contract_end_until = get_next_delivery_date(reference_date) - relativedelta(
+            days=1
+        )
+
+    members = Member.objects.all()
+    if member_ids is not None:
+        members = members.filter(id__in=member_ids)
+
+    return (
+        members.filter(
+            ~Exists(
+                Subscription.objects.filter(
+                    member_id=OuterRef("id"), start_date__gt=reference_date
+                )
+            )
+        )
+        .annotate(
+            contract_end_date=Max(
+                "subscription__end_date",
+                filter=Q(
+                    subscription__start_date__lte=reference_date,
+                    subscription__end_date__gte=reference_date,
+                ),
+            )
+        )
+        .filter(
+            contract_end_date__gte=reference_date,
+            contract_end_date__lte=contract_end_until,
+        )
+        .prefetch_related(
+            Prefetch(
+                "subscription_set",
+                queryset=get_active_subscriptions(reference_date).select_related(
+                    "product__type"
+                ),
+                to_attr="active_subscriptions",
+            )
+        )
+        .order_by("id")
+    )
+
+
+def send_contract_end_reminders(
+    reference_date: date = None,
+    contract_end_until: date = None,
+    member_ids: List[str] | None = None,
+) -> int:
+    """
+    Sends the contract end reminder to all due members that didn't get it yet for their contract end date.
+    The emails go through the outbox, which sends them in batches over a single SMTP connection.
+    The result is recorded per member and contract end date, so the job can run again without sending duplicates.
+    SENT means that the email was written to the outbox, not that the SMTP server accepted it: SMTP errors are
+    retried by the outbox and recorded on the EmailOutboxEntry. Reminders that failed before reaching the outbox
+    (e.g. while rendering the email) are recorded as FAILED and retried by the next run.
+
+    :param reference_date: the day the reminders are sent, today if None
+    :param contract_end_until: see get_members_due_for_contract_end_reminder
+    :param member_ids: only consider these members, all members if None
+    :return: the number of reminders written to the outbox
+    """
+    members = list(
+        get_members_due_for_contract_end_reminder(
+            reference_date, contract_end_until, member_ids
+        )
+    )
+    already_sent = set(
+        ContractEndReminder.objects.filter(
+            member_id__in=[member.id for member in members],
+            status=ContractEndReminder.STATUS_SENT,
+        ).values_list("member_id", "contract_end_date")
+    )
+    members = [
+        member
+        for member in members
+        if (member.id, member.contract_end_date) not in already_sent
+    ]
+    if not members:
+        return 0
+
+    subject = get_parameter_value(Parameter.EMAIL_CONTRACT_END_REMINDER_SUBJECT)
+    content = get_parameter_value(Parameter.EMAIL_CONTRACT_END_REMINDER_CONTENT)
+
+    sent_count = 0
+    for member in members:
+        try:
+            with transaction.atomic():
+                contract_list = format_subscription_list_html(
+                    member.active_subscriptions
+                )
+                send_email(
+                    to_email=[member.email],
+                    subject=subject,
+                    content=content,
+                    variables={"contract_list": contract_list, "member": member},
+                )
+                TransactionalTrigger.fire_action(
+                    Events.FINAL_PICKUP, member.email, {"contract_list": contract_list}
+                )
+                _record_result(member, ContractEndReminder.STATUS_SENT)
+        except Exception as e:
+            _record_result(member, ContractEndReminder.STATUS_FAILED, str(e))
+            continue
+        sent_count += 1
+
+    return sent_count
+
+
+def _record_result(member: Member, status: str, error_message: str = None):
+    ContractEndReminder.objects.update_or_create(
+        member_id=member.id,
+        contract_end_date=member.contract_end_date,
+        defaults={"status": status, "error_message": error_message},
+    )
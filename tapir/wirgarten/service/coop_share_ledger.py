@@ -0,0 +1,198 @@
+import itertools
+from datetime import date
+from typing import List
+
+from django.db import connection, transaction
+from django.db.models import F, Max, Min, Q, Sum
+
+from tapir.wirgarten.models import CoopShareLedger, CoopShareTransaction, Member
+from tapir.wirgarten.utils import get_now, get_today
+
+LEDGER_FIELDS = [
+    "quantity",
+    "total_value",
+    "entry_date",
+    "balance_valid_from",
+    "balance_valid_until",
+]
+
+_UPSERT_LEDGERS_SQL = f"""
+    INSERT INTO {CoopShareLedger._meta.db_table}
+        (member_id, {", ".join(LEDGER_FIELDS)}, updated_at)
+    VALUES {{values}}
+    ON CONFLICT (member_id) DO UPDATE SET
+        {", ".join(f"{field} = EXCLUDED.{field}" for field in LEDGER_FIELDS)},
+        updated_at = EXCLUDED.updated_at
+"""
+
+
+def build_coop_share_ledgers(
+    member_ids: List[str] | None = None, reference_date: date = None
+) -> List[CoopShareLedger]:
+    """
+    Calculates the coop share ledgers with one aggregate query, independent of the number of members.
+
+    :param member_ids: the members to calculate the ledger for, all members if None
+    :param reference_date: the date at which the balance is calculated, today if None
+    :return: unsaved CoopShareLedger instances, one per member
+    """
+    if reference_date is None:
+        reference_date = get_today()
+
+    transactions = CoopShareTransaction.objects.all()
+    members = Member.objects.all()
+    if member_ids is not None:
+        transactions = transactions.filter(member_id__in=member_ids)
+        members = members.filter(id__in=member_ids)
+
+    valid = Q(valid_at__lte=reference_date)
+    aggregates = {
+        row["member_id"]: row
+        for row in transactions.values("member_id").annotate(
+            ledger_quantity=Sum("quantity", filter=valid),
+            ledger_total_value=Sum(F("quantity") * F("share_price"), filter=valid),
+            ledger_entry_date=Min(
+                "valid_at",
+                filter=Q(
+                    transaction_type__in=[
+                        CoopShareTransaction.CoopShareTransactionType.PURCHASE,
+                        CoopShareTransaction.CoopShareTransactionType.TRANSFER_IN,
+                    ]
+                ),
+            ),
+            ledger_valid_from=Max("valid_at", filter=valid),
+            ledger_valid_until=Min("valid_at", filter=~valid),
+        )
+    }
+
+    ledgers = []
+    for member_id in members.values_list("id", flat=True):
+        row = aggregates.get(member_id, {})
+        ledgers.append(
+            CoopShareLedger(
+                member_id=member_id,
+                quantity=row.get("ledger_quantity") or 0,
+                total_value=row.get("ledger_total_value") or 0,
+                entry_date=row.get("ledger_entry_date"),
+                balance_valid_from=row.get("ledger_valid_from"),
+                balance_valid_until=row.get("ledger_valid_until"),
+            )
+        )
+    return ledgers
+
+
+@transaction.atomic
+def refresh_coop_share_ledger(member_id: str) -> CoopShareLedger:
+    """
+    Recalculates and stores the ledger of one member. The member row is locked first, so that concurrent transactions
+    of the same member are applied one after the other and the last write contains all of them.
+
+    :param member_id: the member to refresh the ledger for
+    :return: the stored ledger
+    """
+    Member.objects.select_for_update().filter(id=member_id).values_list(
+        "id", flat=True
+    ).first()
+    ledger = build_coop_share_ledgers([member_id])[0]
+    CoopShareLedger.objects.update_or_create(
+        member_id=member_id,
+        defaults={field: getattr(ledger, field) for field in LEDGER_FIELDS},
+    )
+    return ledger
+
+
+def rebuild_coop_share_ledgers(
+    member_ids: List[str] | None = None, batch_size: int = 1000
+) -> int:
+    """
+    Recalculates and stores the ledgers of many members. The rows are upserted (INSERT ... ON CONFLICT DO UPDATE),
+    so that readers never see a missing ledger while the rebuild runs.
+    The members are processed in batches. Each batch locks its member rows like refresh_coop_share_ledger before
+    reading the transactions, so a concurrent refresh of a member is never overwritten with older totals.
+
+    :param member_ids: the members to rebuild the ledger for, all members if None
+    :param batch_size: the number of members locked, calculated and upserted together
+    :return: the number of stored ledgers
+    """
+    if member_ids is None:
+        member_ids = list(Member.objects.order_by("id").values_list("id", flat=True))
+    else:
+        member_ids = sorted(member_ids)
+
+    count = 0
+    for i in range(0, len(member_ids), batch_size):
+        with transaction.atomic():
+            # locked in id order, so that concurrent rebuilds can't deadlock
+            locked_member_ids = list(
+                Member.objects.select_for_update()
+                .filter(id__in=member_ids[i : i + batch_size])
+                .order_by("id")
+                .values_list("id", flat=True)
+            )
+            ledgers = build_coop_share_ledgers(locked_member_ids)
+            _upsert_ledgers(ledgers)
+        count += len(ledgers)
+    return count
+
+
+def _upsert_ledgers(ledgers: List[CoopShareLedger]):
+    if not ledgers:
+        return
+    placeholders = "(" + ", ".join(["%s"] * (len(LEDGER_FIELDS) + 2)) + ")"
+    now = get_now()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            _UPSERT_LEDGERS_SQL.format(values=", ".join([placeholders] * len(ledgers))),
+            list(
+                itertools.chain.from_iterable(
+                    [ledger.member_id]
+                    + [getattr(ledger, field) for field in LEDGER_FIELDS]
+                    + [now]
+                    for ledger in ledgers
+                )
+            ),
+        )
+
+
+def get_coop_share_ledger(
+    member_id: str, reference_date: date = None
+) -> CoopShareLedger:
+    """
+    Returns the ledger of a member with a single primary key lookup.
+    Falls back to calculating it in memory if it is missing or if its balance is not valid at the reference date,
+    for example because a share purchase became valid since it was stored. The fallback does not write or lock
+    anything, the stored ledger is brought up to date by the nightly rebuild or the next transaction of the member.
+
+    :param member_id: the member to get the ledger for
+    :param reference_date: the date at which the balance must be valid, today if None
+    :return: the ledger
+    """
+    if reference_date is None:
+        reference_date = get_today()
+
+    ledger = CoopShareLedger.objects.filter(member_id=member_id).first()
+    if ledger is not None and ledger.is_balance_valid_at(reference_date):
+        return ledger
+    return build_coop_share_ledgers([member_id], reference_date)[0]
+
+
+def find_coop_share_ledger_differences() -> List[tuple[str, str, object, object]]:
+    """
+    Recalculates all ledgers and compares them with the stored ones.
+
+    :return: list of (member id, field name, stored value, expected value). A missing ledger counts as an empty one.
+    """
+    stored_ledgers = CoopShareLedger.objects.in_bulk()
+    differences = []
+    for expected in build_coop_share_ledgers():
+        stored = stored_ledgers.get(expected.member_id) or CoopShareLedger(
+            member_id=expected.member_id
+        )
+        for field in LEDGER_FIELDS:
+            stored_value = getattr(stored, field)
+            expected_value = getattr(expected, field)
+            if stored_value != expected_value:
+                differences.append(
+                    (expected.member_id, field, stored_value, expected_value)
+                )
+    return differences
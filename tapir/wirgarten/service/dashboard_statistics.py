@@ -0,0 +1,210 @@
+import datetime
+from datetime import date
+from typing import Callable
+
+from dateutil.relativedelta import relativedelta
+from django.core.cache import cache
+from django.db.models import (
+    Count,
+    DateField,
+    Exists,
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    Q,
+    Sum,
+)
+from django.db.models.functions import TruncMonth
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from tapir.wirgarten.models import (
+    CoopShareTransaction,
+    GrowingPeriod,
+    Member,
+    ProductCapacity,
+    ProductPrice,
+    QuestionaireCancellationReasonResponse,
+    QuestionaireTrafficSourceOption,
+    QuestionaireTrafficSourceResponse,
+    Subscription,
+    WaitingListEntry,
+)
+from tapir.wirgarten.service.cache_version import bump_version, get_version
+from tapir.wirgarten.utils import get_today
+
+DASHBOARD_VERSION_CACHE_KEY = "admin_dashboard_version"
+DASHBOARD_CONTEXT_CACHE_KEY = "admin_dashboard_context"
+DASHBOARD_CONTEXT_CACHE_TIMEOUT = 5 * 60
+
+KEY_NEW_SUBSCRIPTIONS = "new_subscriptions"
+KEY_CANCELLED_IN_TRIAL = "cancelled_in_trial"
+
+TRAFFIC_SOURCE_NO_RESPONSE = "Keine Angabe"
+
+
+def get_monthly_subscription_statistics(months: list[date]) -> dict[date, dict]:
+    """
+    Counts the subscriptions starting on the first day of the given months and how many of them were cancelled
+    in the trial period, with a single grouped query. Subscriptions starting on another day are not counted.
+
+    :param months: the first days of the months to count
+    :return: dict of month -> {KEY_NEW_SUBSCRIPTIONS: int, KEY_CANCELLED_IN_TRIAL: int}, months without subscriptions are 0
+    """
+    statistics = {
+        month: {KEY_NEW_SUBSCRIPTIONS: 0, KEY_CANCELLED_IN_TRIAL: 0} for month in months
+    }
+    if not months:
+        return statistics
+
+    rows = (
+        Subscription.objects.filter(start_date__in=months)
+        .annotate(
+            trial_end_date=ExpressionWrapper(
+                F("start_date") + datetime.timedelta(days=30),
+                output_field=DateField(),
+            ),
+        )
+        .values("start_date")
+        .annotate(
+            new_subscriptions=Count("id"),
+            cancelled_in_trial=Count(
+                "id",
+                filter=Q(
+                    cancellation_ts__isnull=False,
+                    cancellation_ts__lte=F("trial_end_date"),
+                ),
+            ),
+        )
+        .order_by()
+    )
+    for row in rows:
+        if row["start_date"] in statistics:
+            statistics[row["start_date"]] = {
+                KEY_NEW_SUBSCRIPTIONS: row[KEY_NEW_SUBSCRIPTIONS],
+                KEY_CANCELLED_IN_TRIAL: row[KEY_CANCELLED_IN_TRIAL],
+            }
+    return statistics
+
+
+def _month_start(month: date) -> datetime.datetime:
+    return timezone.make_aware(datetime.datetime.combine(month, datetime.time.min))
+
+
+def get_monthly_traffic_source_statistics(
+    months: list[date],
+) -> list[tuple[str, list[int]]]:
+    """
+    Counts the traffic source questionnaire responses per option and month. Members that registered in a month without
+    answering the questionnaire in that month are counted as TRAFFIC_SOURCE_NO_RESPONSE.
+    Both counts are grouped queries over a timestamp range, so the number of queries does not depend on the number of months or options.
+
+    :param months: the first days of the months to count, in the order of the result lists
+    :return: list of (option name, list of counts with one entry per month). Contains every option and TRAFFIC_SOURCE_NO_RESPONSE as last entry.
+    """
+    options = list(QuestionaireTrafficSourceOption.objects.order_by("name"))
+    counts_by_option_id = {option.id: [0] * len(months) for option in options}
+    no_response_counts = [0] * len(months)
+    if months:
+        month_indexes = {month: index for index, month in enumerate(months)}
+        start = _month_start(min(months))
+        end = _month_start(max(months) + relativedelta(months=1))
+
+        responses = (
+            QuestionaireTrafficSourceResponse.objects.filter(
+                timestamp__gte=start, timestamp__lt=end
+            )
+            .annotate(month=TruncMonth("timestamp", output_field=DateField()))
+            .values("month", "sources")
+            .annotate(count=Count("id", distinct=True))
+            .order_by()
+        )
+        for row in responses:
+            index = month_indexes.get(row["month"])
+            if index is not None and row["sources"] in counts_by_option_id:
+                counts_by_option_id[row["sources"]][index] = row["count"]
+
+        members_without_response = (
+            Member.objects.filter(created_at__gte=start, created_at__lt=end)
+            .annotate(month=TruncMonth("created_at", output_field=DateField()))
+            .annotate(
+                has_response=Exists(
+                    QuestionaireTrafficSourceResponse.objects.filter(
+                        member_id=OuterRef("id")
+                    )
+                    .annotate(month=TruncMonth("timestamp", output_field=DateField()))
+                    .filter(month=OuterRef("month"))
+                )
+            )
+            .filter(has_response=False)
+            .values("month")
+            .annotate(count=Count("id"))
+            .order_by()
+        )
+        for row in members_without_response:
+            index = month_indexes.get(row["month"])
+            if index is not None:
+                no_response_counts[index] = row["count"]
+
+    return [(option.name, counts_by_option_id[option.id]) for option in options] + [
+        (TRAFFIC_SOURCE_NO_RESPONSE, no_response_counts)
+    ]
+
+
+def count_members_with_coop_shares(reference_date: date = None) -> int:
+    """
+    Counts the members that own at least one coop share at the reference date, with one grouped aggregate.
+
+    :param reference_date: the date at which the coop shares must be valid, today if None
+    :return: the number of members
+    """
+    if reference_date is None:
+        reference_date = get_today()
+
+    return (
+        CoopShareTransaction.objects.filter(valid_at__lte=reference_date)
+        .values("member_id")
+        .annotate(quantity=Sum("quantity"))
+        .filter(quantity__gt=0)
+        .count()
+    )
+
+
+def get_cached_dashboard_context(build_context: Callable[[], dict]) -> dict:
+    """
+    Returns the admin dashboard context from the cache, or builds and caches it.
+    The cache is invalidated on changes of the underlying data and expires after a few minutes in any case.
+
+    :param build_context: function that calculates the context
+    :return: the dashboard context
+    """
+    version, _ = get_version(DASHBOARD_VERSION_CACHE_KEY)
+    cache_key = f"{DASHBOARD_CONTEXT_CACHE_KEY}:{version}:{get_today().isoformat()}"
+    context = cache.get(cache_key)
+    if context is None:
+        context = build_context()
+        cache.set(cache_key, context, DASHBOARD_CONTEXT_CACHE_TIMEOUT)
+    return context
+
+
+def invalidate_dashboard_context():
+    bump_version(DASHBOARD_VERSION_CACHE_KEY)
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+@receiver(post_save, sender=CoopShareTransaction)
+@receiver(post_delete, sender=CoopShareTransaction)
+@receiver(post_save, sender=GrowingPeriod)
+@receiver(post_delete, sender=GrowingPeriod)
+@receiver(post_save, sender=ProductCapacity)
+@receiver(post_delete, sender=ProductCapacity)
+@receiver(post_save, sender=ProductPrice)
+@receiver(post_delete, sender=ProductPrice)
+@receiver(post_save, sender=WaitingListEntry)
+@receiver(post_delete, sender=WaitingListEntry)
+@receiver(post_save, sender=QuestionaireCancellationReasonResponse)
+@receiver(post_save, sender=QuestionaireTrafficSourceResponse)
+def on_dashboard_relevant_change(sender, instance, **kwargs):
+    invalidate_dashboard_context()
@@ -1,19 +1,25 @@
+from collections import defaultdict
 from datetime import date
 from typing import List
 
 from dateutil.relativedelta import relativedelta
+from django.db import transaction
 
 from tapir.configuration.parameter import get_parameter_value
 from tapir.wirgarten.constants import EVEN_WEEKS, ODD_WEEKS, WEEKLY, NO_DELIVERY
 from tapir.wirgarten.models import (
+    Deliveries,
     GrowingPeriod,
     Member,
+    MemberPickupLocation,
     PickupLocation,
     PickupLocationCapability,
-    PickupLocationOpeningTime,
     ProductType,
+    Subscription,
 )
 from tapir.wirgarten.parameters import OPTIONS_WEEKDAYS, Parameter
+from tapir.wirgarten.service.calendar_context import get_calendar_context
+from tapir.wirgarten.service.opening_times import get_opening_times_registry
 from tapir.wirgarten.service.products import (
     get_active_product_types,
     get_future_subscriptions,
@@ -56,7 +62,7 @@ def get_next_delivery_date(reference_date: date = None, delivery_weekday: int =
         reference_date = get_today()
 
     if delivery_weekday is None:
-        delivery_weekday = get_parameter_value(Parameter.DELIVERY_DAY)
+        delivery_weekday = get_calendar_context().delivery_day
 
     if reference_date.weekday() > delivery_weekday:
         next_delivery = reference_date + relativedelta(
@@ -110,6 +116,7 @@ def generate_future_deliveries(member: Member, limit: int = None):
         return deliveries
 
     next_delivery_date = get_next_delivery_date()
+    opening_times_by_pickup_location = get_opening_times_registry()["opening_times"]
 
     subs = get_future_subscriptions().filter(member=member)
     while next_delivery_date <= last_growing_period.end_date and (
@@ -129,8 +136,8 @@ def generate_future_deliveries(member: Member, limit: int = None):
 
         if active_subs.count() > 0:
             pickup_location = member.get_pickup_location(next_delivery_date)
-            opening_times = PickupLocationOpeningTime.objects.filter(
-                pickup_location=pickup_location
+            opening_times = opening_times_by_pickup_location.get(
+                pickup_location.id if pickup_location else None, []
             )
             next_delivery_date += relativedelta(
                 days=(
@@ -198,3 +205,151 @@ def calculate_pickup_location_change_date(
     # If today > change_until_date, change happens after next_delivery
     else:
         return next_delivery_date + relativedelta(days=1)
+
+
+def get_member_ids_at_pickup_location(
+    pickup_location: str | PickupLocation, reference_date: date = None
+):
+    """
+    Members whose latest pickup location that is valid at the reference date is the given one.
+
+    :param pickup_location: the pickup location or its id
+    :param reference_date: the date at which the pickup location must be valid, today if None
+    :return: values queryset of member ids, to be used as subquery, e.g. filter(member_id__in=...)
+    """
+    if reference_date is None:
+        reference_date = get_today()
+
+    return (
+        MemberPickupLocation.objects.effective_at("member_id", reference_date)
+        .filter(pickup_location=pickup_location)
+        .values_list("member_id", flat=True)
+    )
+
+
+def get_pickup_location_ids_by_member(
+    reference_date: date, member_ids: List[str] | None = None
+) -> dict[str, str]:
+    """
+    Bulk version of Member.get_pickup_location: a single pickup location is always valid, otherwise the latest valid one.
+
+    :param reference_date: the date at which the pickup location must be valid
+    :param member_ids: the members to get the pickup location for, all members if None
+    :return: dict of member id -> pickup location id. Members without a valid pickup location are missing.
+    """
+    member_pickup_locations = MemberPickupLocation.objects.all()
+    if member_ids is not None:
+        member_pickup_locations = member_pickup_locations.filter(
+            member_id__in=member_ids
+        )
+
+    locations_by_member = defaultdict(list)
+    for member_id, pickup_location_id, valid_from in member_pickup_locations.order_by(
+        "member_id", "valid_from"
+    ).values_list("member_id", "pickup_location_id", "valid_from"):
+        locations_by_member[member_id].append((pickup_location_id, valid_from))
+
+    result = {}
+    for member_id, locations in locations_by_member.items():
+        if len(locations) == 1:
+            result[member_id] = locations[0][0]
+            continue
+        valid_locations = [
+            pickup_location_id
+            for pickup_location_id, valid_from in locations
+            if valid_from <= reference_date
+        ]
+        if valid_locations:
+            result[member_id] = valid_locations[-1]
+    return result
+
+
+def get_delivery_date_offsets_by_pickup_location() -> dict[str, int]:
+    """
+    Bulk version of PickupLocation.delivery_date_offset.
+
+    :return: dict of pickup location id -> days between the delivery day and the first opening day. Locations without opening times are missing.
+    """
+    delivery_day = get_parameter_value(Parameter.DELIVERY_DAY)
+    return {
+        pickup_location_id: min(
+            (opening_time.day_of_week - delivery_day) % 7
+            for opening_time in opening_times
+        )
+        for pickup_location_id, opening_times in get_opening_times_registry()[
+            "opening_times"
+        ].items()
+    }
+
+
+def build_deliveries(delivery_date: date) -> List[Deliveries]:
+    """
+    Builds one Deliveries row per member that receives products in the week of the given delivery date,
+    with a snapshot of the delivered products. Uses a fixed number of queries, independent of the number of members.
+
+    :param delivery_date: the regular delivery date (Parameter.DELIVERY_DAY) of the week
+    :return: unsaved Deliveries instances
+    """
+    _, week_num, _ = delivery_date.isocalendar()
+    even_week = week_num % 2 == 0
+
+    subscriptions = (
+        Subscription.objects.filter(
+            start_date__lte=delivery_date,
+            end_date__gte=delivery_date,
+            product__type__delivery_cycle__in=[
+                WEEKLY[0],
+                EVEN_WEEKS[0] if even_week else ODD_WEEKS[0],
+            ],
+        )
+        .order_by("member_id", "product__type__name", "product__name")
+        .values_list("member_id", "product__name", "product__type__name", "quantity")
+    )
+    products_by_member = defaultdict(list)
+    for member_id, product_name, product_type_name, quantity in subscriptions:
+        products_by_member[member_id].append(
+            {
+                "product_name": product_name,
+                "product_type_name": product_type_name,
+                "quantity": quantity,
+            }
+        )
+
+    pickup_location_ids = get_pickup_location_ids_by_member(
+        delivery_date, list(products_by_member.keys())
+    )
+    offsets = get_delivery_date_offsets_by_pickup_location()
+
+    deliveries = []
+    for member_id, products in products_by_member.items():
+        pickup_location_id = pickup_location_ids.get(member_id)
+        if pickup_location_id is None:
+            continue
+        deliveries.append(
+            Deliveries(
+                member_id=member_id,
+                delivery_date=delivery_date
+                + relativedelta(days=offsets.get(pickup_location_id, 0)),
+                pickup_location_id=pickup_location_id,
+                products=products,
+            )
+        )
+    return deliveries
+
+
+@transaction.atomic
+def record_deliveries(delivery_date: date) -> int:
+    """
+    Stores the delivery history for the week of the given delivery date. Already recorded deliveries are kept as they are,
+    so this can safely be run multiple times for the same week.
+
+    :param delivery_date: the regular delivery date (Parameter.DELIVERY_DAY) of the week
+    :return: the number of deliveries of that week
+    """
+    from tapir.wirgarten.service.member_page_cache import bump_global_version
+
+    deliveries = build_deliveries(delivery_date)
+    Deliveries.objects.bulk_create(deliveries, batch_size=1000, ignore_conflicts=True)
+    # bulk_create sends no signals, the delivery history on the member pages changed for many members
+    bump_global_version()
+    return len(deliveries)
@@ -1,22 +1,25 @@
 from datetime import datetime
+from string import Formatter
 from typing import List
 
 from dateutil.relativedelta import relativedelta
-from django.core.mail import EmailMultiAlternatives
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
 from django.template.loader import render_to_string
 
 from django.conf import settings
 from tapir.configuration.parameter import get_parameter_value
 from tapir.log.models import EmailLogEntry
-from tapir.wirgarten.models import Member
+from tapir.wirgarten.models import EmailOutboxEntry, Member
 from tapir.wirgarten.parameters import Parameter
 from tapir.wirgarten.service.delivery import generate_future_deliveries
-from tapir.wirgarten.utils import format_date, get_today
+from tapir.wirgarten.utils import format_date, get_now, get_today
 
 
-def send_email(to_email: List[str], subject: str, content: str, variables: dict = {}):
+def send_email(to_email: List[str], subject: str, content: str, variables: dict = None):
     """
     Send an email to a list of recipients. The email is sent as HTML using the email/email_base.html template.
+    The email is rendered immediately and stored in the outbox. It is sent by a celery task after the current transaction commits.
 
     :param to_email: list of email addresses
     :param subject: subject of the email
@@ -24,8 +27,9 @@ def send_email(to_email: List[str], subject: str, content: str, variables: dict
     :param variables: additional variables to be used in the email template
     """
 
-    variables.update(get_default_vars(to_email))
-    content = content.format(**variables)
+    content = content.format(
+        **resolve_template_variables(content, to_email, variables or {})
+    )
 
     email_body = render_to_string(
         "wirgarten/email/email_base.html",
@@ -37,10 +41,23 @@ def send_email(to_email: List[str], subject: str, content: str, variables: dict
         },
     )
 
+    EmailOutboxEntry.objects.create(
+        to_email=list(to_email), subject=subject, body=email_body
+    )
+    transaction.on_commit(_trigger_outbox_delivery)
+
+
+def _trigger_outbox_delivery():
+    from tapir.wirgarten.tasks import send_outbox_emails
+
+    send_outbox_emails.delay()
+
+
+def _build_email_message(entry: EmailOutboxEntry, connection) -> EmailMultiAlternatives:
     email = EmailMultiAlternatives(
-        subject=subject,
-        body=email_body,
-        to=to_email,
+        subject=entry.subject,
+        body=entry.body,
+        to=entry.to_email,
         bcc=(
             [settings.EMAIL_AUTO_BCC]
             if hasattr(settings, "EMAIL_AUTO_BCC") and settings.EMAIL_AUTO_BCC
@@ -50,55 +67,142 @@ def send_email(to_email: List[str], subject: str, content: str, variables: dict
         headers={
             "From": f"{get_parameter_value(Parameter.SITE_NAME)} <{settings.EMAIL_HOST_SENDER}>"
         },
+        connection=connection,
     )
     email.content_subtype = "html"
-    email.send()
+    return email
 
-    found_member = Member.objects.filter(email=to_email[0])
-    EmailLogEntry().populate(
-        email_message=email, user=found_member[0] if found_member.exists() else None
-    ).save()
 
+@transaction.atomic
+def send_outbox_emails(limit: int) -> int:
+    """
+    Sends up to `limit` pending emails from the outbox over a single SMTP connection.
+    Rows that are locked by a concurrent run are skipped, so every email is sent once.
+    Failed emails are retried by the next run until EmailOutboxEntry.MAX_ATTEMPTS is reached.
+
+    :param limit: the maximum number of emails to send
+    :return: the number of sent emails
+    """
+    entries = list(
+        EmailOutboxEntry.objects.select_for_update(skip_locked=True)
+        .filter(status=EmailOutboxEntry.STATUS_PENDING)
+        .order_by("created_at")[:limit]
+    )
+    if not entries:
+        return 0
+
+    members_by_email = {
+        member.email: member
+        for member in Member.objects.filter(
+            email__in={entry.to_email[0] for entry in entries if entry.to_email}
+        )
+    }
+
+    sent_count = 0
+    log_entries = []
+    with get_connection() as connection:
+        for entry in entries:
+            email = _build_email_message(entry, connection)
+            entry.attempts += 1
+            try:
+                email.send()
+            except Exception as e:
+                entry.error_message = str(e)
+                if entry.attempts >= EmailOutboxEntry.MAX_ATTEMPTS:
+                    entry.status = EmailOutboxEntry.STATUS_FAILED
+                continue
+
+            entry.status = EmailOutboxEntry.STATUS_SENT
+            entry.error_message = None
+            entry.sent_at = get_now()
+            sent_count += 1
+            log_entries.append(
+                EmailLogEntry().populate(
+                    email_message=email,
+                    user=members_by_email.get(entry.to_email[0]),
+                )
+            )
+
+    EmailOutboxEntry.objects.bulk_update(
+        entries, ["status", "attempts", "error_message", "sent_at"]
+    )
+    for log_entry in log_entries:
+        log_entry.save()
+
+    return sent_count
 
-# all the vars stuff will be deprecated as soon as the mail module is going in production
-def get_default_vars(to_email):
-    variables = add_member_vars(to_email)
-    variables.update(add_general_vars())
-    return variables
 
+def get_placeholder_names(content: str) -> set[str]:
+    """
+    Returns the names of the variables used in a str.format template, e.g. {"member", "site_name"} for "{member.first_name} {site_name}".
+    """
+    return {
+        field_name.split(".")[0].split("[")[0]
+        for _, field_name, _, _ in Formatter().parse(content)
+        if field_name
+    }
+
+
+def resolve_template_variables(content: str, to_email, variables: dict) -> dict:
+    """
+    Resolves only the default variables that are used in the content. Given variables take precedence.
+
+    :param content: the email content with str.format placeholders
+    :param to_email: list of email addresses, the first one is used to find the member
+    :param variables: variables provided by the caller
+    :return: the variables for content.format()
+    """
+    providers = {**get_general_var_providers(), **get_member_var_providers(to_email)}
 
-def add_general_vars():
+    resolved = {}
+    for name in get_placeholder_names(content):
+        if name in variables or name not in providers:
+            continue
+        resolved[name] = providers[name]()
+    resolved.update(variables)
+    return resolved
+
+
+# all the vars stuff will be deprecated as soon as the mail module is going in production
+def get_general_var_providers():
     today = get_today()
     return {
-        "year_current": today.year,
-        "year_next": (today + relativedelta(years=1)).year,
-        "year_overnext": (today + relativedelta(years=2)).year,
-        "admin_name": get_parameter_value(Parameter.SITE_ADMIN_NAME),
-        "site_name": get_parameter_value(Parameter.SITE_NAME),
-        "admin_telephone": get_parameter_value(Parameter.SITE_ADMIN_TELEPHONE),
-        "admin_image": get_parameter_value(Parameter.SITE_ADMIN_IMAGE),
-        "site_email": get_parameter_value(Parameter.SITE_EMAIL),
+        "year_current": lambda: today.year,
+        "year_next": lambda: (today + relativedelta(years=1)).year,
+        "year_overnext": lambda: (today + relativedelta(years=2)).year,
+        "admin_name": lambda: get_parameter_value(Parameter.SITE_ADMIN_NAME),
+        "site_name": lambda: get_parameter_value(Parameter.SITE_NAME),
+        "admin_telephone": lambda: get_parameter_value(Parameter.SITE_ADMIN_TELEPHONE),
+        "admin_image": lambda: get_parameter_value(Parameter.SITE_ADMIN_IMAGE),
+        "site_email": lambda: get_parameter_value(Parameter.SITE_EMAIL),
     }
 
 
-def add_member_vars(to_email):
-    try:
-        from tapir.wirgarten.models import Member
+def get_member_var_providers(to_email):
+    member_cache = {}
 
-        member = Member.objects.get(email=to_email[0])
+    def get_member():
+        if "member" not in member_cache:
+            member_cache["member"] = Member.objects.filter(email=to_email[0]).first()
+        return member_cache["member"]
+
+    def get_last_pickup_date():
+        member = get_member()
+        if member is None:
+            return None
         future_deliveries = generate_future_deliveries(member)
-        return {
-            "member": member,
-            # FIXME: return None is not optimal...
-            "last_pickup_date": (
-                format_date(
-                    datetime.strptime(
-                        future_deliveries[-1]["delivery_date"], "%Y-%m-%d"
-                    ).date()
-                )
-                if len(future_deliveries) > 0
-                else None
-            ),
-        }
-    except Member.DoesNotExist:
-        return {}
+        # FIXME: return None is not optimal...
+        return (
+            format_date(
+                datetime.strptime(
+                    future_deliveries[-1]["delivery_date"], "%Y-%m-%d"
+                ).date()
+            )
+            if len(future_deliveries) > 0
+            else None
+        )
+
+    return {
+        "member": get_member,
+        "last_pickup_date": get_last_pickup_date,
+    }
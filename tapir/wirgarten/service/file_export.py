@@ -88,3 +88,14 @@ def export_file(
         __send_email(file, to_email_custom)
 
     return file
+
+
+def send_exported_file(file_id: str, to_email_custom: str | None = None):
+    """
+    Sends an already exported file per email, like export_file(send_email=True). Used to send the email outside of the export transaction.
+
+    :param file_id: the id of the ExportedFile
+    :param to_email_custom: Comma seperated list of recipient email addresses, the admin email address if None
+    """
+
+    __send_email(ExportedFile.objects.get(id=file_id), to_email_custom)
@@ -31,9 +31,7 @@ from tapir.wirgarten.service.products import (
     get_future_subscriptions,
     get_active_subscriptions,
 )
-from tapir.wirgarten.service.tasks import schedule_task_unique
 from tapir.wirgarten.tapirmail import Events
-from tapir.wirgarten.tasks import send_email_member_contract_end_reminder
 from tapir.wirgarten.utils import (
     format_date,
     format_subscription_list_html,
@@ -333,18 +331,6 @@ def send_cancellation_confirmation_email(
     if revoke_coop_membership:
         contract_list += "\n- Beitrittserklärung zur Genossenschaft"
 
-    future_subs = get_future_subscriptions(
-        contract_end_date + relativedelta(days=1)
-    ).filter(member_id=member_id)
-    if (
-        not future_subs.exists()
-    ):  # only schedule contract end reminder if the member has no other contracts left
-        schedule_task_unique(
-            task=send_email_member_contract_end_reminder,
-            eta=contract_end_date,
-            kwargs={"member_id": member_id},
-        )
-
     future_deliveries = generate_future_deliveries(member)
 
     last_pickup_date = "Letzte Abholung schon vergangen"
@@ -389,8 +375,6 @@ def send_contract_change_confirmation(member: Member, subs: List[Subscription]):
 
     contract_start_date = subs[0].start_date
 
-    future_deliveries = generate_future_deliveries(member)
-
     send_email(
         to_email=[member.email],
         subject=get_parameter_value(
@@ -422,16 +406,6 @@ def send_contract_change_confirmation(member: Member, subs: List[Subscription]):
         },
     )
 
-    last_delivery_date = datetime.strptime(
-        future_deliveries[-1]["delivery_date"], "%Y-%m-%d"
-    ).date()
-
-    schedule_task_unique(
-        task=send_email_member_contract_end_reminder,
-        eta=last_delivery_date + relativedelta(days=1),
-        kwargs={"member_id": member.id},
-    )
-
 
 def send_order_confirmation(member: Member, subs: List[Subscription]):
     if not len(subs):
@@ -469,13 +443,3 @@ def send_order_confirmation(member: Member, subs: List[Subscription]):
             "contract_list": format_subscription_list_html(subs),
         },
     )
-
-    last_delivery_date = datetime.strptime(
-        future_deliveries[-1]["delivery_date"], "%Y-%m-%d"
-    ).date()
-
-    schedule_task_unique(
-        task=send_email_member_contract_end_reminder,
-        eta=last_delivery_date + relativedelta(days=1),
-        kwargs={"member_id": member.id},
-    )
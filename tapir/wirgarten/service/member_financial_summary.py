@@ -0,0 +1,180 @@
+import itertools
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from tapir.wirgarten.models import (
+    CoopShareTransaction,
+    Member,
+    MemberFinancialSummary,
+    MemberPickupLocation,
+    ProductPrice,
+    Subscription,
+)
+from tapir.wirgarten.service.delivery import get_pickup_location_ids_by_member
+from tapir.wirgarten.service.products import (
+    ProductPriceLookup,
+    get_active_subscriptions,
+)
+from tapir.wirgarten.utils import get_now, get_today
+
+
+_UPSERT_SUMMARIES_SQL = f"""
+    INSERT INTO {MemberFinancialSummary._meta.db_table}
+        (member_id, coop_shares_total_value, monthly_payment, pickup_location_id, updated_at)
+    VALUES {{values}}
+    ON CONFLICT (member_id) DO UPDATE SET
+        coop_shares_total_value = EXCLUDED.coop_shares_total_value,
+        monthly_payment = EXCLUDED.monthly_payment,
+        pickup_location_id = EXCLUDED.pickup_location_id,
+        updated_at = EXCLUDED.updated_at
+"""
+
+
+def _filter_members(queryset, member_ids, field="member_id"):
+    if member_ids is None:
+        return queryset
+    return queryset.filter(**{f"{field}__in": member_ids})
+
+
+def build_member_financial_summaries(
+    member_ids: list[str] | None = None, reference_date: date = None
+) -> list[MemberFinancialSummary]:
+    """
+    Calculates the financial summaries with a fixed number of queries, independent of the number of members.
+
+    :param member_ids: the members to calculate the summary for, all members if None
+    :param reference_date: the date for which the summary is calculated, today if None
+    :return: unsaved MemberFinancialSummary instances
+    """
+    if reference_date is None:
+        reference_date = get_today()
+
+    # coop shares becoming valid in the next 2 months are included, so that new members which will join the coop soon show up in the list
+    coop_shares_valid_until = reference_date + relativedelta(months=2)
+    coop_shares_total_values = dict(
+        _filter_members(
+            CoopShareTransaction.objects.filter(valid_at__lte=coop_shares_valid_until),
+            member_ids,
+        )
+        .values("member_id")
+        .annotate(total_value=Sum(F("quantity") * F("share_price")))
+        .values_list("member_id", "total_value")
+    )
+
+    monthly_payments = defaultdict(Decimal)
+    subscriptions = list(
+        _filter_members(get_active_subscriptions(reference_date), member_ids).only(
+            "member_id",
+            "product_id",
+            "start_date",
+            "quantity",
+            "solidarity_price",
+            "solidarity_price_absolute",
+            "price_override",
+        )
+    )
+    product_prices = ProductPriceLookup(
+        {subscription.product_id for subscription in subscriptions}
+    )
+    for subscription in subscriptions:
+        monthly_payments[subscription.member_id] += Decimal(
+            str(
+                product_prices.get_subscription_total_price(
+                    subscription, reference_date
+                )
+            )
+        )
+
+    pickup_location_ids = get_pickup_location_ids_by_member(reference_date, member_ids)
+
+    return [
+        MemberFinancialSummary(
+            member_id=member_id,
+            coop_shares_total_value=coop_shares_total_values.get(member_id) or 0,
+            monthly_payment=monthly_payments.get(member_id, 0),
+            pickup_location_id=pickup_location_ids.get(member_id),
+        )
+        for member_id in _filter_members(
+            Member.objects.all(), member_ids, field="id"
+        ).values_list("id", flat=True)
+    ]
+
+
+def refresh_member_financial_summaries(
+    member_ids: list[str] | None = None, batch_size: int = 1000
+):
+    """
+    Recalculates and stores the financial summaries. The rows are upserted (INSERT ... ON CONFLICT DO UPDATE),
+    so that the nightly rebuild and the refreshes of single members can run at the same time.
+    Summaries of deleted members are removed by the cascade of the member foreign key.
+
+    :param member_ids: the members to refresh, all members if None
+    :param batch_size: the maximum number of summaries upserted per statement
+    """
+    summaries = build_member_financial_summaries(member_ids)
+    now = get_now()
+    with transaction.atomic(), connection.cursor() as cursor:
+        for i in range(0, len(summaries), batch_size):
+            batch = summaries[i : i + batch_size]
+            cursor.execute(
+                _UPSERT_SUMMARIES_SQL.format(
+                    values=", ".join(["(%s, %s, %s, %s, %s)"] * len(batch))
+                ),
+                list(
+                    itertools.chain.from_iterable(
+                        [
+                            summary.member_id,
+                            summary.coop_shares_total_value,
+                            summary.monthly_payment,
+                            summary.pickup_location_id,
+                            now,
+                        ]
+                        for summary in batch
+                    )
+                ),
+            )
+
+
+def _refresh_on_commit(get_member_ids):
+    transaction.on_commit(
+        lambda: refresh_member_financial_summaries(list(get_member_ids()))
+    )
+
+
+def refresh_member_financial_summary_on_commit(member_id: str):
+    """
+    Refreshes the summary of a member after the current transaction commits.
+    Must be called after writes that send no signals, e.g. Subscription.objects.bulk_create.
+    """
+    _refresh_on_commit(lambda: [member_id])
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+@receiver(post_save, sender=CoopShareTransaction)
+@receiver(post_delete, sender=CoopShareTransaction)
+@receiver(post_save, sender=MemberPickupLocation)
+@receiver(post_delete, sender=MemberPickupLocation)
+def on_member_related_change(sender, instance, **kwargs):
+    member_id = instance.member_id
+    _refresh_on_commit(lambda: [member_id])
+
+
+@receiver(post_save, sender=ProductPrice)
+@receiver(post_delete, sender=ProductPrice)
+def on_product_price_change(sender, instance, **kwargs):
+    product_id = instance.product_id
+    _refresh_on_commit(
+        lambda: Subscription.objects.filter(
+            product_id=product_id, end_date__gte=get_today()
+        )
+        .values_list("member_id", flat=True)
+        .distinct()
+    )
@@ -0,0 +1,108 @@
+from datetime import date
+from typing import List
+
+from django.db import connection, transaction
+from django.db.models import Min, Q, Sum
+from tapir_mail.triggers.transactional_trigger import TransactionalTrigger
+
+from tapir.wirgarten.models import CoopShareTransaction, Member
+from tapir.wirgarten.service.member_page_cache import bump_member_versions
+from tapir.wirgarten.tapirmail import Events
+from tapir.wirgarten.utils import get_today
+
+# arbitrary constant that identifies the advisory lock of the member number assignment
+MEMBER_NO_LOCK_ID = 7_240_001
+
+
+def get_members_eligible_for_member_no(reference_date: date = None):
+    """
+    Selects the members without member number whose coop membership has started, with a single annotated query.
+
+    :param reference_date: the date at which the membership must have started, today if None
+    :return: the members, sorted by coop entry date and creation time
+    """
+    if reference_date is None:
+        reference_date = get_today()
+
+    return (
+        Member.objects.filter(member_no__isnull=True)
+        .annotate(
+            eligible_coop_shares_quantity=Sum(
+                "coopsharetransaction__quantity",
+                filter=Q(coopsharetransaction__valid_at__lte=reference_date),
+            ),
+            eligible_coop_entry_date=Min(
+                "coopsharetransaction__valid_at",
+                filter=Q(
+                    coopsharetransaction__transaction_type__in=[
+                        CoopShareTransaction.CoopShareTransactionType.PURCHASE,
+                        CoopShareTransaction.CoopShareTransactionType.TRANSFER_IN,
+                    ]
+                ),
+            ),
+        )
+        .filter(
+            eligible_coop_shares_quantity__gt=0,
+            eligible_coop_entry_date__lte=reference_date,
+        )
+        .order_by("eligible_coop_entry_date", "created_at", "id")
+    )
+
+
+def reserve_member_numbers(count: int) -> List[int]:
+    """
+    Returns the next free member numbers after the highest existing one. Must be called inside a transaction:
+    the numbers are handed out under a transaction level advisory lock, so concurrent callers wait for each other
+    until the numbers are committed instead of getting the same numbers.
+
+    :param count: how many numbers to reserve
+    :return: the numbers in ascending order
+    """
+    if count == 0:
+        return []
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [MEMBER_NO_LOCK_ID])
+        cursor.execute(
+            f"SELECT COALESCE(MAX(member_no), 0) FROM {Member._meta.db_table}"
+        )
+        max_member_no = cursor.fetchone()[0]
+    return list(range(max_member_no + 1, max_member_no + count + 1))
+
+
+@transaction.atomic
+def assign_member_numbers(reference_date: date = None) -> List[Member]:
+    """
+    Gives a member number to all members whose coop membership has started and fires the membership entry mail
+    for each of them once the numbers are committed.
+    The numbers are written with bulk_update, which skips Member.save and with it the Keycloak synchronisation:
+    the member number is not stored in Keycloak.
+
+    :param reference_date: the date at which the membership must have started, today if None
+    :return: the members that got a number
+    """
+    member_ids = list(
+        get_members_eligible_for_member_no(reference_date).values_list("id", flat=True)
+    )
+    # FOR UPDATE can't be combined with the aggregation, so the members are locked in a second query.
+    # Members that got a number from a concurrent call in between are skipped.
+    locked_members = Member.objects.select_for_update().in_bulk(member_ids)
+    members = [
+        locked_members[member_id]
+        for member_id in member_ids
+        if member_id in locked_members and locked_members[member_id].member_no is None
+    ]
+    for member, member_no in zip(members, reserve_member_numbers(len(members))):
+        member.member_no = member_no
+    Member.objects.bulk_update(members, ["member_no"], batch_size=500)
+    # bulk_update sends no signals
+    bump_member_versions([member.id for member in members])
+
+    emails = [member.email for member in members]
+    transaction.on_commit(lambda: fire_membership_entry_triggers(emails))
+    return members
+
+
+def fire_membership_entry_triggers(emails: List[str]):
+    for email in emails:
+        TransactionalTrigger.fire_action(Events.MEMBERSHIP_ENTRY, email)
@@ -0,0 +1,158 @@
+import datetime
+from typing import Callable
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from tapir.accounts.models import EmailChangeRequest
+from tapir.configuration.models import TapirParameter
+from tapir.configuration.parameter import parameters_changed
+from tapir.wirgarten.models import (
+    CoopShareTransaction,
+    GrowingPeriod,
+    Member,
+    MemberPickupLocation,
+    Payment,
+    PickupLocation,
+    PickupLocationOpeningTime,
+    Product,
+    ProductPrice,
+    ProductType,
+    Subscription,
+    WaitingListEntry,
+)
+from tapir.wirgarten.service.cache_version import bump_version, get_version
+from tapir.wirgarten.utils import get_today
+
+MEMBER_VERSION_CACHE_KEY = "member_page_version"
+GLOBAL_VERSION_CACHE_KEY = "member_page_version:global"
+FRAGMENT_CACHE_KEY = "member_page_fragment"
+FRAGMENT_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def bump_member_version(member_id: str):
+    """
+    Marks the member pages of one member as changed.
+    """
+    bump_version(f"{MEMBER_VERSION_CACHE_KEY}:{member_id}")
+
+
+def bump_member_versions(member_ids):
+    """
+    Marks the member pages of the given members as changed. For writes that send no signals, e.g. queryset updates.
+    """
+    for member_id in set(member_ids):
+        bump_member_version(member_id)
+
+
+def bump_global_version():
+    """
+    Marks the member pages of all members as changed, e.g. after product prices or pickup locations changed.
+    """
+    bump_version(GLOBAL_VERSION_CACHE_KEY)
+
+
+def get_member_page_version(member_id: str) -> tuple[str, int]:
+    """
+    The version of the member pages of a member. The pages also depend on the current date, so the version changes every day.
+
+    :param member_id: the member
+    :return: (version string, last modification time as unix timestamp)
+    """
+    member_token, member_modified = get_version(
+        f"{MEMBER_VERSION_CACHE_KEY}:{member_id}"
+    )
+    global_token, global_modified = get_version(GLOBAL_VERSION_CACHE_KEY)
+    today = get_today()
+    start_of_today = int(
+        timezone.make_aware(
+            datetime.datetime.combine(today, datetime.time.min)
+        ).timestamp()
+    )
+    return (
+        f"{member_token}-{global_token}-{today.isoformat()}",
+        max(member_modified, global_modified, start_of_today),
+    )
+
+
+def get_member_fragment(member_id: str, name: str, build: Callable[[], object]):
+    """
+    Returns an expensive part of a member page from the cache, or builds and caches it.
+    The cache key contains the member page version, so the fragment is rebuilt as soon as the member's data changes.
+
+    :param member_id: the member
+    :param name: unique name of the fragment
+    :param build: function that calculates the fragment. The result must be picklable.
+    :return: the fragment
+    """
+    version, _ = get_member_page_version(member_id)
+    cache_key = f"{FRAGMENT_CACHE_KEY}:{name}:{member_id}:{version}"
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached[0]
+    fragment = build()
+    # wrapped in a tuple, so that None results are cached as well
+    cache.set(cache_key, (fragment,), FRAGMENT_CACHE_TIMEOUT)
+    return fragment
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+@receiver(post_save, sender=CoopShareTransaction)
+@receiver(post_delete, sender=CoopShareTransaction)
+@receiver(post_save, sender=MemberPickupLocation)
+@receiver(post_delete, sender=MemberPickupLocation)
+def on_member_data_change(sender, instance, **kwargs):
+    bump_member_version(instance.member_id)
+
+
+@receiver(post_save, sender=Member)
+@receiver(post_delete, sender=Member)
+def on_member_change(sender, instance, **kwargs):
+    bump_member_version(instance.id)
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def on_payment_change(sender, instance, **kwargs):
+    bump_member_version(instance.mandate_ref.member_id)
+
+
+@receiver(post_save, sender=EmailChangeRequest)
+@receiver(post_delete, sender=EmailChangeRequest)
+def on_email_change_request_change(sender, instance, **kwargs):
+    bump_member_version(instance.user_id)
+
+
+@receiver(post_save, sender=WaitingListEntry)
+@receiver(post_delete, sender=WaitingListEntry)
+def on_waiting_list_entry_change(sender, instance, **kwargs):
+    # waiting list entries are matched by email on the member pages, the member is not always set
+    if instance.member_id is not None:
+        bump_member_version(instance.member_id)
+    else:
+        bump_global_version()
+
+
+@receiver(post_save, sender=ProductPrice)
+@receiver(post_delete, sender=ProductPrice)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductType)
+@receiver(post_delete, sender=ProductType)
+@receiver(post_save, sender=GrowingPeriod)
+@receiver(post_delete, sender=GrowingPeriod)
+@receiver(post_save, sender=PickupLocation)
+@receiver(post_delete, sender=PickupLocation)
+@receiver(post_save, sender=PickupLocationOpeningTime)
+@receiver(post_delete, sender=PickupLocationOpeningTime)
+@receiver(post_save, sender=TapirParameter)
+def on_global_data_change(sender, instance, **kwargs):
+    bump_global_version()
+
+
+@receiver(parameters_changed)
+def on_parameters_changed(sender, keys, **kwargs):
+    bump_global_version()
@@ -0,0 +1,166 @@
+import itertools
+from datetime import date
+
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from tapir.wirgarten.models import (
+    CoopShareTransaction,
+    Member,
+    MemberPickupLocation,
+    MemberSegmentMembership,
+    Subscription,
+)
+from tapir.wirgarten.service.delivery import get_pickup_location_ids_by_member
+from tapir.wirgarten.service.products import get_active_subscriptions
+from tapir.wirgarten.utils import get_today
+
+
+_UPSERT_MEMBERSHIPS_SQL = f"""
+    INSERT INTO {MemberSegmentMembership._meta.db_table}
+        (member_id, is_coop_member, has_active_subscription, pickup_location_id, valid_for)
+    VALUES {{values}}
+    ON CONFLICT (member_id) DO UPDATE SET
+        is_coop_member = EXCLUDED.is_coop_member,
+        has_active_subscription = EXCLUDED.has_active_subscription,
+        pickup_location_id = EXCLUDED.pickup_location_id,
+        valid_for = EXCLUDED.valid_for
+"""
+
+
+def _filter_members(queryset, member_ids, field="member_id"):
+    if member_ids is None:
+        return queryset
+    return queryset.filter(**{f"{field}__in": member_ids})
+
+
+def build_member_segment_memberships(
+    member_ids: list[str] | None = None, reference_date: date = None
+) -> list[MemberSegmentMembership]:
+    """
+    Calculates the segment flags with a fixed number of queries, independent of the number of members.
+    Same results as MemberQuerySet.with_shares, MemberQuerySet.with_active_subscription and Member.get_pickup_location.
+
+    :param member_ids: the members to calculate the flags for, all members if None
+    :param reference_date: the date for which the flags are calculated, today if None
+    :return: unsaved MemberSegmentMembership instances
+    """
+    if reference_date is None:
+        reference_date = get_today()
+
+    coop_member_ids = set(
+        _filter_members(
+            CoopShareTransaction.objects.filter(valid_at__lte=reference_date),
+            member_ids,
+        )
+        .values("member_id")
+        .annotate(total_shares=Sum("quantity"))
+        .filter(total_shares__gte=1)
+        .values_list("member_id", flat=True)
+    )
+    subscribed_member_ids = set(
+        _filter_members(get_active_subscriptions(reference_date), member_ids)
+        .values_list("member_id", flat=True)
+        .distinct()
+    )
+    pickup_location_ids = get_pickup_location_ids_by_member(reference_date, member_ids)
+
+    return [
+        MemberSegmentMembership(
+            member_id=member_id,
+            is_coop_member=member_id in coop_member_ids,
+            has_active_subscription=member_id in subscribed_member_ids,
+            pickup_location_id=pickup_location_ids.get(member_id),
+            valid_for=reference_date,
+        )
+        for member_id in _filter_members(
+            Member.objects.all(), member_ids, field="id"
+        ).values_list("id", flat=True)
+    ]
+
+
+def refresh_member_segment_memberships(
+    member_ids: list[str] | None = None, batch_size: int = 1000
+):
+    """
+    Recalculates and stores the segment flags. The rows are upserted (INSERT ... ON CONFLICT DO UPDATE),
+    so that concurrent refreshes of the same members don't fail and the last one wins.
+    Flags of deleted members are removed by the cascade of the member foreign key.
+
+    :param member_ids: the members to refresh, all members if None
+    :param batch_size: the maximum number of rows upserted per statement
+    """
+    memberships = build_member_segment_memberships(member_ids)
+    with transaction.atomic(), connection.cursor() as cursor:
+        for i in range(0, len(memberships), batch_size):
+            batch = memberships[i : i + batch_size]
+            cursor.execute(
+                _UPSERT_MEMBERSHIPS_SQL.format(
+                    values=", ".join(["(%s, %s, %s, %s, %s)"] * len(batch))
+                ),
+                list(
+                    itertools.chain.from_iterable(
+                        [
+                            membership.member_id,
+                            membership.is_coop_member,
+                            membership.has_active_subscription,
+                            membership.pickup_location_id,
+                            membership.valid_for,
+                        ]
+                        for membership in batch
+                    )
+                ),
+            )
+
+
+def ensure_member_segment_memberships():
+    """
+    Makes sure that the segment flags are correct for today before segments are resolved:
+    after the day rollover all flags are recalculated, members without flags (e.g. created by a bulk insert) get theirs.
+    Usually the nightly task and the signals below did that already and this only costs two indexed queries.
+    """
+    today = get_today()
+    if MemberSegmentMembership.objects.filter(valid_for__lt=today).exists():
+        refresh_member_segment_memberships()
+        return
+
+    missing_member_ids = list(
+        Member.objects.filter(segment_membership__isnull=True).values_list(
+            "id", flat=True
+        )
+    )
+    if missing_member_ids:
+        refresh_member_segment_memberships(missing_member_ids)
+
+
+def get_members_in_segment(**flags):
+    """
+    :param flags: filters on the MemberSegmentMembership fields, e.g. is_coop_member=True
+    :return: the members whose flags match, as a single indexed join
+    """
+    ensure_member_segment_memberships()
+    return Member.objects.filter(
+        **{f"segment_membership__{field}": value for field, value in flags.items()}
+    )
+
+
+def _refresh_on_commit(member_id):
+    transaction.on_commit(lambda: refresh_member_segment_memberships([member_id]))
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+@receiver(post_save, sender=CoopShareTransaction)
+@receiver(post_delete, sender=CoopShareTransaction)
+@receiver(post_save, sender=MemberPickupLocation)
+@receiver(post_delete, sender=MemberPickupLocation)
+def on_member_related_change(sender, instance, **kwargs):
+    _refresh_on_commit(instance.member_id)
+
+
+@receiver(post_save, sender=Member)
+def on_member_created(sender, instance, created, **kwargs):
+    if created:
+        _refresh_on_commit(instance.id)
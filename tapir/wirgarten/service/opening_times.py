@@ -0,0 +1,95 @@
+from collections import defaultdict
+from datetime import time
+from typing import NamedTuple
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from tapir.wirgarten.models import PickupLocation, PickupLocationOpeningTime
+from tapir.wirgarten.service.cache_version import bump_version, get_version
+
+OPENING_TIMES_VERSION_CACHE_KEY = "pickup_location_opening_times_version"
+OPENING_TIMES_CACHE_KEY = "pickup_location_opening_times"
+# entries of old versions are never read again, they expire instead of filling the cache
+OPENING_TIMES_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+class OpeningTime(NamedTuple):
+    day_of_week: int
+    open_time: time
+    close_time: time
+
+
+def _build_registry() -> dict:
+    opening_times = defaultdict(list)
+    for (
+        day_of_week,
+        open_time,
+        close_time,
+        pickup_location_id,
+    ) in PickupLocationOpeningTime.objects.order_by(
+        "day_of_week", "open_time"
+    ).values_list(
+        "day_of_week", "open_time", "close_time", "pickup_location_id"
+    ):
+        opening_times[pickup_location_id].append(
+            OpeningTime(day_of_week, open_time, close_time)
+        )
+
+    return {
+        "opening_times": dict(opening_times),
+        "html": {
+            pickup_location_id: PickupLocation.render_opening_times_html(times)
+            for pickup_location_id, times in opening_times.items()
+        },
+    }
+
+
+def get_opening_times_registry() -> dict:
+    """
+    Loads the opening times of all pickup locations with a single query and renders their HTML once.
+    The result is cached for a day or until opening times are saved or deleted, see invalidate_opening_times.
+
+    :return: dict with "opening_times" (pickup location id -> list of OpeningTime sorted by day)
+        and "html" (pickup location id -> rendered opening times). Locations without opening times are missing.
+    """
+    version, _ = get_version(OPENING_TIMES_VERSION_CACHE_KEY)
+    cache_key = f"{OPENING_TIMES_CACHE_KEY}:{version}"
+    registry = cache.get(cache_key)
+    if registry is None:
+        registry = _build_registry()
+        cache.set(cache_key, registry, OPENING_TIMES_CACHE_TIMEOUT)
+    return registry
+
+
+def get_opening_times(pickup_location_id: str) -> list[OpeningTime]:
+    """
+    :param pickup_location_id: the pickup location
+    :return: the opening times of the location sorted by day, empty if it has none
+    """
+    return get_opening_times_registry()["opening_times"].get(pickup_location_id, [])
+
+
+def get_opening_times_html(pickup_location_id: str) -> str:
+    """
+    :param pickup_location_id: the pickup location
+    :return: same as PickupLocation.opening_times_html
+    """
+    html = get_opening_times_registry()["html"].get(pickup_location_id)
+    if html is None:
+        html = PickupLocation.render_opening_times_html([])
+    return html
+
+
+def invalidate_opening_times():
+    """
+    Marks the cached opening times as outdated. Called automatically when opening times are saved or deleted.
+    """
+    bump_version(OPENING_TIMES_VERSION_CACHE_KEY)
+
+
+@receiver(post_save, sender=PickupLocationOpeningTime)
+@receiver(post_delete, sender=PickupLocationOpeningTime)
+def on_opening_time_change(sender, instance, **kwargs):
+    invalidate_opening_times()
@@ -7,15 +7,13 @@ from django.db.models import Sum
 from nanoid import generate
 from unidecode import unidecode
 
-from tapir.configuration.parameter import get_parameter_value
 from tapir.wirgarten.models import Member, Payment, ProductType, Subscription
-from tapir.wirgarten.parameters import Parameter
+from tapir.wirgarten.service.calendar_context import get_calendar_context
 from tapir.wirgarten.service.products import (
     get_active_subscriptions,
-    get_future_subscriptions,
-    get_product_price,
     product_type_order_by,
 )
+from tapir.wirgarten.service.solidarity import KEY_TOTAL, get_solidarity_ledger
 from tapir.wirgarten.utils import get_today
 
 MANDATE_REF_LENGTH = 35
@@ -52,7 +50,7 @@ def get_next_payment_date(reference_date: date = None):
     if reference_date is None:
         reference_date = get_today()
 
-    due_day = get_parameter_value(Parameter.PAYMENT_DUE_DAY)
+    due_day = get_calendar_context().payment_due_day
 
     if reference_date.day < due_day:
         next_payment = reference_date.replace(day=due_day)
@@ -70,9 +68,11 @@ def generate_new_payments(due_date: date) -> list[Payment]:
     """
     payments = []
 
-    subscriptions = Subscription.objects.filter(
-        start_date__lte=due_date, end_date__gte=due_date
-    ).order_by("mandate_ref", "product__type")
+    subscriptions = (
+        Subscription.objects.filter(start_date__lte=due_date, end_date__gte=due_date)
+        .select_related("mandate_ref", "product__type")
+        .order_by("mandate_ref", "product__type")
+    )
 
     grouped = {}
     for sub in subscriptions:
@@ -81,11 +81,15 @@ def generate_new_payments(due_date: date) -> list[Payment]:
             grouped[key] = []
         grouped[key].append(sub)
 
-    for (mandate_ref, product_type), subs in grouped.items():
-        existing = Payment.objects.filter(
-            mandate_ref=mandate_ref, due_date=due_date, type=product_type.name
+    existing_payments = {}
+    for payment in Payment.objects.filter(due_date=due_date):
+        existing_payments.setdefault((payment.mandate_ref_id, payment.type), []).append(
+            payment
         )
-        if not existing.exists():
+
+    for (mandate_ref, product_type), subs in grouped.items():
+        existing = existing_payments.get((mandate_ref.id, product_type.name))
+        if not existing:
             amount = sum(sub.total_price() for sub in subs)
 
             payments.append(
@@ -172,22 +176,10 @@ def get_automatically_calculated_solidarity_excess(
     reference_date: date = None,
 ) -> float:
     """
-    Returns the total solidarity price sum for the active subscriptions during the reference date.
+    Returns the total solidarity price sum (relative and absolute) for the active and future subscriptions during the reference date.
 
     :param reference_date: the date for which the subscription is active
     :return: the total solidarity overplus amount
     """
 
-    if reference_date is None:
-        reference_date = get_today()
-
-    return sum(
-        map(
-            lambda sub: sub["quantity"]
-            * sub["solidarity_price"]
-            * float(get_product_price(sub["product"]).price),
-            get_future_subscriptions(reference_date).values(
-                "quantity", "product", "solidarity_price"
-            ),
-        )
-    )
+    return float(get_solidarity_ledger(reference_date)[KEY_TOTAL])
@@ -0,0 +1,140 @@
+from datetime import date
+from typing import List
+
+from django.db import transaction
+
+from tapir.wirgarten.models import ExportedFile, Payment, PaymentTransaction
+from tapir.wirgarten.service.file_export import begin_csv_string, export_file
+from tapir.wirgarten.service.member_page_cache import bump_global_version
+from tapir.wirgarten.service.payment import generate_new_payments
+from tapir.wirgarten.service.payment_timeline import COOP_SHARES_PAYMENT_TYPE
+from tapir.wirgarten.service.products import get_active_product_types
+from tapir.wirgarten.utils import format_date
+
+# name of the coop share payments in the exported file and the transaction
+COOP_SHARES_EXPORT_NAME = "Geschäftsanteile"
+
+KEY_NAME = "Name"
+KEY_IBAN = "IBAN"
+KEY_AMOUNT = "Betrag"
+KEY_VERWENDUNGSZWECK = "Verwendungszweck"
+KEY_MANDATE_REF = "Mandatsreferenz"
+KEY_MANDATE_DATE = "Mandatsdatum"
+
+
+def create_due_payments(due_date: date) -> int:
+    """
+    Persists the payments of the active subscriptions for the given due date with a single insert.
+    Payments that already exist are kept, so this can be called again if a previous export failed.
+
+    :param due_date: the date on which the payments are due
+    :return: the number of new payments
+    """
+    new_payments = [
+        payment for payment in generate_new_payments(due_date) if payment._state.adding
+    ]
+    # a concurrent run may have inserted the same payments in the meantime: the unique constraint keeps the first one
+    Payment.objects.bulk_create(new_payments, batch_size=1000, ignore_conflicts=True)
+    if new_payments:
+        # bulk_create sends no signals, the payments on the member pages changed for many members
+        bump_global_version()
+    return len(new_payments)
+
+
+def get_payment_export_types() -> List[str]:
+    """
+    :return: the payment types that get a separate export file: one per active product type, then the coop shares
+    """
+    return [product_type.name for product_type in get_active_product_types()] + [
+        COOP_SHARES_PAYMENT_TYPE
+    ]
+
+
+def get_unexported_payments(due_date: date, payment_type: str):
+    """
+    :param due_date: the due date of the export
+    :param payment_type: the product type name or COOP_SHARES_PAYMENT_TYPE
+    :return: the payments of the type that are not exported yet, with mandate reference and member loaded
+    """
+    payments = Payment.objects.filter(transaction__isnull=True, type=payment_type)
+    if payment_type == COOP_SHARES_PAYMENT_TYPE:
+        # coop share payments are created when the shares are bought, older ones that were not exported yet are included
+        payments = payments.filter(due_date__lte=due_date)
+    else:
+        payments = payments.filter(due_date=due_date)
+    return payments.select_related("mandate_ref__member").order_by("id")
+
+
+def render_payments_csv(payments: List[Payment], export_name: str) -> bytes:
+    """
+    :param payments: the payments, with mandate reference and member loaded
+    :param export_name: the product type name or COOP_SHARES_EXPORT_NAME, used in the Verwendungszweck
+    :return: the content of the CSV file for the bank
+    """
+    output, writer = begin_csv_string(
+        [
+            KEY_NAME,
+            KEY_IBAN,
+            KEY_AMOUNT,
+            KEY_VERWENDUNGSZWECK,
+            KEY_MANDATE_REF,
+            KEY_MANDATE_DATE,
+        ]
+    )
+
+    for payment in payments:
+        member = payment.mandate_ref.member
+        writer.writerow(
+            {
+                KEY_NAME: f"{member.first_name} {member.last_name}",
+                KEY_IBAN: member.iban,
+                KEY_AMOUNT: payment.amount,
+                KEY_VERWENDUNGSZWECK: f"{member.last_name} {export_name}",
+                KEY_MANDATE_REF: payment.mandate_ref.ref,
+                KEY_MANDATE_DATE: format_date(member.sepa_consent),
+            }
+        )
+
+    return bytes("".join(output.csv_string), "utf-8")
+
+
+@transaction.atomic
+def export_payments_of_type(
+    due_date: date, payment_type: str
+) -> PaymentTransaction | None:
+    """
+    Exports the unexported payments of one type to a CSV file and links them to a new PaymentTransaction.
+    Does nothing if the type was already exported for the due date, so a failed export can simply be started again.
+
+    :param due_date: the due date of the export
+    :param payment_type: the product type name or COOP_SHARES_PAYMENT_TYPE
+    :return: the new transaction, or None if the type was already exported for the due date
+    """
+    export_name = (
+        COOP_SHARES_EXPORT_NAME
+        if payment_type == COOP_SHARES_PAYMENT_TYPE
+        else payment_type
+    )
+    if PaymentTransaction.objects.filter(type=export_name, due_date=due_date).exists():
+        return None
+
+    payments = list(
+        get_unexported_payments(due_date, payment_type).select_for_update(of=("self",))
+    )
+    file = export_file(
+        filename=f"{export_name}-Einzahlungen",
+        filetype=ExportedFile.FileType.CSV,
+        content=render_payments_csv(payments, export_name),
+        send_email=False,
+    )
+    payment_transaction = PaymentTransaction.objects.create(
+        file=file, type=export_name, due_date=due_date
+    )
+    for payment in payments:
+        payment.transaction = payment_transaction
+    Payment.objects.bulk_update(payments, ["transaction"], batch_size=1000)
+    if payments:
+        # bulk_update sends no signals, the exported payments are no longer shown as upcoming on the member pages
+        bump_global_version()
+
+    return payment_transaction
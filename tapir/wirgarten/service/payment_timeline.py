@@ -0,0 +1,286 @@
+from collections import defaultdict
+from datetime import date
+from typing import List
+
+from dateutil.relativedelta import relativedelta
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+
+from tapir.wirgarten.models import (
+    CoopShareTransaction,
+    Payment,
+    Subscription,
+)
+from tapir.wirgarten.service.payment import get_next_payment_date
+from tapir.wirgarten.service.products import (
+    ProductPriceLookup,
+    product_type_order_by,
+)
+from tapir.wirgarten.utils import get_today
+
+COOP_SHARES_PAYMENT_TYPE = "Genossenschaftsanteile"
+
+
+class PaymentTimelineData:
+    """
+    Everything needed to build the payment timelines of a set of members, loaded with a fixed number of queries.
+    """
+
+    def __init__(self, member_ids: List[str]):
+        self.payments_by_member = defaultdict(list)
+        for payment in (
+            Payment.objects.filter(mandate_ref__member_id__in=member_ids)
+            .select_related("mandate_ref")
+            .order_by("-due_date")
+        ):
+            self.payments_by_member[payment.mandate_ref.member_id].append(payment)
+
+        payment_ids = [
+            payment.id
+            for payments in self.payments_by_member.values()
+            for payment in payments
+        ]
+        self.coop_share_transactions_by_payment = defaultdict(list)
+        for coop_share_transaction in CoopShareTransaction.objects.filter(
+            payment_id__in=payment_ids
+        ):
+            self.coop_share_transactions_by_payment[
+                coop_share_transaction.payment_id
+            ].append(coop_share_transaction)
+
+        mandate_ref_ids = {
+            payment.mandate_ref_id
+            for payments in self.payments_by_member.values()
+            for payment in payments
+        }
+        self.subscriptions_by_member = defaultdict(list)
+        self.subscriptions_by_mandate_ref = defaultdict(list)
+        product_ids = set()
+        for subscription in (
+            Subscription.objects.filter(
+                Q(member_id__in=member_ids) | Q(mandate_ref_id__in=mandate_ref_ids)
+            )
+            .select_related("product__type", "mandate_ref")
+            .order_by(*product_type_order_by("product__type_id", "product__type__name"))
+        ):
+            self.subscriptions_by_member[subscription.member_id].append(subscription)
+            self.subscriptions_by_mandate_ref[subscription.mandate_ref_id].append(
+                subscription
+            )
+            product_ids.add(subscription.product_id)
+
+        self.product_prices = ProductPriceLookup(product_ids)
+
+    def get_product_price(self, product_id: str, reference_date: date):
+        product_price = self.product_prices.get_product_price(
+            product_id, reference_date
+        )
+        return product_price.price if product_price is not None else None
+
+    def subscription_to_dict(self, subscription: Subscription) -> dict:
+        return {
+            "quantity": subscription.quantity,
+            "product": {
+                "name": subscription.product.name,
+                "type": {"name": subscription.product.type.name},
+                "price": self.get_product_price(
+                    subscription.product_id, subscription.start_date
+                ),
+            },
+            "solidarity_price": subscription.solidarity_price,
+            "solidarity_price_absolute": subscription.solidarity_price_absolute,
+            "total_price": self.product_prices.get_subscription_total_price(
+                subscription
+            ),
+            "price_override": subscription.price_override,
+        }
+
+    def payment_to_dict(self, payment: Payment) -> dict:
+        if payment.type == COOP_SHARES_PAYMENT_TYPE:
+            subs = [
+                {
+                    "quantity": coop_share_transaction.quantity,
+                    "product": {
+                        "name": _("Genossenschaftsanteile"),
+                        "price": coop_share_transaction.share_price,
+                    },
+                    "total_price": int(
+                        coop_share_transaction.quantity
+                        * coop_share_transaction.share_price
+                    ),
+                }
+                for coop_share_transaction in self.coop_share_transactions_by_payment.get(
+                    payment.id, []
+                )
+            ]
+        else:
+            subs = [
+                self.subscription_to_dict(subscription)
+                for subscription in self.subscriptions_by_mandate_ref.get(
+                    payment.mandate_ref_id, []
+                )
+                if subscription.start_date <= payment.due_date < subscription.end_date
+                and subscription.product.type.name == payment.type
+            ]
+
+        return {
+            "id": payment.id,
+            "type": payment.type,
+            "due_date": payment.due_date,
+            "mandate_ref": payment.mandate_ref,
+            "amount": float(round(payment.amount, 2)),
+            "calculated_amount": round(
+                sum(map(lambda x: float(x["total_price"]), subs)), 2
+            ),
+            "subs": subs,
+            "status": payment.status,
+            "edited": payment.edited,
+            "upcoming": (get_today() - payment.due_date).days < 0
+            and not payment.transaction_id,
+        }
+
+    def get_previous_payments(self, member_id: str) -> dict[date, list[dict]]:
+        payments_per_due_date = defaultdict(list)
+        for payment in self.payments_by_member.get(member_id, []):
+            payments_per_due_date[payment.due_date].append(
+                self.payment_to_dict(payment)
+            )
+        return dict(payments_per_due_date)
+
+    def generate_future_payments(
+        self, member_id: str, limit: int = None
+    ) -> dict[date, list[dict]]:
+        today = get_today()
+        subscriptions = [
+            subscription
+            for subscription in self.subscriptions_by_member.get(member_id, [])
+            if subscription.end_date >= today
+        ]
+
+        payments_per_due_date = {}
+        if not subscriptions:
+            return payments_per_due_date
+
+        max_end_date = max(subscription.end_date for subscription in subscriptions)
+        next_payment_date = get_next_payment_date()
+        while next_payment_date <= max_end_date and (
+            limit is None or len(payments_per_due_date) < limit
+        ):
+            payments = []
+            for subscription in subscriptions:
+                if not (
+                    subscription.start_date
+                    <= next_payment_date
+                    <= subscription.end_date
+                ):
+                    continue
+                amount = self.product_prices.get_subscription_total_price(subscription)
+                payments.append(
+                    {
+                        "type": subscription.product.type.name,
+                        "due_date": next_payment_date,
+                        "mandate_ref": subscription.mandate_ref,
+                        "amount": amount,
+                        "calculated_amount": amount,
+                        "subs": [self.subscription_to_dict(subscription)],
+                        "status": Payment.PaymentStatus.DUE,
+                        "edited": False,
+                        "upcoming": True,
+                    }
+                )
+            if payments:
+                payments_per_due_date[next_payment_date] = payments
+
+            next_payment_date += relativedelta(months=1)
+
+        return payments_per_due_date
+
+    def get_payments_per_due_date(
+        self, member_id: str, future_limit: int = None
+    ) -> dict[date, list[dict]]:
+        """
+        Persisted payments of the member, completed with the projected payments of the types that are not persisted yet for a due date.
+
+        :param member_id: the member
+        :param future_limit: maximum number of projected due dates, unlimited if None
+        :return: dict of due date -> list of payment dicts, persisted payments first
+        """
+        payments_per_due_date = self.get_previous_payments(member_id)
+        for due_date, payments in self.generate_future_payments(
+            member_id, future_limit
+        ).items():
+            if due_date not in payments_per_due_date:
+                payments_per_due_date[due_date] = payments
+                continue
+            persisted_types = {
+                payment.get("type", None) for payment in payments_per_due_date[due_date]
+            }
+            payments_per_due_date[due_date].extend(
+                [
+                    payment
+                    for payment in payments
+                    if payment.get("type", None) not in persisted_types
+                ]
+            )
+        return payments_per_due_date
+
+    def get_payment_timeline(
+        self, member_id: str, future_limit: int = None
+    ) -> List[dict]:
+        return sorted(
+            [
+                payment
+                for payments in self.get_payments_per_due_date(
+                    member_id, future_limit
+                ).values()
+                for payment in payments
+            ],
+            key=lambda x: x["due_date"].isoformat() + x.get("type", ""),
+        )
+
+
+def build_payment_timelines(
+    member_ids: List[str], future_limit: int = None
+) -> dict[str, List[dict]]:
+    """
+    Builds the payment timelines (past and projected payments) of many members with a fixed number of queries.
+
+    :param member_ids: the members to build the timeline for
+    :param future_limit: maximum number of projected due dates per member, unlimited if None
+    :return: dict of member id -> list of payment dicts, sorted by due date and type
+    """
+    data = PaymentTimelineData(member_ids)
+    return {
+        member_id: data.get_payment_timeline(member_id, future_limit)
+        for member_id in member_ids
+    }
+
+
+def get_payment_timeline(member_id: str, future_limit: int = None) -> List[dict]:
+    """
+    Returns the past and projected payments of a member, see build_payment_timelines.
+    """
+    return build_payment_timelines([member_id], future_limit)[member_id]
+
+
+def get_next_payment(member_id: str) -> dict | None:
+    """
+    Returns the sum of the payments of a member on the next payment due date.
+
+    :param member_id: the member
+    :return: dict with due_date, amount and mandate_ref, or None if nothing is due on the next due date
+    """
+    next_due_date = get_next_payment_date()
+    next_payments = (
+        PaymentTimelineData([member_id])
+        .get_payments_per_due_date(member_id, future_limit=1)
+        .get(next_due_date, [])
+    )
+    if not next_payments:
+        return None
+
+    return {
+        "due_date": next_due_date,
+        "amount": sum([payment["amount"] for payment in next_payments]),
+        "mandate_ref": next_payments[0]["mandate_ref"],
+    }
@@ -0,0 +1,92 @@
+from datetime import date
+from typing import Callable
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from tapir.configuration.models import TapirParameter
+from tapir.configuration.parameter import parameters_changed
+from tapir.wirgarten.models import (
+    GrowingPeriod,
+    MemberPickupLocation,
+    PickupLocation,
+    PickupLocationCapability,
+    PickupLocationOpeningTime,
+    Product,
+    ProductCapacity,
+    ProductPrice,
+    ProductType,
+    Subscription,
+)
+from tapir.wirgarten.service.cache_version import bump_version, get_version
+from tapir.wirgarten.utils import get_today
+
+MAP_DATA_VERSION_CACHE_KEY = "pickup_location_map_version"
+MAP_DATA_CACHE_KEY = "pickup_location_map_data"
+MAP_DATA_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def get_pickup_location_map_version() -> str:
+    """
+    The version of the pickup location map data. The data also depends on the current date, so the version changes every day.
+    """
+    version_id, _ = get_version(MAP_DATA_VERSION_CACHE_KEY)
+    return f"{version_id}-{get_today().isoformat()}"
+
+
+def get_cached_pickup_location_map_data(
+    reference_date: date, build: Callable[[date], str]
+) -> str:
+    """
+    Returns the map data of all pickup locations from the cache, or calculates and caches it.
+    The cached data is shared by all visitors and stays valid until one of the models it is calculated from changes.
+
+    :param reference_date: the date for which the capabilities of the locations are shown
+    :param build: function that calculates the map data as JSON string for the reference date
+    :return: the map data as JSON string
+    """
+    version = get_pickup_location_map_version()
+    cache_key = f"{MAP_DATA_CACHE_KEY}:{version}:{reference_date.isoformat()}"
+    data = cache.get(cache_key)
+    if data is None:
+        data = build(reference_date)
+        cache.set(cache_key, data, MAP_DATA_CACHE_TIMEOUT)
+    return data
+
+
+def bump_pickup_location_map_version():
+    """
+    Marks the map data as changed.
+    """
+    bump_version(MAP_DATA_VERSION_CACHE_KEY)
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+@receiver(post_save, sender=MemberPickupLocation)
+@receiver(post_delete, sender=MemberPickupLocation)
+@receiver(post_save, sender=PickupLocation)
+@receiver(post_delete, sender=PickupLocation)
+@receiver(post_save, sender=PickupLocationCapability)
+@receiver(post_delete, sender=PickupLocationCapability)
+@receiver(post_save, sender=PickupLocationOpeningTime)
+@receiver(post_delete, sender=PickupLocationOpeningTime)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductPrice)
+@receiver(post_delete, sender=ProductPrice)
+@receiver(post_save, sender=ProductType)
+@receiver(post_delete, sender=ProductType)
+@receiver(post_save, sender=ProductCapacity)
+@receiver(post_delete, sender=ProductCapacity)
+@receiver(post_save, sender=GrowingPeriod)
+@receiver(post_delete, sender=GrowingPeriod)
+@receiver(post_save, sender=TapirParameter)
+def on_map_data_change(sender, instance, **kwargs):
+    bump_pickup_location_map_version()
+
+
+@receiver(parameters_changed)
+def on_parameters_changed(sender, keys, **kwargs):
+    bump_pickup_location_map_version()
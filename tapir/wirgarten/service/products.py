@@ -1,3 +1,4 @@
+from collections import defaultdict
 from datetime import date
 from decimal import Decimal
 from typing import List
@@ -5,7 +6,18 @@ from typing import List
 from dateutil.relativedelta import relativedelta
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import transaction
-from django.db.models import Case, IntegerField, Value, When
+from django.db.models import (
+    Case,
+    Count,
+    DecimalField,
+    IntegerField,
+    Max,
+    OuterRef,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
 
 from tapir.configuration.models import TapirParameter
 from tapir.configuration.parameter import get_parameter_value
@@ -20,6 +32,7 @@ from tapir.wirgarten.models import (
     TaxRate,
 )
 from tapir.wirgarten.parameters import Parameter
+from tapir.wirgarten.service.calendar_context import get_calendar_context
 from tapir.wirgarten.utils import get_today
 from tapir.wirgarten.validators import (
     validate_date_range,
@@ -99,29 +112,13 @@ def get_available_product_types(reference_date: date = None) -> list:
 def get_next_growing_period(
     reference_date: date = None,
 ) -> GrowingPeriod | None:
-    if reference_date is None:
-        reference_date = get_today()
-
-    return (
-        GrowingPeriod.objects.filter(start_date__gt=reference_date)
-        .order_by("start_date")
-        .first()
-    )
+    return get_calendar_context().get_next_growing_period(reference_date)
 
 
 def get_current_growing_period(
     reference_date: date = None,
 ) -> GrowingPeriod | None:
-    if reference_date is None:
-        reference_date = get_today()
-
-    return (
-        GrowingPeriod.objects.filter(
-            start_date__lte=reference_date, end_date__gte=reference_date
-        )
-        .order_by("start_date")
-        .first()
-    )
+    return get_calendar_context().get_current_growing_period(reference_date)
 
 
 @transaction.atomic
@@ -274,13 +271,93 @@ def get_product_price(product: str | Product, reference_date: date = None):
     if isinstance(product, Product):
         product = product.id
 
-    prices = ProductPrice.objects.filter(product_id=product).order_by("-valid_from")
+    return select_product_price(
+        list(ProductPrice.objects.filter(product_id=product).order_by("-valid_from")),
+        reference_date,
+    )
+
 
+def select_product_price(
+    prices: List[ProductPrice], reference_date: date
+) -> ProductPrice | None:
+    """
+    Selects the active price of a product like get_product_price, from already loaded prices.
+
+    :param prices: all prices of the product, sorted by valid_from descending
+    :param reference_date: reference date for when the price should be valid
+    :return: the ProductPrice instance, None if there is no valid price
+    """
     # If there's only one price, return it
-    if prices.count() == 1:
-        return prices.first()
+    if len(prices) == 1:
+        return prices[0]
     # Otherwise, return the price valid up to the reference date
-    return prices.filter(valid_from__lte=reference_date).first()
+    return next((price for price in prices if price.valid_from <= reference_date), None)
+
+
+def product_price_expression(reference_date: date, product_field: str = "product_id"):
+    """
+    SQL version of select_product_price, for annotations and aggregates over another model.
+
+    :param reference_date: reference date for when the price should be valid
+    :param product_field: the field of the outer query that references the product
+    :return: expression of the price of the product, NULL if there is no valid price
+    """
+    single_price = (
+        ProductPrice.objects.filter(product_id=OuterRef(product_field))
+        .order_by()
+        .values("product_id")
+        .annotate(price_count=Count("id"), single_price=Max("price"))
+        .filter(price_count=1)
+        .values("single_price")
+    )
+    effective_price = (
+        ProductPrice.objects.effective_at("product_id", reference_date)
+        .filter(product_id=OuterRef(product_field))
+        .values("price")
+    )
+    return Coalesce(
+        Subquery(single_price),
+        Subquery(effective_price),
+        output_field=DecimalField(decimal_places=2, max_digits=8),
+    )
+
+
+class ProductPriceLookup:
+    """
+    In-memory version of get_product_price and Subscription.total_price for many products,
+    the prices are loaded with a single query.
+    """
+
+    def __init__(self, product_ids):
+        self.prices_by_product = defaultdict(list)
+        for price in ProductPrice.objects.filter(product_id__in=product_ids).order_by(
+            "-valid_from"
+        ):
+            self.prices_by_product[price.product_id].append(price)
+
+    def get_product_price(
+        self, product_id: str, reference_date: date
+    ) -> ProductPrice | None:
+        return select_product_price(
+            self.prices_by_product.get(product_id, []), reference_date
+        )
+
+    def get_subscription_total_price(
+        self, subscription: Subscription, reference_date: date = None
+    ) -> float:
+        """
+        Same as subscription.total_price(reference_date). Subscriptions without a valid product price count as 0.
+        """
+        if subscription.price_override is not None:
+            return float(subscription.price_override)
+
+        if reference_date is None:
+            reference_date = max(subscription.start_date, get_today())
+
+        product_price = self.get_product_price(subscription.product_id, reference_date)
+        return subscription.calculate_total_price(
+            product_price.price if product_price is not None else 0
+        )
 
 
 @transaction.atomic
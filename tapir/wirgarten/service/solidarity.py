@@ -0,0 +1,118 @@
+from datetime import date
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import DecimalField, F, Q, Sum
+from django.db.models.functions import Cast
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from tapir.wirgarten.models import GrowingPeriod, ProductPrice, Subscription
+from tapir.wirgarten.service.cache_version import bump_version, get_version
+from tapir.wirgarten.service.products import (
+    get_future_subscriptions,
+    product_price_expression,
+)
+from tapir.wirgarten.utils import get_today
+
+SOLIDARITY_LEDGER_CACHE_VERSION_KEY = "solidarity_ledger_version"
+SOLIDARITY_LEDGER_CACHE_TIMEOUT = 60 * 60 * 24
+
+KEY_RELATIVE = "relative"
+KEY_ABSOLUTE = "absolute"
+KEY_TOTAL = "total"
+
+
+def invalidate_solidarity_ledger():
+    """
+    Invalidates all cached solidarity ledgers by bumping the version that is part of their cache keys.
+    """
+    bump_version(SOLIDARITY_LEDGER_CACHE_VERSION_KEY)
+
+
+def compute_solidarity_ledger(reference_date: date) -> dict[str, Decimal]:
+    """
+    Calculates the solidarity pool of the active and future subscriptions with one aggregate query.
+
+    Relative contributions are quantity * current product price * solidarity_price, absolute contributions are solidarity_price_absolute.
+    Negative contributions (members that pay less) reduce the pool. Subscriptions without a valid product price are skipped.
+
+    :param reference_date: the date for which the subscriptions and product prices are valid
+    :return: dict with the relative, absolute and total solidarity amount
+    """
+    totals = (
+        get_future_subscriptions(reference_date)
+        .order_by()
+        .annotate(product_price=product_price_expression(reference_date))
+        .aggregate(
+            relative=Sum(
+                F("quantity")
+                * F("product_price")
+                * Cast(
+                    "solidarity_price", DecimalField(max_digits=10, decimal_places=6)
+                ),
+                filter=Q(solidarity_price_absolute__isnull=True),
+                output_field=DecimalField(),
+            ),
+            absolute=Sum("solidarity_price_absolute"),
+        )
+    )
+
+    relative = round(totals["relative"] or Decimal(0), 2)
+    absolute = totals["absolute"] or Decimal(0)
+    return {
+        KEY_RELATIVE: relative,
+        KEY_ABSOLUTE: absolute,
+        KEY_TOTAL: relative + absolute,
+    }
+
+
+def get_solidarity_ledger(reference_date: date = None) -> dict[str, Decimal]:
+    """
+    Cached version of compute_solidarity_ledger. The cache is invalidated whenever a subscription or product price changes.
+
+    :param reference_date: the date for which the subscriptions and product prices are valid, today if None
+    :return: dict with the relative, absolute and total solidarity amount
+    """
+    if reference_date is None:
+        reference_date = get_today()
+
+    version, _ = get_version(SOLIDARITY_LEDGER_CACHE_VERSION_KEY)
+    cache_key = f"solidarity_ledger:{version}:{reference_date.isoformat()}"
+    ledger = cache.get(cache_key)
+    if ledger is None:
+        ledger = compute_solidarity_ledger(reference_date)
+        cache.set(cache_key, ledger, SOLIDARITY_LEDGER_CACHE_TIMEOUT)
+    return ledger
+
+
+def get_solidarity_ledger_by_growing_period(
+    reference_date: date = None,
+) -> list[tuple[GrowingPeriod, dict[str, Decimal]]]:
+    """
+    Returns the solidarity ledger for every growing period that has not ended yet,
+    evaluated at the start of the growing period or at the reference date if the period already started.
+
+    :param reference_date: the date from which on the growing periods are considered, today if None
+    :return: list of (growing period, ledger) tuples, ordered by start date
+    """
+    if reference_date is None:
+        reference_date = get_today()
+
+    return [
+        (
+            growing_period,
+            get_solidarity_ledger(max(growing_period.start_date, reference_date)),
+        )
+        for growing_period in GrowingPeriod.objects.filter(
+            end_date__gte=reference_date
+        ).order_by("start_date")
+    ]
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+@receiver(post_save, sender=ProductPrice)
+@receiver(post_delete, sender=ProductPrice)
+def on_solidarity_relevant_change(sender, instance, **kwargs):
+    invalidate_solidarity_ledger()
@@ -1,28 +1,153 @@
+import itertools
+import json
 from datetime import datetime
+from functools import lru_cache
+from importlib import import_module
 
 from celery import Celery
-from django.db import transaction
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Q
 
 from django.conf import settings
 
 app = Celery("tapir", broker=settings.CELERY_BROKER_URL)
 
 
+from tapir.core.models import generate_id
 from tapir.wirgarten.models import ScheduledTask
+from tapir.wirgarten.utils import get_now
+
+
+_UPSERT_SCHEDULED_TASKS_SQL = f"""
+    INSERT INTO {ScheduledTask._meta.db_table}
+        (id, task_function, task_args, task_kwargs, eta, status, retry_count, max_retries, created_at, updated_at, dedup_key)
+    VALUES {{values}}
+    ON CONFLICT (dedup_key) DO UPDATE SET
+        eta = EXCLUDED.eta,
+        status = EXCLUDED.status,
+        error_message = NULL,
+        retry_count = 0,
+        created_at = EXCLUDED.created_at,
+        updated_at = EXCLUDED.updated_at
+"""
+
+
+def schedule_task_unique(task, eta: datetime, args=(), kwargs: dict = None):
+    schedule_tasks_unique([(task, eta, args, kwargs or {})])
+
+
+def schedule_tasks_unique(tasks, batch_size: int = 1000) -> int:
+    """
+    Schedules many tasks at once. There is at most one scheduled task per function and arguments:
+    if such a task already exists, it is reset to PENDING with the new eta (INSERT ... ON CONFLICT DO UPDATE).
+    If the task is currently running, the update waits for its row lock and is applied after the execution,
+    which doesn't overwrite it (see ScheduledTask.execute).
+
+    :param tasks: iterable of (task, eta, args, kwargs) tuples
+    :param batch_size: the maximum number of tasks upserted per statement
+    :return: the number of scheduled tasks
+    """
+    now = get_now()
+    default_max_retries = ScheduledTask._meta.get_field("max_retries").default
+
+    rows_by_dedup_key = {}
+    for task, eta, args, kwargs in tasks:
+        task_function = f"{task.__module__}.{task.__name__}"
+        dedup_key = ScheduledTask.build_dedup_key(task_function, args, kwargs)
+        # if the same call is scheduled twice, the last eta wins like with consecutive schedule_task_unique calls
+        rows_by_dedup_key[dedup_key] = [
+            generate_id(),
+            task_function,
+            json.dumps(list(args), cls=DjangoJSONEncoder),
+            json.dumps(kwargs, cls=DjangoJSONEncoder),
+            eta,
+            ScheduledTask.STATUS_PENDING,
+            0,
+            default_max_retries,
+            now,
+            now,
+            dedup_key,
+        ]
+
+    rows = list(rows_by_dedup_key.values())
+    with transaction.atomic(), connection.cursor() as cursor:
+        for i in range(0, len(rows), batch_size):
+            batch = rows[i : i + batch_size]
+            cursor.execute(
+                _UPSERT_SCHEDULED_TASKS_SQL.format(
+                    values=", ".join(
+                        ["(%s, %s, %s::jsonb, %s::jsonb, %s, %s, %s, %s, %s, %s, %s)"]
+                        * len(batch)
+                    )
+                ),
+                list(itertools.chain.from_iterable(batch)),
+            )
+
+    print(f"Scheduled {len(rows)} tasks")
+    return len(rows)
+
+
+@lru_cache(maxsize=None)
+def resolve_task_function(task_function: str):
+    """
+    Resolves the dotted path of a scheduled task function to the callable. The result is cached per process.
+
+    :param task_function: the full path of the function, e.g. "tapir.wirgarten.tasks.some_task"
+    :return: the callable
+    """
+    module_name, function_name = task_function.rsplit(".", 1)
+    return getattr(import_module(module_name), function_name)
 
 
 @transaction.atomic
-def schedule_task_unique(task, eta: datetime, args=(), kwargs={}):
-    st_args = {
-        "task_function": f"{task.__module__}.{task.__name__}",
-        "task_args": args,
-        "task_kwargs": kwargs,
-    }
-
-    existing = ScheduledTask.objects.filter(**st_args)
-    if existing.exists():
-        existing.delete()
-    print("Deleted duplicate task: ", ", ".join([e for e in existing]))
-
-    scheduled_task = ScheduledTask.objects.create(**st_args, eta=eta)
-    print("Scheduled new task: ", scheduled_task)
+def claim_due_scheduled_tasks(limit: int) -> list[str]:
+    """
+    Claims up to `limit` due scheduled tasks by setting them IN_PROGRESS.
+    Rows that are locked by a concurrent claim or by a running execution are skipped, so every task is claimed once.
+    Tasks that were claimed more than settings.SCHEDULED_TASKS_CLAIM_TIMEOUT ago and are not running are claimed again:
+    their celery message was lost, e.g. because the broker dropped it or the dispatch failed.
+
+    :param limit: the maximum number of tasks to claim
+    :return: the ids of the claimed tasks
+    """
+    now = get_now()
+    task_ids = list(
+        ScheduledTask.objects.select_for_update(skip_locked=True)
+        .filter(
+            Q(status=ScheduledTask.STATUS_PENDING, eta__lte=now)
+            | Q(
+                status=ScheduledTask.STATUS_IN_PROGRESS,
+                updated_at__lt=now - settings.SCHEDULED_TASKS_CLAIM_TIMEOUT,
+            )
+        )
+        .order_by("eta")
+        .values_list("id", flat=True)[:limit]
+    )
+    ScheduledTask.objects.filter(id__in=task_ids).update(
+        status=ScheduledTask.STATUS_IN_PROGRESS, updated_at=now
+    )
+    return task_ids
+
+
+@transaction.atomic
+def execute_claimed_scheduled_task(scheduled_task_id: str) -> bool:
+    """
+    Executes a claimed scheduled task. The row stays locked until the execution is committed: a second message for
+    the same task (e.g. a redelivery, or a claim again after the timeout) waits and then finds the task finished,
+    and claim_due_scheduled_tasks skips the row while it is running.
+
+    :param scheduled_task_id: the id of the task
+    :return: False if the task is not claimed (anymore) and was not executed
+    """
+    scheduled_task = (
+        ScheduledTask.objects.select_for_update()
+        .filter(id=scheduled_task_id, status=ScheduledTask.STATUS_IN_PROGRESS)
+        .first()
+    )
+    if scheduled_task is None:
+        return False
+
+    print("Executing scheduled task: ", scheduled_task)
+    scheduled_task.execute()
+    return True
@@ -1,5 +1,6 @@
 from datetime import timedelta
 
+from celery.signals import task_prerun
 from dateutil.relativedelta import relativedelta
 from django.db import models
 from django.db.models import ExpressionWrapper, F
@@ -19,6 +20,7 @@ from tapir_mail.triggers.transactional_trigger import TransactionalTrigger
 from tapir.configuration.parameter import get_parameter_value
 from tapir.wirgarten.models import Member, PickupLocation, WaitingListEntry
 from tapir.wirgarten.parameters import Parameter
+from tapir.wirgarten.service.member_segments import get_members_in_segment
 from tapir.wirgarten.service.products import (
     get_next_growing_period,
 )
@@ -74,12 +76,22 @@ class Filters:
     CONTRACT_EXTENDED_NO_REACTION = "Vertrag verlängert: keine Reaktion"
 
 
-def configure_mail_module():
+def register_mail_module():
+    """
+    Registers everything that doesn't need the database. Called at startup of every process.
+    The pickup location filters are registered on first use, see ensure_pickup_location_filters,
+    the waitlist segments are kept in sync by signals and the synchronize_waitlist_segments task.
+    """
     _register_segments()
     _register_filters()
     _register_tokens()
     _register_triggers()
 
+
+def configure_mail_module():
+    register_mail_module()
+    _register_pickup_location_filters()
+
     synchronize_waitlist_segments()
 
 
@@ -89,22 +101,22 @@ def _register_segments():
 
     register_segment(
         Segments.COOP_MEMBERS,
-        lambda: Member.objects.with_shares(),
+        lambda: get_members_in_segment(is_coop_member=True),
     )
 
     register_segment(
         Segments.NON_COOP_MEMBERS,
-        lambda: Member.objects.without_shares(),
+        lambda: get_members_in_segment(is_coop_member=False),
     )
 
     register_segment(
         Segments.WITH_ACTIVE_SUBSCRIPTION,
-        lambda: Member.objects.with_active_subscription(),
+        lambda: get_members_in_segment(has_active_subscription=True),
     )
 
     register_segment(
         Segments.WITHOUT_ACTIVE_SUBSCRIPTION,
-        lambda: Member.objects.without_active_subscription(),
+        lambda: get_members_in_segment(has_active_subscription=False),
     )
 
 
@@ -158,11 +170,46 @@ def _register_filters():
         create_contract_status_filter("no reaction"),
     )
 
-    for pl in PickupLocation.objects.all():
-        register_filter(
-            f"Abholort: {pl.name}",
-            lambda qs, pl=pl: qs.filter(memberpickuplocation__pickup_location=pl),
-        )
+
+_pickup_location_filters_registered = False
+
+
+def _register_pickup_location_filter(pickup_location: PickupLocation):
+    register_filter(
+        f"Abholort: {pickup_location.name}",
+        lambda qs, pl=pickup_location: qs.filter(
+            id__in=get_members_in_segment(pickup_location=pl)
+        ),
+    )
+
+
+def _register_pickup_location_filters():
+    global _pickup_location_filters_registered
+    for pickup_location in PickupLocation.objects.all():
+        _register_pickup_location_filter(pickup_location)
+    _pickup_location_filters_registered = True
+
+
+def ensure_pickup_location_filters():
+    """
+    Registers the filters per pickup location, once per process. Called before segments are resolved:
+    by the tapir mail requests (see TapirMailPermissionMiddleware) and before the tapir mail celery tasks.
+    """
+    if not _pickup_location_filters_registered:
+        _register_pickup_location_filters()
+
+
+@task_prerun.connect
+def register_filters_before_tapir_mail_task(sender=None, task=None, **kwargs):
+    if task is not None and task.name.startswith("tapir_mail."):
+        ensure_pickup_location_filters()
+
+
+@receiver(post_save, sender=PickupLocation)
+def on_pickup_location_saved(sender, instance, **kwargs):
+    # before the first use, all filters are registered anyway
+    if _pickup_location_filters_registered:
+        _register_pickup_location_filter(instance)
 
 
 def _register_tokens():
@@ -295,20 +342,72 @@ def synchronize_waitlist_segment_for_entry(entry):
 
 
 def synchronize_waitlist_segments():
-    for entry in WaitingListEntry.objects.all():
-        synchronize_waitlist_segment_for_entry(entry)
-
-    # Handle deletion of recipients no longer in WaitingList
-    for waitlist_type in WaitingListEntry.WaitingListType:
-        segment_name = get_waitlist_segment_name(waitlist_type)
+    """
+    Brings the recipients of the waitlist segments in line with the waiting list, with a fixed number of queries.
+    The signals below keep them in sync incrementally, this catches what they missed (e.g. bulk operations).
+    """
+    entries_by_segment = {
+        get_waitlist_segment_name(waitlist_type): {}
+        for waitlist_type in WaitingListEntry.WaitingListType
+    }
+    for entry in WaitingListEntry.objects.order_by("created_at"):
+        # the latest entry of an email wins, like when saving the entries one after the other
+        entries_by_segment[get_waitlist_segment_name(entry.type)][entry.email] = entry
+
+    segments = {
+        segment.name: segment
+        for segment in StaticSegment.objects.filter(name__in=entries_by_segment.keys())
+    }
+    for segment_name, entries in entries_by_segment.items():
+        if segment_name not in segments and entries:
+            segments[segment_name] = StaticSegment.objects.create(name=segment_name)
+
+    recipients = {
+        (recipient.segment_id, recipient.email): recipient
         for recipient in StaticSegmentRecipient.objects.filter(
-            segment__name=segment_name
-        ):
-            if not WaitingListEntry.objects.filter(email=recipient.email).exists():
-                print(
-                    f"Deleting recipient {recipient.email} from segment {segment_name}"
+            segment__in=segments.values()
+        )
+    }
+    waitlist_emails = set(
+        WaitingListEntry.objects.values_list("email", flat=True).distinct()
+    )
+
+    to_create = []
+    to_update = []
+    to_delete = []
+    for segment_name, segment in segments.items():
+        entries = entries_by_segment[segment_name]
+        for email, entry in entries.items():
+            recipient = recipients.get((segment.pk, email))
+            if recipient is None:
+                to_create.append(
+                    StaticSegmentRecipient(
+                        segment=segment,
+                        email=email,
+                        first_name=entry.first_name,
+                        last_name=entry.last_name,
+                    )
                 )
-                recipient.delete()
+            elif (recipient.first_name, recipient.last_name) != (
+                entry.first_name,
+                entry.last_name,
+            ):
+                recipient.first_name = entry.first_name
+                recipient.last_name = entry.last_name
+                to_update.append(recipient)
+
+    # Handle deletion of recipients no longer in WaitingList
+    segment_names = {segment.pk: name for name, segment in segments.items()}
+    for recipient in recipients.values():
+        if recipient.email not in waitlist_emails:
+            print(
+                f"Deleting recipient {recipient.email} from segment {segment_names[recipient.segment_id]}"
+            )
+            to_delete.append(recipient.pk)
+
+    StaticSegmentRecipient.objects.bulk_create(to_create)
+    StaticSegmentRecipient.objects.bulk_update(to_update, ["first_name", "last_name"])
+    StaticSegmentRecipient.objects.filter(pk__in=to_delete).delete()
 
 
 @receiver(post_save, sender=WaitingListEntry)
@@ -1,38 +1,60 @@
+import datetime
 import itertools
 from collections import defaultdict
 
 from celery import shared_task
 from dateutil.relativedelta import relativedelta
+from django.conf import settings
 from django.db import transaction
-from tapir_mail.triggers.transactional_trigger import TransactionalTrigger
 
 from tapir.configuration.parameter import get_parameter_value
 from tapir.wirgarten.constants import EVEN_WEEKS, ODD_WEEKS, WEEKLY
 from tapir.wirgarten.models import (
     ExportedFile,
-    Member,
-    Payment,
-    PaymentTransaction,
     Product,
-    ProductType,
-    ScheduledTask,
 )
 from tapir.wirgarten.parameters import Parameter
-from tapir.wirgarten.service.delivery import get_next_delivery_date
-from tapir.wirgarten.service.email import send_email
-from tapir.wirgarten.service.file_export import begin_csv_string, export_file
-from tapir.wirgarten.service.payment import generate_new_payments, get_existing_payments
+from tapir.wirgarten.service.contract_end_reminder import (
+    send_contract_end_reminders as send_all_contract_end_reminders,
+)
+from tapir.wirgarten.service.coop_share_ledger import (
+    rebuild_coop_share_ledgers as rebuild_all_coop_share_ledgers,
+)
+from tapir.wirgarten.service.delivery import get_next_delivery_date, record_deliveries
+from tapir.wirgarten.service.email import (
+    send_outbox_emails as send_outbox_emails_batch,
+)
+from tapir.wirgarten.service.file_export import (
+    begin_csv_string,
+    export_file,
+    send_exported_file,
+)
+from tapir.wirgarten.service.member_financial_summary import (
+    refresh_member_financial_summaries,
+)
+from tapir.wirgarten.service.member_numbers import assign_member_numbers
+from tapir.wirgarten.service.member_segments import (
+    refresh_member_segment_memberships,
+)
+from tapir.wirgarten.service.payment_export import (
+    create_due_payments,
+    export_payments_of_type,
+    get_payment_export_types,
+)
 from tapir.wirgarten.service.products import (
     get_active_product_types,
     get_active_subscriptions,
-    get_future_subscriptions,
     get_product_price,
 )
-from tapir.wirgarten.tapirmail import Events
+from tapir.wirgarten.service.tasks import (
+    claim_due_scheduled_tasks,
+    execute_claimed_scheduled_task,
+)
+from tapir.wirgarten.tapirmail import (
+    synchronize_waitlist_segments as synchronize_all_waitlist_segments,
+)
 from tapir.wirgarten.utils import (
     format_date,
-    format_subscription_list_html,
-    get_now,
     get_today,
 )
 
@@ -40,15 +62,38 @@ from tapir.wirgarten.utils import (
 @shared_task
 def execute_scheduled_tasks():
     """
-    Executes all scheduled tasks that are due.
+    Claims the scheduled tasks that are due and executes each of them in a separate celery task.
+    At most settings.SCHEDULED_TASKS_BATCH_SIZE tasks are claimed per run.
     """
 
-    scheduled_tasks = ScheduledTask.objects.filter(
-        eta__lte=get_now(), status=ScheduledTask.STATUS_PENDING
-    )
-    for scheduled_task in scheduled_tasks:
-        print("Executing scheduled task: ", scheduled_task)
-        scheduled_task.execute()
+    task_ids = claim_due_scheduled_tasks(limit=settings.SCHEDULED_TASKS_BATCH_SIZE)
+    for task_id in task_ids:
+        execute_scheduled_task.delay(task_id)
+
+    if task_ids:
+        print(f"[task] execute_scheduled_tasks: dispatched {len(task_ids)} tasks")
+
+
+@shared_task
+def execute_scheduled_task(scheduled_task_id: str):
+    """
+    Executes a single scheduled task that was claimed by execute_scheduled_tasks.
+    """
+
+    if not execute_claimed_scheduled_task(scheduled_task_id):
+        print(
+            f"[task] execute_scheduled_task: skipping {scheduled_task_id}, because it is not claimed (anymore)"
+        )
+
+
+@shared_task
+def send_outbox_emails():
+    """
+    Sends the pending emails of the outbox. Triggered after each commit that added emails, and periodically as a fallback.
+    """
+    sent_count = send_outbox_emails_batch(limit=settings.EMAIL_OUTBOX_BATCH_SIZE)
+    if sent_count:
+        print(f"[task] send_outbox_emails: sent {sent_count} emails")
 
 
 def _export_pick_list(product_type, include_equivalents=True):
@@ -159,6 +204,18 @@ def export_pick_list_csv():
         _export_pick_list(all_product_types[type_name], True)
 
 
+@shared_task
+def record_weekly_deliveries():
+    """
+    Stores the delivery history (Deliveries) for the next delivery.
+    """
+    next_delivery_date = get_next_delivery_date()
+    count = record_deliveries(next_delivery_date)
+    print(
+        f"[task] record_weekly_deliveries: recorded {count} deliveries for {format_date(next_delivery_date)}"
+    )
+
+
 @shared_task
 def export_supplier_list_csv():
     """
@@ -180,91 +237,40 @@ def export_supplier_list_csv():
 
 
 def send_email_member_contract_end_reminder(member_id: str):
-    member = Member.objects.get(pk=member_id)
-
-    today = get_today()
-    next_month = today + relativedelta(months=1)
-    active_subs = get_active_subscriptions().filter(member=member)
-    if (
-        active_subs.filter(end_date__lte=next_month).exists()
-        and not get_future_subscriptions()
-        .filter(member=member, start_date__gt=today)
-        .exists()
-    ):
-        contract_list = format_subscription_list_html(active_subs)
-        send_email(
-            to_email=[member.email],
-            subject=get_parameter_value(Parameter.EMAIL_CONTRACT_END_REMINDER_SUBJECT),
-            content=get_parameter_value(Parameter.EMAIL_CONTRACT_END_REMINDER_CONTENT),
-            variables={"contract_list": contract_list},
-        )
-
-        TransactionalTrigger.fire_action(
-            Events.FINAL_PICKUP, member.email, {"contract_list": contract_list}
-        )
-    else:
+    """
+    Reminder of a single member. Nothing schedules this task anymore, it is only kept to drain the tasks that were
+    already scheduled per member, see the reset_end_of_delivery_email_tasks command to remove them instead.
+    Uses the same records as send_contract_end_reminders, so the member isn't reminded twice.
+    """
+    sent = send_all_contract_end_reminders(
+        contract_end_until=get_today() + relativedelta(months=1),
+        member_ids=[member_id],
+    )
+    if not sent:
         print(
-            f"[task] send_email_member_contract_end_reminder: skipping email, because {member} has no active contract OR has a future contract"
+            f"[task] send_email_member_contract_end_reminder: skipping email, because member {member_id} has no active contract OR has a future contract OR was already reminded"
         )
 
 
 @shared_task
-@transaction.atomic
+def send_contract_end_reminders():
+    """
+    Reminds all members whose contracts end soon and that have no follow-up contract, see service/contract_end_reminder.py.
+    """
+    sent = send_all_contract_end_reminders()
+    print(f"[task] send_contract_end_reminders: sent {sent} reminders")
+
+
+@shared_task
 def export_payment_parts_csv(reference_date=None):
+    """
+    Creates the payments that are due this month and exports one CSV file per payment type for the bank.
+    The files are created in separate celery tasks. Types that are already exported for the due date are skipped,
+    so the task can be started again if it failed half way.
+    """
     if reference_date is None:
         reference_date = get_today()
 
-    def export_product_or_coop_payment_csv(
-        product_type: bool | ProductType, payments: list[Payment]
-    ):
-        KEY_NAME = "Name"
-        KEY_IBAN = "IBAN"
-        KEY_AMOUNT = "Betrag"
-        KEY_VERWENDUNGSZWECK = "Verwendungszweck"
-        KEY_MANDATE_REF = "Mandatsreferenz"
-        KEY_MANDATE_DATE = "Mandatsdatum"
-
-        output, writer = begin_csv_string(
-            [
-                KEY_NAME,
-                KEY_IBAN,
-                KEY_AMOUNT,
-                KEY_VERWENDUNGSZWECK,
-                KEY_MANDATE_REF,
-                KEY_MANDATE_DATE,
-            ]
-        )
-
-        for payment in payments:
-            verwendungszweck = payment.mandate_ref.member.last_name + (
-                " Geschäftsanteile" if not product_type else " " + product_type.name
-            )
-
-            writer.writerow(
-                {
-                    KEY_NAME: f"{payment.mandate_ref.member.first_name} {payment.mandate_ref.member.last_name}",
-                    KEY_IBAN: payment.mandate_ref.member.iban,
-                    KEY_AMOUNT: payment.amount,
-                    KEY_VERWENDUNGSZWECK: verwendungszweck,
-                    KEY_MANDATE_REF: payment.mandate_ref.ref,
-                    KEY_MANDATE_DATE: format_date(
-                        payment.mandate_ref.member.sepa_consent
-                    ),
-                }
-            )
-
-        payment_type = product_type.name if product_type else "Geschäftsanteile"
-        file = export_file(
-            filename=(payment_type) + "-Einzahlungen",
-            filetype=ExportedFile.FileType.CSV,
-            content=bytes("".join(output.csv_string), "utf-8"),
-            send_email=True,
-        )
-        transaction = PaymentTransaction.objects.create(file=file, type=payment_type)
-        for p in payments:
-            p.transaction = transaction
-            p.save()
-
     due_date = reference_date.replace(
         day=get_parameter_value(Parameter.PAYMENT_DUE_DAY)
     )
@@ -273,45 +279,77 @@ def export_payment_parts_csv(reference_date=None):
         f"[task] export_payment_parts_csv: generating payments for due date {format_date(due_date)}"
     )
 
-    payments = generate_new_payments(due_date)
-    for p in payments:
-        if p.id is None:
-            p.save()
-
-    payments.sort(key=lambda x: x.type if x.type else "")
-    payments_grouped = {
-        key: list(group)
-        for key, group in itertools.groupby(payments, key=lambda x: x.type)
-    }
-
-    # export for product types
-    for pt in get_active_product_types():
-        export_product_or_coop_payment_csv(
-            pt, payments_grouped[pt.name] if pt.name in payments_grouped else []
-        )
+    new_payments = create_due_payments(due_date)
+    print(f"[task] export_payment_parts_csv: created {new_payments} payments")
 
-    # export for coop shares
-    coop_share_payments = Payment.objects.filter(
-        transaction__isnull=True, due_date__lte=due_date, type="Genossenschaftsanteile"
-    )
-    export_product_or_coop_payment_csv(
-        False,
-        coop_share_payments,
+    for payment_type in get_payment_export_types():
+        export_payment_type_csv.delay(due_date.isoformat(), payment_type)
+
+
+@shared_task
+def export_payment_type_csv(due_date: str, payment_type: str):
+    """
+    Exports the payments of one type, see export_payment_parts_csv. The email is sent once the export is committed.
+    """
+    payment_transaction = export_payments_of_type(
+        datetime.date.fromisoformat(due_date), payment_type
     )
+    if payment_transaction is None:
+        print(
+            f"[task] export_payment_type_csv: skipping {payment_type}, because it was already exported for {due_date}"
+        )
+        return
+
+    file_id = payment_transaction.file_id
+    transaction.on_commit(lambda: send_exported_file_email.delay(file_id))
+
+
+@shared_task
+def send_exported_file_email(file_id: str):
+    send_exported_file(file_id)
 
 
 @shared_task
 def generate_member_numbers():
-    members = Member.objects.filter(member_no__isnull=True)
-    today = get_today()
+    members = assign_member_numbers()
     for member in members:
-        with transaction.atomic():
-            if member.coop_shares_quantity > 0 and member.coop_entry_date <= today:
-                member.member_no = member.generate_member_no()
-                member.save()
+        print(f"[task] generate_member_numbers: generated member_no for {member}")
 
-                TransactionalTrigger.fire_action(Events.MEMBERSHIP_ENTRY, member.email)
 
-                print(
-                    f"[task] generate_member_numbers: generated member_no for {member}"
-                )
+@shared_task
+def rebuild_member_financial_summaries():
+    """
+    Rebuilds the financial summaries of all members. The incremental updates only react to data changes,
+    this catches the changes that happen by the passing of time (contracts starting/ending, new prices becoming valid, ...).
+    """
+    refresh_member_financial_summaries()
+    print("[task] rebuild_member_financial_summaries: done")
+
+
+@shared_task
+def rebuild_member_segment_memberships():
+    """
+    Recalculates the mail segment flags of all members right after the day rollover, so that the first segment
+    resolution of the day doesn't have to do it.
+    """
+    refresh_member_segment_memberships()
+    print("[task] rebuild_member_segment_memberships: done")
+
+
+@shared_task
+def rebuild_coop_share_ledgers():
+    """
+    Rebuilds the coop share ledgers of all members, so that shares becoming valid over night are in the stored balance.
+    Reads of an outdated ledger recalculate it anyway, this only moves that work out of the requests.
+    """
+    count = rebuild_all_coop_share_ledgers()
+    print(f"[task] rebuild_coop_share_ledgers: rebuilt {count} ledgers")
+
+
+@shared_task
+def synchronize_waitlist_segments():
+    """
+    Brings the tapir mail waitlist segments in line with the waiting list. This used to run at every startup.
+    """
+    synchronize_all_waitlist_segments()
+    print("[task] synchronize_waitlist_segments: done")
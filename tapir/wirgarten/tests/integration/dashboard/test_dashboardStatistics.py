@@ -0,0 +1,138 @@
+import datetime
+
+from tapir.wirgarten.models import (
+    CoopShareTransaction,
+    QuestionaireTrafficSourceOption,
+    QuestionaireTrafficSourceResponse,
+)
+from tapir.wirgarten.service.dashboard_statistics import (
+    KEY_CANCELLED_IN_TRIAL,
+    KEY_NEW_SUBSCRIPTIONS,
+    TRAFFIC_SOURCE_NO_RESPONSE,
+    count_members_with_coop_shares,
+    get_monthly_subscription_statistics,
+    get_monthly_traffic_source_statistics,
+)
+from tapir.wirgarten.tests.factories import (
+    CoopShareTransactionFactory,
+    MemberFactory,
+    SubscriptionFactory,
+)
+from tapir.wirgarten.tests.test_utils import (
+    TapirIntegrationTest,
+    mock_timezone,
+    set_bypass_keycloak,
+)
+
+
+class TestDashboardStatistics(TapirIntegrationTest):
+    def setUp(self):
+        super().setUp()
+        set_bypass_keycloak()
+
+    def test_getMonthlySubscriptionStatistics_default_countsNewAndCancelledInTrialPerMonth(
+        self,
+    ):
+        may = datetime.date(2023, 5, 1)
+        june = datetime.date(2023, 6, 1)
+        july = datetime.date(2023, 7, 1)
+        SubscriptionFactory.create(start_date=may, end_date=datetime.date(2023, 12, 31))
+        SubscriptionFactory.create(
+            start_date=may,
+            end_date=datetime.date(2023, 12, 31),
+            cancellation_ts=datetime.datetime(
+                2023, 5, 10, tzinfo=datetime.timezone.utc
+            ),
+        )
+        SubscriptionFactory.create(
+            start_date=july,
+            end_date=datetime.date(2023, 12, 31),
+            cancellation_ts=datetime.datetime(
+                2023, 10, 10, tzinfo=datetime.timezone.utc
+            ),
+        )
+
+        statistics = get_monthly_subscription_statistics([may, june, july])
+
+        self.assertEqual(
+            {KEY_NEW_SUBSCRIPTIONS: 2, KEY_CANCELLED_IN_TRIAL: 1}, statistics[may]
+        )
+        self.assertEqual(
+            {KEY_NEW_SUBSCRIPTIONS: 0, KEY_CANCELLED_IN_TRIAL: 0}, statistics[june]
+        )
+        self.assertEqual(
+            {KEY_NEW_SUBSCRIPTIONS: 1, KEY_CANCELLED_IN_TRIAL: 0}, statistics[july]
+        )
+
+    def test_getMonthlySubscriptionStatistics_subscriptionStartsMidMonth_notCounted(
+        self,
+    ):
+        may = datetime.date(2023, 5, 1)
+        SubscriptionFactory.create(start_date=may, end_date=datetime.date(2023, 12, 31))
+        SubscriptionFactory.create(
+            start_date=datetime.date(2023, 5, 15), end_date=datetime.date(2023, 12, 31)
+        )
+
+        statistics = get_monthly_subscription_statistics([may])
+
+        self.assertEqual(
+            {KEY_NEW_SUBSCRIPTIONS: 1, KEY_CANCELLED_IN_TRIAL: 0}, statistics[may]
+        )
+
+    def test_countMembersWithCoopShares_someSharesCancelledOrInFuture_onlyCountsCurrentShareholders(
+        self,
+    ):
+        reference_date = datetime.date(2023, 6, 15)
+        shareholder, cancelled, future = MemberFactory.create_batch(3)
+        for member, valid_at in [
+            (shareholder, datetime.date(2023, 1, 1)),
+            (cancelled, datetime.date(2023, 1, 1)),
+            (future, datetime.date(2023, 7, 1)),
+        ]:
+            CoopShareTransactionFactory.create(
+                member=member,
+                transaction_type=CoopShareTransaction.CoopShareTransactionType.PURCHASE,
+                quantity=2,
+                valid_at=valid_at,
+            )
+        CoopShareTransactionFactory.create(
+            member=cancelled,
+            transaction_type=CoopShareTransaction.CoopShareTransactionType.CANCELLATION,
+            quantity=-2,
+            valid_at=datetime.date(2023, 3, 1),
+        )
+
+        self.assertEqual(1, count_members_with_coop_shares(reference_date))
+
+    def test_getMonthlyTrafficSourceStatistics_default_countsResponsesPerOptionAndMembersWithoutResponse(
+        self,
+    ):
+        may = datetime.date(2023, 5, 1)
+        june = datetime.date(2023, 6, 1)
+        friends = QuestionaireTrafficSourceOption.objects.create(name="Freunde")
+        newspaper = QuestionaireTrafficSourceOption.objects.create(name="Zeitung")
+
+        mock_timezone(
+            self, datetime.datetime(2023, 5, 15, 12, tzinfo=datetime.timezone.utc)
+        )
+        answering_member, silent_member = MemberFactory.create_batch(2)
+        response = QuestionaireTrafficSourceResponse.objects.create(
+            member=answering_member
+        )
+        response.sources.set([friends, newspaper])
+
+        mock_timezone(
+            self, datetime.datetime(2023, 6, 15, 12, tzinfo=datetime.timezone.utc)
+        )
+        june_member = MemberFactory.create()
+        response = QuestionaireTrafficSourceResponse.objects.create(member=june_member)
+        response.sources.set([friends])
+
+        self.assertEqual(
+            [
+                ("Freunde", [1, 1]),
+                ("Zeitung", [1, 0]),
+                (TRAFFIC_SOURCE_NO_RESPONSE, [1, 0]),
+            ],
+            get_monthly_traffic_source_statistics([may, june]),
+        )
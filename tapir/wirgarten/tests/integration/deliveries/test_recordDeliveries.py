@@ -0,0 +1,75 @@
+import datetime
+
+from tapir.configuration.parameter import get_parameter_value
+from tapir.wirgarten.constants import EVEN_WEEKS, WEEKLY
+from tapir.wirgarten.models import Deliveries, PickupLocationOpeningTime
+from tapir.wirgarten.parameters import Parameter, ParameterDefinitions
+from tapir.wirgarten.service.delivery import get_next_delivery_date, record_deliveries
+from tapir.wirgarten.tests.factories import (
+    MemberPickupLocationFactory,
+    ProductFactory,
+    ProductTypeFactory,
+    SubscriptionFactory,
+)
+from tapir.wirgarten.tests.test_utils import TapirIntegrationTest
+
+
+class TestRecordDeliveries(TapirIntegrationTest):
+    def setUp(self):
+        super().setUp()
+        ParameterDefinitions().import_definitions()
+        # 2023-06-05 is in week 23 (odd)
+        self.delivery_date = get_next_delivery_date(datetime.date(2023, 6, 5))
+
+        weekly_product = ProductFactory.create(
+            name="M", type=ProductTypeFactory.create(delivery_cycle=WEEKLY[0])
+        )
+        self.subscription = SubscriptionFactory.create(
+            product=weekly_product,
+            quantity=2,
+            start_date=datetime.date(2023, 1, 1),
+            end_date=datetime.date(2023, 12, 31),
+        )
+        self.member_pickup_location = MemberPickupLocationFactory.create(
+            member=self.subscription.member, valid_from=datetime.date(2023, 1, 1)
+        )
+
+    def test_recordDeliveries_default_storesProductSnapshotAtFirstOpeningDay(self):
+        delivery_day = get_parameter_value(Parameter.DELIVERY_DAY)
+        PickupLocationOpeningTime.objects.create(
+            pickup_location=self.member_pickup_location.pickup_location,
+            day_of_week=(delivery_day + 1) % 7,
+            open_time=datetime.time(10),
+            close_time=datetime.time(12),
+        )
+
+        self.assertEqual(1, record_deliveries(self.delivery_date))
+
+        delivery = Deliveries.objects.get()
+        self.assertEqual(self.subscription.member_id, delivery.member_id)
+        self.assertEqual(
+            self.delivery_date + datetime.timedelta(days=1), delivery.delivery_date
+        )
+        self.assertEqual(
+            [
+                {
+                    "product_name": "M",
+                    "product_type_name": self.subscription.product.type.name,
+                    "quantity": 2,
+                }
+            ],
+            delivery.products,
+        )
+
+    def test_recordDeliveries_productNotDeliveredThisWeek_memberIsSkipped(self):
+        self.subscription.product.type.delivery_cycle = EVEN_WEEKS[0]
+        self.subscription.product.type.save()
+
+        self.assertEqual(0, record_deliveries(self.delivery_date))
+        self.assertFalse(Deliveries.objects.exists())
+
+    def test_recordDeliveries_calledTwice_deliveryIsStoredOnce(self):
+        record_deliveries(self.delivery_date)
+        record_deliveries(self.delivery_date)
+
+        self.assertEqual(1, Deliveries.objects.count())
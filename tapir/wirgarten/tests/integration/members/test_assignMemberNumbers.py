@@ -0,0 +1,86 @@
+import datetime
+from unittest.mock import patch
+
+from tapir.wirgarten.models import Member
+from tapir.wirgarten.service.member_numbers import assign_member_numbers
+from tapir.wirgarten.service.member_page_cache import get_member_page_version
+from tapir.wirgarten.tapirmail import Events
+from tapir.wirgarten.tests.factories import CoopShareTransactionFactory, MemberFactory
+from tapir.wirgarten.tests.test_utils import (
+    TapirIntegrationTest,
+    mock_timezone,
+    set_bypass_keycloak,
+)
+
+
+class TestAssignMemberNumbers(TapirIntegrationTest):
+    def setUp(self):
+        super().setUp()
+        set_bypass_keycloak()
+        mock_timezone(self, datetime.datetime(2023, 6, 15, 12, 0))
+
+    @staticmethod
+    def create_member_with_shares(valid_at: datetime.date, **kwargs) -> Member:
+        member = MemberFactory.create(**kwargs)
+        CoopShareTransactionFactory.create(member=member, quantity=2, valid_at=valid_at)
+        return member
+
+    @patch("tapir.wirgarten.service.member_numbers.TransactionalTrigger.fire_action")
+    def test_assignMemberNumbers_membershipStarted_numbersAssignedInEntryOrder(
+        self, mock_fire_action
+    ):
+        MemberFactory.create(member_no=5)
+        second = self.create_member_with_shares(datetime.date(2023, 6, 1))
+        first = self.create_member_with_shares(datetime.date(2023, 5, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            assign_member_numbers()
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(6, first.member_no)
+        self.assertEqual(7, second.member_no)
+        self.assertEqual(2, mock_fire_action.call_count)
+        mock_fire_action.assert_any_call(Events.MEMBERSHIP_ENTRY, first.email)
+
+    @patch("tapir.wirgarten.service.member_numbers.TransactionalTrigger.fire_action")
+    def test_assignMemberNumbers_membershipNotStarted_noNumberAssigned(
+        self, mock_fire_action
+    ):
+        future_member = self.create_member_with_shares(datetime.date(2023, 7, 1))
+        member_without_shares = MemberFactory.create()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            members = assign_member_numbers()
+
+        self.assertEqual([], members)
+        future_member.refresh_from_db()
+        member_without_shares.refresh_from_db()
+        self.assertIsNone(future_member.member_no)
+        self.assertIsNone(member_without_shares.member_no)
+        mock_fire_action.assert_not_called()
+
+    @patch("tapir.wirgarten.service.member_numbers.TransactionalTrigger.fire_action")
+    def test_assignMemberNumbers_calledTwice_keepsExistingNumbers(
+        self, mock_fire_action
+    ):
+        member = self.create_member_with_shares(datetime.date(2023, 5, 1))
+        assign_member_numbers()
+        member.refresh_from_db()
+        member_no = member.member_no
+
+        self.assertEqual([], assign_member_numbers())
+        member.refresh_from_db()
+        self.assertEqual(member_no, member.member_no)
+
+    @patch("tapir.wirgarten.service.member_numbers.TransactionalTrigger.fire_action")
+    def test_assignMemberNumbers_numberAssigned_memberPageVersionChanges(
+        self, mock_fire_action
+    ):
+        member = self.create_member_with_shares(datetime.date(2023, 5, 1))
+        version, _ = get_member_page_version(member.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            assign_member_numbers()
+
+        self.assertNotEqual(version, get_member_page_version(member.id)[0])
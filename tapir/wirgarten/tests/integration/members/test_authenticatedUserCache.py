@@ -0,0 +1,66 @@
+from tapir.accounts.models import TapirUser
+from tapir.accounts.user_cache import get_authenticated_user
+from tapir.wirgarten.constants import Permission
+from tapir.wirgarten.tests.test_utils import TapirIntegrationTest
+
+
+class TestAuthenticatedUserCache(TapirIntegrationTest):
+    def setUp(self):
+        super().setUp()
+        self.user = TapirUser(
+            username="testuser",
+            email="test@example.com",
+            first_name="Test",
+            keycloak_id="keycloak-id-user-cache",
+        )
+        self.user.save(bypass_keycloak=True)
+        self.token_data = {
+            "sub": self.user.keycloak_id,
+            "iat": 1000,
+            "email_verified": True,
+            "realm_access": {"roles": ["offline_access", Permission.Email.MANAGE]},
+        }
+
+    def test_getAuthenticatedUser_sameToken_loadsUserOnlyOnce(self):
+        with self.assertNumQueries(1):
+            get_authenticated_user(self.token_data)
+        with self.assertNumQueries(0):
+            user = get_authenticated_user(self.token_data)
+
+        self.assertEqual(self.user.id, user.id)
+        self.assertEqual([Permission.Email.MANAGE], user.roles)
+        self.assertTrue(user.email_verified)
+
+    def test_getAuthenticatedUser_userSaved_loadsUserAgain(self):
+        get_authenticated_user(self.token_data)
+
+        self.user.first_name = "Changed"
+        self.user.save(bypass_keycloak=True)
+
+        with self.assertNumQueries(1):
+            user = get_authenticated_user(self.token_data)
+        self.assertEqual("Changed", user.first_name)
+
+    def test_getAuthenticatedUser_newToken_loadsUserAgain(self):
+        get_authenticated_user(self.token_data)
+
+        with self.assertNumQueries(1):
+            get_authenticated_user({**self.token_data, "iat": 2000})
+
+    def test_getAuthenticatedUser_returnedUserModified_cachedUserUnchanged(self):
+        user = get_authenticated_user(self.token_data)
+        user.roles.append("another_role")
+
+        self.assertEqual(
+            [Permission.Email.MANAGE], get_authenticated_user(self.token_data).roles
+        )
+
+    def test_getAuthenticatedUser_loadedBeforeCommit_loadsUserAgainAfterCommit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = "Changed"
+            self.user.save(bypass_keycloak=True)
+            # another request loads the user before the change is committed
+            get_authenticated_user(self.token_data)
+
+        with self.assertNumQueries(1):
+            get_authenticated_user(self.token_data)
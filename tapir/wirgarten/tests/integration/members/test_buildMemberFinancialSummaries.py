@@ -0,0 +1,172 @@
+import datetime
+from decimal import Decimal
+
+from tapir.wirgarten.models import (
+    CoopShareTransaction,
+    MemberFinancialSummary,
+    Subscription,
+)
+from tapir.wirgarten.service.member_financial_summary import (
+    build_member_financial_summaries,
+    refresh_member_financial_summaries,
+    refresh_member_financial_summary_on_commit,
+)
+from tapir.wirgarten.tests.factories import (
+    CoopShareTransactionFactory,
+    GrowingPeriodFactory,
+    MandateReferenceFactory,
+    MemberFactory,
+    MemberPickupLocationFactory,
+    ProductFactory,
+    ProductPriceFactory,
+    SubscriptionFactory,
+)
+from tapir.wirgarten.tests.test_utils import (
+    TapirIntegrationTest,
+    mock_timezone,
+    set_bypass_keycloak,
+)
+
+
+class TestBuildMemberFinancialSummaries(TapirIntegrationTest):
+    TODAY = datetime.date(year=2023, month=6, day=15)
+
+    def setUp(self):
+        set_bypass_keycloak()
+        self.member = MemberFactory.create()
+
+    def get_summary(self):
+        return build_member_financial_summaries([self.member.id], self.TODAY)[0]
+
+    def test_buildMemberFinancialSummaries_productHasOutdatedPrices_onlyCurrentPriceIsUsed(
+        self,
+    ):
+        product = ProductFactory.create()
+        ProductPriceFactory.create(
+            product=product, price=50, valid_from=datetime.date(2023, 1, 1)
+        )
+        ProductPriceFactory.create(
+            product=product, price=80, valid_from=datetime.date(2023, 6, 1)
+        )
+        ProductPriceFactory.create(
+            product=product, price=100, valid_from=datetime.date(2023, 7, 1)
+        )
+        SubscriptionFactory.create(
+            member=self.member,
+            product=product,
+            quantity=2,
+            solidarity_price=0.25,
+            start_date=datetime.date(2023, 1, 1),
+            end_date=datetime.date(2023, 12, 31),
+        )
+
+        self.assertEqual(Decimal("200.00"), self.get_summary().monthly_payment)
+
+    def test_buildMemberFinancialSummaries_productHasOnlyFuturePrice_singlePriceIsUsed(
+        self,
+    ):
+        product_price = ProductPriceFactory.create(
+            price=50, valid_from=datetime.date(2023, 7, 1)
+        )
+        SubscriptionFactory.create(
+            member=self.member,
+            product=product_price.product,
+            quantity=1,
+            solidarity_price=0,
+            start_date=datetime.date(2023, 1, 1),
+            end_date=datetime.date(2023, 12, 31),
+        )
+
+        self.assertEqual(Decimal("50.00"), self.get_summary().monthly_payment)
+
+    def test_buildMemberFinancialSummaries_absoluteSolidarityPrice_isAddedToPrice(
+        self,
+    ):
+        product_price = ProductPriceFactory.create(
+            price=50, valid_from=datetime.date(2023, 1, 1)
+        )
+        SubscriptionFactory.create(
+            member=self.member,
+            product=product_price.product,
+            quantity=1,
+            solidarity_price=0,
+            solidarity_price_absolute=Decimal("7.50"),
+            start_date=datetime.date(2023, 1, 1),
+            end_date=datetime.date(2023, 12, 31),
+        )
+
+        self.assertEqual(Decimal("57.50"), self.get_summary().monthly_payment)
+
+    def test_buildMemberFinancialSummaries_coopSharesInTheFarFuture_areNotCounted(
+        self,
+    ):
+        for valid_at in [datetime.date(2023, 1, 1), datetime.date(2024, 1, 1)]:
+            CoopShareTransactionFactory.create(
+                member=self.member,
+                transaction_type=CoopShareTransaction.CoopShareTransactionType.PURCHASE,
+                quantity=2,
+                share_price=50,
+                valid_at=valid_at,
+            )
+
+        self.assertEqual(100, self.get_summary().coop_shares_total_value)
+
+    def test_buildMemberFinancialSummaries_pickupLocationChangeInTheFuture_currentLocationIsUsed(
+        self,
+    ):
+        current = MemberPickupLocationFactory.create(
+            member=self.member, valid_from=datetime.date(2023, 1, 1)
+        )
+        MemberPickupLocationFactory.create(
+            member=self.member, valid_from=datetime.date(2023, 7, 1)
+        )
+
+        self.assertEqual(
+            current.pickup_location_id, self.get_summary().pickup_location_id
+        )
+
+    def test_refreshMemberFinancialSummaries_summaryExists_isUpdated(self):
+        refresh_member_financial_summaries([self.member.id])
+        CoopShareTransactionFactory.create(
+            member=self.member,
+            transaction_type=CoopShareTransaction.CoopShareTransactionType.PURCHASE,
+            quantity=2,
+            share_price=50,
+            valid_at=datetime.date(2023, 1, 1),
+        )
+
+        refresh_member_financial_summaries()
+
+        self.assertEqual(
+            100,
+            MemberFinancialSummary.objects.get(
+                member=self.member
+            ).coop_shares_total_value,
+        )
+
+    def test_refreshMemberFinancialSummaryOnCommit_subscriptionBulkCreated_isUpdated(
+        self,
+    ):
+        mock_timezone(self, datetime.datetime(2023, 6, 15, 12))
+        refresh_member_financial_summaries([self.member.id])
+        product_price = ProductPriceFactory.create(
+            price=50, valid_from=datetime.date(2023, 1, 1)
+        )
+        subscription = SubscriptionFactory.build(
+            member=self.member,
+            period=GrowingPeriodFactory.create(),
+            mandate_ref=MandateReferenceFactory.create(member=self.member),
+            product=product_price.product,
+            quantity=1,
+            solidarity_price=0,
+            start_date=datetime.date(2023, 1, 1),
+            end_date=datetime.date(2023, 12, 31),
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Subscription.objects.bulk_create([subscription])
+            refresh_member_financial_summary_on_commit(self.member.id)
+
+        self.assertEqual(
+            50, MemberFinancialSummary.objects.get(member=self.member).monthly_payment
+        )
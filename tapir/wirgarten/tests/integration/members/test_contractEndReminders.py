@@ -0,0 +1,96 @@
+import datetime
+from unittest.mock import patch
+
+from tapir.wirgarten.models import ContractEndReminder, EmailOutboxEntry
+from tapir.wirgarten.parameters import ParameterDefinitions
+from tapir.wirgarten.service.contract_end_reminder import (
+    get_members_due_for_contract_end_reminder,
+    send_contract_end_reminders,
+)
+from tapir.wirgarten.tests.factories import MemberFactory, SubscriptionFactory
+from tapir.wirgarten.tests.test_utils import (
+    TapirIntegrationTest,
+    mock_timezone,
+    set_bypass_keycloak,
+)
+
+
+@patch("tapir.wirgarten.service.contract_end_reminder.TransactionalTrigger.fire_action")
+class TestContractEndReminders(TapirIntegrationTest):
+    # thursday, the next delivery is on 2024-01-03, after the contracts that end 2023-12-31
+    NOW = datetime.datetime(year=2023, month=12, day=28)
+
+    def setUp(self):
+        super().setUp()
+        ParameterDefinitions().import_definitions()
+        set_bypass_keycloak()
+        mock_timezone(self, self.NOW)
+        self.member = MemberFactory.create()
+
+    def create_subscription(self, start_date, end_date, member=None):
+        return SubscriptionFactory.create(
+            member=member or self.member, start_date=start_date, end_date=end_date
+        )
+
+    def test_sendContractEndReminders_contractEndsSoon_sendsReminderOnce(
+        self, mock_fire_action
+    ):
+        self.create_subscription(datetime.date(2023, 1, 1), datetime.date(2023, 12, 31))
+
+        self.assertEqual(1, send_contract_end_reminders())
+        self.assertEqual(0, send_contract_end_reminders())
+
+        self.assertEqual(
+            1, EmailOutboxEntry.objects.filter(to_email=[self.member.email]).count()
+        )
+        self.assertEqual(1, mock_fire_action.call_count)
+        reminder = ContractEndReminder.objects.get(member=self.member)
+        self.assertEqual(datetime.date(2023, 12, 31), reminder.contract_end_date)
+        self.assertEqual(ContractEndReminder.STATUS_SENT, reminder.status)
+
+    def test_sendContractEndReminders_deliveryLeftBeforeContractEnd_noReminder(
+        self, mock_fire_action
+    ):
+        mock_timezone(self, datetime.datetime(year=2023, month=12, day=25))
+        self.create_subscription(datetime.date(2023, 1, 1), datetime.date(2023, 12, 31))
+
+        self.assertEqual(0, send_contract_end_reminders())
+        mock_fire_action.assert_not_called()
+
+    def test_sendContractEndReminders_followUpContract_noReminder(
+        self, mock_fire_action
+    ):
+        self.create_subscription(datetime.date(2023, 1, 1), datetime.date(2023, 12, 31))
+        self.create_subscription(datetime.date(2024, 1, 1), datetime.date(2024, 12, 31))
+
+        self.assertEqual(0, send_contract_end_reminders())
+        mock_fire_action.assert_not_called()
+
+    def test_sendContractEndReminders_contractEndsLater_noReminder(
+        self, mock_fire_action
+    ):
+        self.create_subscription(datetime.date(2023, 1, 1), datetime.date(2024, 3, 31))
+
+        self.assertEqual(0, send_contract_end_reminders())
+        self.assertFalse(ContractEndReminder.objects.exists())
+
+    def test_getMembersDueForContractEndReminder_severalMembers_queryCountIndependentOfMemberCount(
+        self, mock_fire_action
+    ):
+        for _ in range(3):
+            self.create_subscription(
+                datetime.date(2023, 1, 1),
+                datetime.date(2023, 12, 31),
+                member=MemberFactory.create(),
+            )
+
+        with self.assertNumQueries(2):
+            members = list(
+                get_members_due_for_contract_end_reminder(
+                    contract_end_until=datetime.date(2023, 12, 31)
+                )
+            )
+            for member in members:
+                for subscription in member.active_subscriptions:
+                    subscription.long_str()
+        self.assertEqual(3, len(members))
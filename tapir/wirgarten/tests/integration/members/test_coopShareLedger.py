@@ -0,0 +1,89 @@
+import datetime
+from decimal import Decimal
+
+from tapir.wirgarten.models import CoopShareLedger, CoopShareTransaction
+from tapir.wirgarten.service.coop_share_ledger import (
+    find_coop_share_ledger_differences,
+    rebuild_coop_share_ledgers,
+)
+from tapir.wirgarten.tests.factories import CoopShareTransactionFactory, MemberFactory
+from tapir.wirgarten.tests.test_utils import (
+    TapirIntegrationTest,
+    mock_timezone,
+    set_bypass_keycloak,
+)
+
+
+class TestCoopShareLedger(TapirIntegrationTest):
+    NOW = datetime.datetime(year=2023, month=6, day=15)
+
+    def setUp(self):
+        set_bypass_keycloak()
+        mock_timezone(self, self.NOW)
+        self.member = MemberFactory.create()
+
+    def create_transaction(self, quantity, valid_at, transaction_type=None):
+        return CoopShareTransactionFactory.create(
+            member=self.member,
+            transaction_type=transaction_type
+            or CoopShareTransaction.CoopShareTransactionType.PURCHASE,
+            quantity=quantity,
+            share_price=50,
+            valid_at=valid_at,
+        )
+
+    def test_save_severalTransactions_ledgerContainsValidBalance(self):
+        self.create_transaction(3, datetime.date(2023, 1, 1))
+        self.create_transaction(
+            -1,
+            datetime.date(2023, 3, 1),
+            CoopShareTransaction.CoopShareTransactionType.CANCELLATION,
+        )
+
+        ledger = CoopShareLedger.objects.get(member=self.member)
+        self.assertEqual(2, ledger.quantity)
+        self.assertEqual(Decimal("100.00"), ledger.total_value)
+        self.assertEqual(datetime.date(2023, 1, 1), ledger.entry_date)
+        self.assertEqual(2, self.member.coop_shares_quantity)
+        self.assertEqual(Decimal("100.00"), self.member.coop_shares_total_value())
+        self.assertEqual(datetime.date(2023, 1, 1), self.member.coop_entry_date)
+
+    def test_delete_transactionDeleted_ledgerIsUpdated(self):
+        self.create_transaction(3, datetime.date(2023, 1, 1))
+        self.create_transaction(2, datetime.date(2023, 2, 1)).delete()
+
+        self.assertEqual(3, CoopShareLedger.objects.get(member=self.member).quantity)
+
+    def test_coopSharesQuantity_futureTransactionBecomesValid_ledgerIsRecalculatedWithoutWriting(
+        self,
+    ):
+        self.create_transaction(3, datetime.date(2023, 1, 1))
+        self.create_transaction(2, datetime.date(2023, 7, 1))
+        self.assertEqual(3, self.member.coop_shares_quantity)
+
+        mock_timezone(self, datetime.datetime(year=2023, month=7, day=2))
+
+        self.assertEqual(5, self.member.coop_shares_quantity)
+        self.assertEqual(3, CoopShareLedger.objects.get(member=self.member).quantity)
+
+        rebuild_coop_share_ledgers()
+        self.assertEqual(5, CoopShareLedger.objects.get(member=self.member).quantity)
+
+    def test_coopSharesTotalValue_noTransactions_returnsZeroFloat(self):
+        self.assertEqual(0.0, self.member.coop_shares_total_value())
+        self.assertIsInstance(self.member.coop_shares_total_value(), float)
+
+    def test_findCoopShareLedgerDifferences_ledgerModifiedManually_differenceIsReportedAndFixed(
+        self,
+    ):
+        self.create_transaction(3, datetime.date(2023, 1, 1))
+        self.assertEqual([], find_coop_share_ledger_differences())
+
+        CoopShareLedger.objects.filter(member=self.member).update(quantity=7)
+
+        self.assertEqual(
+            [(self.member.id, "quantity", 7, 3)],
+            find_coop_share_ledger_differences(),
+        )
+        rebuild_coop_share_ledgers([self.member.id])
+        self.assertEqual([], find_coop_share_ledger_differences())
@@ -0,0 +1,70 @@
+from unittest.mock import MagicMock, patch
+
+from tapir.accounts.models import KeycloakUser
+from tapir.accounts.tasks import sync_keycloak_user
+from tapir.wirgarten.models import Member
+from tapir.wirgarten.tests.factories import MemberFactory
+from tapir.wirgarten.tests.test_utils import TapirIntegrationTest, set_bypass_keycloak
+
+
+class TestKeycloakSync(TapirIntegrationTest):
+    def setUp(self):
+        super().setUp()
+        set_bypass_keycloak()
+        member = MemberFactory.create(keycloak_id="keycloak-id")
+        self.member = Member.objects.get(id=member.id)
+
+        self.keycloak_client = MagicMock()
+        patcher = patch.object(
+            KeycloakUser, "get_keycloak_client", return_value=self.keycloak_client
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_save_noSyncedFieldChanged_doesNotContactKeycloak(self):
+        self.member.street = "Neue Straße 1"
+
+        with patch("tapir.accounts.tasks.sync_keycloak_user.delay") as mock_delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.member.save(bypass_keycloak=False)
+
+        self.assertEqual(0, len(self.keycloak_client.method_calls))
+        mock_delay.assert_not_called()
+
+    def test_save_nameChanged_syncsAfterCommit(self):
+        self.member.first_name = "Neuer Name"
+
+        with patch("tapir.accounts.tasks.sync_keycloak_user.delay") as mock_delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.member.save(bypass_keycloak=False)
+
+        self.assertEqual(0, len(self.keycloak_client.method_calls))
+        mock_delay.assert_called_once_with(self.member.id, False)
+
+    def test_save_savedTwice_onlySyncsChangesSinceLastSave(self):
+        self.member.last_name = "Neuer Name"
+        with patch("tapir.accounts.tasks.sync_keycloak_user.delay") as mock_delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.member.save(bypass_keycloak=False)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.member.save(bypass_keycloak=False)
+
+        mock_delay.assert_called_once()
+
+    def test_syncKeycloakUser_accountDeletedInKeycloak_recreatesAccount(self):
+        self.keycloak_client.get_user.side_effect = Exception("User not found")
+        self.keycloak_client.get_user_id.return_value = None
+        self.keycloak_client.create_user.return_value = "new-keycloak-id"
+
+        sync_keycloak_user(self.member.id)
+
+        self.keycloak_client.create_user.assert_called_once()
+        self.keycloak_client.update_user.assert_not_called()
+        self.member.refresh_from_db()
+        self.assertEqual("new-keycloak-id", self.member.keycloak_id)
+
+    def test_syncKeycloakUser_accountExists_updatesAccount(self):
+        sync_keycloak_user(self.member.id)
+
+        self.keycloak_client.create_user.assert_not_called()
+        self.keycloak_client.update_user.assert_called_once()
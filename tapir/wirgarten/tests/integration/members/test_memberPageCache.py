@@ -0,0 +1,84 @@
+import datetime
+
+from django.conf import settings
+from django.urls import reverse
+
+from tapir.wirgarten.parameters import ParameterDefinitions
+from tapir.wirgarten.service.member_page_cache import (
+    get_member_fragment,
+    get_member_page_version,
+)
+from tapir.wirgarten.tests.factories import (
+    CoopShareTransactionFactory,
+    MemberFactory,
+)
+from tapir.wirgarten.tests.test_utils import TapirIntegrationTest, set_bypass_keycloak
+
+
+class TestMemberPageCache(TapirIntegrationTest):
+    def setUp(self):
+        super().setUp()
+        ParameterDefinitions().import_definitions()
+        set_bypass_keycloak()
+        self.member = MemberFactory.create()
+
+    def test_getMemberPageVersion_dataOfMemberChanged_onlyVersionOfThatMemberChanges(
+        self,
+    ):
+        other_member = MemberFactory.create()
+        version, _ = get_member_page_version(self.member.id)
+        other_version, _ = get_member_page_version(other_member.id)
+
+        CoopShareTransactionFactory.create(
+            member=self.member, valid_at=datetime.date(2023, 1, 1)
+        )
+
+        self.assertNotEqual(version, get_member_page_version(self.member.id)[0])
+        self.assertEqual(other_version, get_member_page_version(other_member.id)[0])
+
+    def test_getMemberFragment_memberDataChanged_fragmentIsRebuilt(self):
+        calls = []
+
+        def build():
+            calls.append(1)
+            return len(calls)
+
+        self.assertEqual(1, get_member_fragment(self.member.id, "test", build))
+        self.assertEqual(1, get_member_fragment(self.member.id, "test", build))
+
+        self.member.first_name = "Changed"
+        self.member.save()
+
+        self.assertEqual(2, get_member_fragment(self.member.id, "test", build))
+
+    def test_memberPaymentsView_pageNotChanged_returnsNotModified(self):
+        self.client.force_login(self.member)
+        url = reverse("wirgarten:member_payments", args=[self.member.id])
+
+        # the first response sets the CSRF cookie, which is part of the ETag
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertStatusCode(response, 200)
+        etag = response["ETag"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertStatusCode(response, 304)
+
+        CoopShareTransactionFactory.create(
+            member=self.member, valid_at=datetime.date(2023, 1, 1)
+        )
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertStatusCode(response, 200)
+        self.assertNotEqual(etag, response["ETag"])
+
+    def test_memberPaymentsView_csrfCookieChanged_returnsFullPage(self):
+        self.client.force_login(self.member)
+        url = reverse("wirgarten:member_payments", args=[self.member.id])
+        self.client.get(url)
+        etag = self.client.get(url)["ETag"]
+
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = "x" * 64
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertStatusCode(response, 200)
@@ -0,0 +1,98 @@
+import datetime
+
+from tapir.wirgarten.models import Payment, PaymentTransaction
+from tapir.wirgarten.parameters import ParameterDefinitions
+from tapir.wirgarten.service.member_page_cache import get_member_page_version
+from tapir.wirgarten.service.payment_export import (
+    create_due_payments,
+    export_payments_of_type,
+)
+from tapir.wirgarten.service.payment_timeline import COOP_SHARES_PAYMENT_TYPE
+from tapir.wirgarten.tests.factories import (
+    PaymentFactory,
+    ProductPriceFactory,
+    SubscriptionFactory,
+)
+from tapir.wirgarten.tests.test_utils import (
+    TapirIntegrationTest,
+    mock_timezone,
+    set_bypass_keycloak,
+)
+
+
+class TestExportPaymentsOfType(TapirIntegrationTest):
+    NOW = datetime.datetime(year=2023, month=6, day=5, hour=12)
+    DUE_DATE = datetime.date(2023, 6, 15)
+
+    def setUp(self):
+        super().setUp()
+        ParameterDefinitions().import_definitions()
+        set_bypass_keycloak()
+        mock_timezone(self, self.NOW)
+
+        product_price = ProductPriceFactory.create(
+            price=100, valid_from=datetime.date(2023, 1, 1)
+        )
+        self.subscription = SubscriptionFactory.create(
+            product=product_price.product,
+            quantity=2,
+            solidarity_price=0.0,
+            start_date=datetime.date(2023, 6, 1),
+            end_date=datetime.date(2023, 8, 31),
+        )
+        self.payment_type = self.subscription.product.type.name
+
+    def test_createDuePayments_calledTwice_createsPaymentsOnlyOnce(self):
+        self.assertEqual(1, create_due_payments(self.DUE_DATE))
+        self.assertEqual(0, create_due_payments(self.DUE_DATE))
+
+        payment = Payment.objects.get()
+        self.assertEqual(200, payment.amount)
+        self.assertEqual(self.payment_type, payment.type)
+
+    def test_exportPaymentsOfType_default_linksPaymentsToTransaction(self):
+        create_due_payments(self.DUE_DATE)
+
+        payment_transaction = export_payments_of_type(self.DUE_DATE, self.payment_type)
+
+        self.assertEqual(self.DUE_DATE, payment_transaction.due_date)
+        self.assertEqual(payment_transaction, Payment.objects.get().transaction)
+        content = bytes(payment_transaction.file.file).decode("utf-8")
+        self.assertIn(self.subscription.mandate_ref.ref, content)
+        self.assertIn(
+            f"{self.subscription.member.last_name} {self.payment_type}", content
+        )
+
+    def test_exportPaymentsOfType_default_memberPageVersionChanges(self):
+        member_id = self.subscription.member_id
+        create_due_payments(self.DUE_DATE)
+        version, _ = get_member_page_version(member_id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            export_payments_of_type(self.DUE_DATE, self.payment_type)
+
+        self.assertNotEqual(version, get_member_page_version(member_id)[0])
+
+    def test_exportPaymentsOfType_alreadyExported_doesNothing(self):
+        create_due_payments(self.DUE_DATE)
+        export_payments_of_type(self.DUE_DATE, self.payment_type)
+
+        self.assertIsNone(export_payments_of_type(self.DUE_DATE, self.payment_type))
+        self.assertEqual(1, PaymentTransaction.objects.count())
+
+    def test_exportPaymentsOfType_coopShares_includesOlderUnexportedPayments(self):
+        older_payment = PaymentFactory.create(
+            mandate_ref=self.subscription.mandate_ref,
+            type=COOP_SHARES_PAYMENT_TYPE,
+            due_date=datetime.date(2023, 5, 15),
+            amount=50,
+            transaction=None,
+        )
+
+        payment_transaction = export_payments_of_type(
+            self.DUE_DATE, COOP_SHARES_PAYMENT_TYPE
+        )
+
+        older_payment.refresh_from_db()
+        self.assertEqual(payment_transaction, older_payment.transaction)
+        self.assertEqual("Geschäftsanteile", payment_transaction.type)
@@ -0,0 +1,89 @@
+import datetime
+from decimal import Decimal
+
+from tapir.wirgarten.service.solidarity import (
+    KEY_ABSOLUTE,
+    KEY_RELATIVE,
+    KEY_TOTAL,
+    get_solidarity_ledger,
+)
+from tapir.wirgarten.tests.factories import ProductPriceFactory, SubscriptionFactory
+from tapir.wirgarten.tests.test_utils import TapirIntegrationTest, set_bypass_keycloak
+
+
+class TestGetSolidarityLedger(TapirIntegrationTest):
+    REFERENCE_DATE = datetime.date(year=2023, month=6, day=15)
+
+    def setUp(self):
+        super().setUp()
+        set_bypass_keycloak()
+        self.product_price = ProductPriceFactory.create(
+            price=100, valid_from=datetime.date(2023, 1, 1)
+        )
+
+    def create_subscription(self, **kwargs):
+        return SubscriptionFactory.create(
+            product=self.product_price.product,
+            start_date=datetime.date(2023, 1, 1),
+            end_date=datetime.date(2023, 12, 31),
+            **kwargs,
+        )
+
+    def test_getSolidarityLedger_relativeAndAbsoluteContributions_bothAreCounted(
+        self,
+    ):
+        self.create_subscription(quantity=2, solidarity_price=0.1)
+        self.create_subscription(quantity=1, solidarity_price=-0.15)
+        self.create_subscription(
+            quantity=1, solidarity_price=0, solidarity_price_absolute=Decimal("12.50")
+        )
+
+        ledger = get_solidarity_ledger(self.REFERENCE_DATE)
+
+        self.assertEqual(Decimal("5.00"), ledger[KEY_RELATIVE])
+        self.assertEqual(Decimal("12.50"), ledger[KEY_ABSOLUTE])
+        self.assertEqual(Decimal("17.50"), ledger[KEY_TOTAL])
+
+    def test_getSolidarityLedger_newPriceLaterThanReferenceDate_usesPriceValidAtReferenceDate(
+        self,
+    ):
+        ProductPriceFactory.create(
+            product=self.product_price.product,
+            price=200,
+            valid_from=datetime.date(2023, 7, 1),
+        )
+        self.create_subscription(quantity=1, solidarity_price=0.1)
+
+        self.assertEqual(
+            Decimal("10.00"), get_solidarity_ledger(self.REFERENCE_DATE)[KEY_TOTAL]
+        )
+
+    def test_getSolidarityLedger_productHasOnlyFuturePrice_singlePriceIsUsed(self):
+        product_price = ProductPriceFactory.create(
+            price=50, valid_from=datetime.date(2023, 7, 1)
+        )
+        SubscriptionFactory.create(
+            product=product_price.product,
+            quantity=1,
+            solidarity_price=0.2,
+            start_date=datetime.date(2023, 1, 1),
+            end_date=datetime.date(2023, 12, 31),
+        )
+
+        self.assertEqual(
+            Decimal("10.00"), get_solidarity_ledger(self.REFERENCE_DATE)[KEY_TOTAL]
+        )
+
+    def test_getSolidarityLedger_subscriptionAddedAfterFirstCall_cacheIsInvalidated(
+        self,
+    ):
+        self.create_subscription(quantity=1, solidarity_price=0.1)
+        self.assertEqual(
+            Decimal("10.00"), get_solidarity_ledger(self.REFERENCE_DATE)[KEY_TOTAL]
+        )
+
+        self.create_subscription(quantity=1, solidarity_price=0.2)
+
+        self.assertEqual(
+            Decimal("30.00"), get_solidarity_ledger(self.REFERENCE_DATE)[KEY_TOTAL]
+        )
@@ -0,0 +1,96 @@
+import datetime
+
+from tapir.wirgarten.parameters import ParameterDefinitions
+from tapir.wirgarten.service.payment_timeline import (
+    build_payment_timelines,
+    get_next_payment,
+    get_payment_timeline,
+)
+from tapir.wirgarten.tests.factories import (
+    PaymentFactory,
+    ProductPriceFactory,
+    SubscriptionFactory,
+)
+from tapir.wirgarten.tests.test_utils import (
+    TapirIntegrationTest,
+    mock_timezone,
+    set_bypass_keycloak,
+)
+
+
+class TestPaymentTimeline(TapirIntegrationTest):
+    NOW = datetime.datetime(year=2023, month=6, day=5, hour=12)
+
+    def setUp(self):
+        super().setUp()
+        ParameterDefinitions().import_definitions()
+        set_bypass_keycloak()
+        mock_timezone(self, self.NOW)
+
+        product_price = ProductPriceFactory.create(
+            price=100, valid_from=datetime.date(2023, 1, 1)
+        )
+        self.subscription = SubscriptionFactory.create(
+            product=product_price.product,
+            quantity=2,
+            solidarity_price=0.0,
+            start_date=datetime.date(2023, 6, 1),
+            end_date=datetime.date(2023, 8, 31),
+        )
+        self.member = self.subscription.member
+
+    def create_edited_payment(self):
+        return PaymentFactory.create(
+            mandate_ref=self.subscription.mandate_ref,
+            type=self.subscription.product.type.name,
+            due_date=datetime.date(2023, 6, 15),
+            amount=150,
+            status="DUE",
+            edited=True,
+            transaction=None,
+        )
+
+    def test_getPaymentTimeline_persistedPaymentForDueDate_replacesProjectedPayment(
+        self,
+    ):
+        self.create_edited_payment()
+
+        timeline = get_payment_timeline(self.member.id)
+
+        self.assertEqual(
+            [
+                (datetime.date(2023, 6, 15), 150.0, True),
+                (datetime.date(2023, 7, 15), 200.0, False),
+                (datetime.date(2023, 8, 15), 200.0, False),
+            ],
+            [
+                (payment["due_date"], payment["amount"], payment["edited"])
+                for payment in timeline
+            ],
+        )
+        self.assertEqual(200.0, timeline[0]["calculated_amount"])
+
+    def test_getNextPayment_persistedPayment_usesPersistedAmount(self):
+        self.create_edited_payment()
+
+        next_payment = get_next_payment(self.member.id)
+
+        self.assertEqual(datetime.date(2023, 6, 15), next_payment["due_date"])
+        self.assertEqual(150.0, next_payment["amount"])
+        self.assertEqual(self.subscription.mandate_ref, next_payment["mandate_ref"])
+
+    def test_buildPaymentTimelines_severalMembers_sameResultAsSingleMember(self):
+        other_subscription = SubscriptionFactory.create(
+            product=self.subscription.product,
+            quantity=1,
+            solidarity_price=0.0,
+            start_date=datetime.date(2023, 7, 1),
+            end_date=datetime.date(2023, 7, 31),
+        )
+        member_ids = [self.member.id, other_subscription.member_id]
+
+        timelines = build_payment_timelines(member_ids)
+
+        for member_id in member_ids:
+            self.assertEqual(get_payment_timeline(member_id), timelines[member_id])
+        self.assertEqual(1, len(timelines[other_subscription.member_id]))
@@ -0,0 +1,113 @@
+import datetime
+
+from tapir.wirgarten.forms.pickup_location import get_current_capacity
+from tapir.wirgarten.parameters import ParameterDefinitions
+from tapir.wirgarten.service.delivery import get_member_ids_at_pickup_location
+from tapir.wirgarten.tests.factories import (
+    MemberPickupLocationFactory,
+    PickupLocationFactory,
+    ProductFactory,
+    ProductPriceFactory,
+    SubscriptionFactory,
+)
+from tapir.wirgarten.tests.test_utils import TapirIntegrationTest
+
+
+class TestGetCurrentCapacity(TapirIntegrationTest):
+    def setUp(self):
+        super().setUp()
+        ParameterDefinitions().import_definitions()
+
+        self.product = ProductFactory.create()
+        ProductPriceFactory.create(
+            product=self.product, price=10, valid_from=datetime.date(2023, 1, 1)
+        )
+        ProductPriceFactory.create(
+            product=self.product, price=20, valid_from=datetime.date(2023, 3, 1)
+        )
+
+        self.location_a = PickupLocationFactory.create()
+        self.location_b = PickupLocationFactory.create()
+
+        self.moving_subscription = self.create_subscription(quantity=2)
+        MemberPickupLocationFactory.create(
+            member=self.moving_subscription.member,
+            pickup_location=self.location_a,
+            valid_from=datetime.date(2023, 1, 1),
+        )
+        MemberPickupLocationFactory.create(
+            member=self.moving_subscription.member,
+            pickup_location=self.location_b,
+            valid_from=datetime.date(2023, 3, 1),
+        )
+
+        self.staying_subscription = self.create_subscription(quantity=3)
+        MemberPickupLocationFactory.create(
+            member=self.staying_subscription.member,
+            pickup_location=self.location_a,
+            valid_from=datetime.date(2023, 1, 1),
+        )
+
+        self.capability = {
+            "pickup_location_id": self.location_a.id,
+            "product_type_id": self.product.type_id,
+        }
+
+    def create_subscription(self, quantity):
+        return SubscriptionFactory.create(
+            product=self.product,
+            quantity=quantity,
+            start_date=datetime.date(2023, 1, 1),
+            end_date=datetime.date(2023, 12, 31),
+        )
+
+    def test_getCurrentCapacity_beforeLocationAndPriceChange_usesOldLocationsAndPrice(
+        self,
+    ):
+        self.assertEqual(
+            50.0, get_current_capacity(self.capability, datetime.date(2023, 2, 15))
+        )
+
+    def test_getCurrentCapacity_afterLocationAndPriceChange_usesNewLocationsAndPrice(
+        self,
+    ):
+        self.assertEqual(
+            60.0, get_current_capacity(self.capability, datetime.date(2023, 3, 15))
+        )
+
+    def test_getCurrentCapacity_additionalSubscriptionFilter_onlyCountsFilteredSubscriptions(
+        self,
+    ):
+        self.assertEqual(
+            20.0,
+            get_current_capacity(
+                self.capability,
+                datetime.date(2023, 2, 15),
+                additional_subscription_filter=lambda subscriptions: subscriptions.exclude(
+                    id=self.staying_subscription.id
+                ),
+            ),
+        )
+
+    def test_getMemberIdsAtPickupLocation_default_returnsMembersWhoseLatestValidLocationMatches(
+        self,
+    ):
+        self.assertEqual(
+            {
+                self.moving_subscription.member_id,
+                self.staying_subscription.member_id,
+            },
+            set(
+                get_member_ids_at_pickup_location(
+                    self.location_a, datetime.date(2023, 2, 15)
+                )
+            ),
+        )
+        self.assertEqual(
+            {self.staying_subscription.member_id},
+            set(
+                get_member_ids_at_pickup_location(
+                    self.location_a.id, datetime.date(2023, 3, 15)
+                )
+            ),
+        )
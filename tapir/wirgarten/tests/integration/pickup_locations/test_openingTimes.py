@@ -0,0 +1,58 @@
+import datetime
+
+from tapir.wirgarten.models import PickupLocation, PickupLocationOpeningTime
+from tapir.wirgarten.tests.factories import PickupLocationFactory
+from tapir.wirgarten.tests.test_utils import TapirIntegrationTest
+
+
+class TestOpeningTimes(TapirIntegrationTest):
+    def setUp(self):
+        super().setUp()
+        self.pickup_locations = PickupLocationFactory.create_batch(3)
+        for pickup_location in self.pickup_locations:
+            self.create_opening_time(pickup_location, day_of_week=1)
+
+    @staticmethod
+    def create_opening_time(pickup_location, day_of_week):
+        PickupLocationOpeningTime.objects.create(
+            pickup_location=pickup_location,
+            day_of_week=day_of_week,
+            open_time=datetime.time(16, 0),
+            close_time=datetime.time(18, 30),
+        )
+
+    def test_openingTimesHtml_severalLocations_loadsOpeningTimesOnce(self):
+        with self.assertNumQueries(1):
+            for pickup_location in self.pickup_locations:
+                self.assertIn("16:00-18:30", pickup_location.opening_times_html)
+
+        with self.assertNumQueries(0):
+            for pickup_location in self.pickup_locations:
+                pickup_location.opening_times_html
+
+    def test_openingTimesHtml_prefetched_readsFromPrefetchCache(self):
+        pickup_locations = list(
+            PickupLocation.objects.prefetch_related("opening_times")
+        )
+
+        with self.assertNumQueries(0):
+            for pickup_location in pickup_locations:
+                self.assertIn("16:00-18:30", pickup_location.opening_times_html)
+
+    def test_openingTimesHtml_openingTimeAdded_newOpeningTimeRendered(self):
+        pickup_location = self.pickup_locations[0]
+        self.assertEqual(1, pickup_location.opening_times_html.count("<tr>"))
+
+        self.create_opening_time(pickup_location, day_of_week=2)
+
+        self.assertEqual(2, pickup_location.opening_times_html.count("<tr>"))
+
+    def test_openingTimesHtml_openingTimeDeleted_openingTimeNotRendered(self):
+        pickup_location = self.pickup_locations[0]
+        self.assertEqual(1, pickup_location.opening_times_html.count("<tr>"))
+
+        PickupLocationOpeningTime.objects.filter(
+            pickup_location=pickup_location
+        ).delete()
+
+        self.assertEqual(0, pickup_location.opening_times_html.count("<tr>"))
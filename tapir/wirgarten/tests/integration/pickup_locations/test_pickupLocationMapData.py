@@ -0,0 +1,67 @@
+import datetime
+
+from django.urls import reverse
+
+from tapir.wirgarten.tests.factories import PickupLocationFactory
+from tapir.wirgarten.tests.test_utils import TapirIntegrationTest, mock_timezone
+
+
+class TestPickupLocationMapData(TapirIntegrationTest):
+    def setUp(self):
+        super().setUp()
+        self.pickup_location = PickupLocationFactory.create()
+
+    def test_getPickupLocationMapData_default_returnsJsonOfAllLocations(self):
+        response = self.client.get(reverse("wirgarten:pickup_location_map_data"))
+
+        self.assertEqual(200, response.status_code)
+        self.assertIn(self.pickup_location.id, response.json())
+        self.assertIn("ETag", response)
+
+    def test_getPickupLocationMapData_etagUnchanged_returnsNotModified(self):
+        url = reverse("wirgarten:pickup_location_map_data")
+        etag = self.client.get(url)["ETag"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(304, response.status_code)
+
+    def test_getPickupLocationMapData_locationChanged_returnsNewData(self):
+        url = reverse("wirgarten:pickup_location_map_data")
+        etag = self.client.get(url)["ETag"]
+
+        self.pickup_location.name = "Neuer Name"
+        self.pickup_location.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual("Neuer Name", response.json()[self.pickup_location.id]["name"])
+
+    def test_getPickupLocationMapData_invalidReferenceDate_returnsBadRequest(self):
+        response = self.client.get(
+            reverse("wirgarten:pickup_location_map_data") + "?reference_date=abc"
+        )
+
+        self.assertEqual(400, response.status_code)
+
+    def test_getPickupLocationMapData_nextContractStartDate_returnsJsonOfAllLocations(
+        self,
+    ):
+        mock_timezone(self, datetime.datetime(2023, 6, 15, 12))
+
+        response = self.client.get(
+            reverse("wirgarten:pickup_location_map_data") + "?reference_date=2023-07-01"
+        )
+
+        self.assertEqual(200, response.status_code)
+        self.assertIn(self.pickup_location.id, response.json())
+        self.assertNotIn("Last-Modified", response)
+
+    def test_getPickupLocationMapData_otherReferenceDate_returnsBadRequest(self):
+        mock_timezone(self, datetime.datetime(2023, 6, 15, 12))
+
+        response = self.client.get(
+            reverse("wirgarten:pickup_location_map_data") + "?reference_date=2023-08-01"
+        )
+
+        self.assertEqual(400, response.status_code)
@@ -0,0 +1,80 @@
+import datetime
+import json
+
+from django.test import RequestFactory
+
+from tapir.wirgarten.tests.factories import (
+    GrowingPeriodFactory,
+    ProductCapacityFactory,
+    ProductFactory,
+    ProductPriceFactory,
+    ProductTypeFactory,
+)
+from tapir.wirgarten.tests.test_utils import TapirIntegrationTest, mock_timezone
+from tapir.wirgarten.views.product_cfg import ProductCfgView
+
+
+class TestProductCfgView(TapirIntegrationTest):
+    NOW = datetime.datetime(year=2023, month=6, day=15)
+
+    def setUp(self):
+        super().setUp()
+        mock_timezone(self, self.NOW)
+
+        self.growing_periods = [
+            GrowingPeriodFactory.create(
+                start_date=datetime.date(year, 1, 1),
+                end_date=datetime.date(year, 12, 31),
+            )
+            for year in [2023, 2024]
+        ]
+        self.product_types = ProductTypeFactory.create_batch(2)
+        self.products = {}
+        for product_type in self.product_types:
+            base_product = ProductFactory.create(type=product_type)
+            other_product = ProductFactory.create(type=product_type)
+            for product, price in [(base_product, 50), (other_product, 100)]:
+                ProductPriceFactory.create(
+                    product=product, price=price, valid_from=datetime.date(2023, 1, 1)
+                )
+                ProductPriceFactory.create(
+                    product=product,
+                    price=price + 10,
+                    valid_from=datetime.date(2024, 1, 1),
+                )
+            self.products[product_type.id] = [base_product, other_product]
+            for growing_period in self.growing_periods:
+                ProductCapacityFactory.create(
+                    period=growing_period, product_type=product_type
+                )
+
+    def get_context_data(self):
+        view = ProductCfgView()
+        view.setup(RequestFactory().get("/"))
+        return view.get_context_data()
+
+    def test_getContextData_default_numberOfQueriesIndependentOfProductsAndPeriods(
+        self,
+    ):
+        with self.assertNumQueries(5):
+            self.get_context_data()
+
+    def test_getContextData_default_mapsCapacitiesToProductsOfTheirType(self):
+        context = self.get_context_data()
+
+        c_p_map = json.loads(context["c_p_map"])
+        self.assertEqual(4, len(c_p_map))
+        for capacity in context["capacities"]:
+            self.assertEqual(
+                {product.id for product in self.products[capacity.product_type_id]},
+                set(c_p_map[capacity.id]),
+            )
+
+    def test_getContextData_default_shareIsRelativeToCurrentBasePrice(self):
+        context = self.get_context_data()
+
+        shares = {product["id"]: product["share"] for product in context["products"]}
+        for base_product, other_product in self.products.values():
+            self.assertEqual(1, shares[base_product.id])
+            # the share uses the older of the two displayed prices, like before
+            self.assertEqual(2, shares[other_product.id])
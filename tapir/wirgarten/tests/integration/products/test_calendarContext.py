@@ -0,0 +1,57 @@
+import datetime
+
+from tapir.wirgarten.parameters import ParameterDefinitions
+from tapir.wirgarten.service.calendar_context import calendar_context_scope
+from tapir.wirgarten.service.delivery import get_next_delivery_date
+from tapir.wirgarten.service.payment import get_next_payment_date
+from tapir.wirgarten.service.products import (
+    get_current_growing_period,
+    get_next_growing_period,
+)
+from tapir.wirgarten.tests.factories import GrowingPeriodFactory
+from tapir.wirgarten.tests.test_utils import TapirIntegrationTest, mock_timezone
+
+
+class TestCalendarContext(TapirIntegrationTest):
+    NOW = datetime.datetime(2023, 4, 15, 12, 0, tzinfo=datetime.timezone.utc)
+
+    def setUp(self):
+        super().setUp()
+        ParameterDefinitions().import_definitions()
+        mock_timezone(self, self.NOW)
+        self.current_growing_period = GrowingPeriodFactory.create(
+            start_date=datetime.date(2023, 1, 1), end_date=datetime.date(2023, 12, 31)
+        )
+
+    def test_calendarContextScope_repeatedLookups_loadsDataOnlyOnce(self):
+        with calendar_context_scope():
+            # growing periods, delivery day and payment due day
+            with self.assertNumQueries(3):
+                for _ in range(3):
+                    self.assertEqual(
+                        self.current_growing_period, get_current_growing_period()
+                    )
+                    self.assertIsNone(get_next_growing_period())
+                    get_next_delivery_date()
+                    get_next_payment_date()
+
+    def test_calendarContextScope_growingPeriodCreated_newGrowingPeriodFound(self):
+        with calendar_context_scope():
+            self.assertIsNone(get_next_growing_period())
+
+            next_growing_period = GrowingPeriodFactory.create(
+                start_date=datetime.date(2024, 1, 1),
+                end_date=datetime.date(2024, 12, 31),
+            )
+
+            self.assertEqual(next_growing_period, get_next_growing_period())
+
+    def test_calendarContextScope_dateChanged_lookupsUseNewDate(self):
+        with calendar_context_scope():
+            self.assertEqual(self.current_growing_period, get_current_growing_period())
+
+            mock_timezone(
+                self, datetime.datetime(2024, 2, 1, tzinfo=datetime.timezone.utc)
+            )
+
+            self.assertIsNone(get_current_growing_period())
@@ -0,0 +1,80 @@
+import datetime
+
+from tapir.wirgarten.models import MemberSegmentMembership
+from tapir.wirgarten.service.member_segments import (
+    ensure_member_segment_memberships,
+    get_members_in_segment,
+    refresh_member_segment_memberships,
+)
+from tapir.wirgarten.tests.factories import (
+    CoopShareTransactionFactory,
+    MemberFactory,
+)
+from tapir.wirgarten.tests.test_utils import (
+    TapirIntegrationTest,
+    mock_timezone,
+    set_bypass_keycloak,
+)
+
+
+class MemberSegmentMembershipTest(TapirIntegrationTest):
+    NOW = datetime.datetime(2023, 4, 15, 12, 0, tzinfo=datetime.timezone.utc)
+
+    def setUp(self):
+        super().setUp()
+        mock_timezone(self, self.NOW)
+        set_bypass_keycloak()
+        self.member = MemberFactory.create()
+
+    def test_ensureMemberSegmentMemberships_memberWithoutFlags_flagsCreated(self):
+        ensure_member_segment_memberships()
+
+        membership = MemberSegmentMembership.objects.get(member=self.member)
+        self.assertFalse(membership.is_coop_member)
+        self.assertEqual(self.NOW.date(), membership.valid_for)
+
+    def test_ensureMemberSegmentMemberships_flagsUpToDate_onlyChecksFlags(self):
+        ensure_member_segment_memberships()
+
+        with self.assertNumQueries(2):
+            ensure_member_segment_memberships()
+
+    def test_getMembersInSegment_sharesBecomeValidOnNextDay_flagsRecalculated(self):
+        CoopShareTransactionFactory.create(
+            member=self.member, valid_at=self.NOW.date() + datetime.timedelta(days=1)
+        )
+        self.assertFalse(get_members_in_segment(is_coop_member=True).exists())
+
+        mock_timezone(self, self.NOW + datetime.timedelta(days=1))
+
+        self.assertEqual(
+            [self.member.id],
+            list(
+                get_members_in_segment(is_coop_member=True).values_list("id", flat=True)
+            ),
+        )
+
+    def test_coopShareTransactionSaved_afterCommit_flagsRefreshed(self):
+        ensure_member_segment_memberships()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CoopShareTransactionFactory.create(
+                member=self.member, valid_at=self.NOW.date()
+            )
+
+        self.assertTrue(
+            MemberSegmentMembership.objects.get(member=self.member).is_coop_member
+        )
+
+    def test_refreshMemberSegmentMemberships_rowExists_rowUpdated(self):
+        MemberSegmentMembership.objects.create(
+            member=self.member,
+            is_coop_member=True,
+            valid_for=self.NOW.date() - datetime.timedelta(days=1),
+        )
+
+        refresh_member_segment_memberships([self.member.id])
+
+        membership = MemberSegmentMembership.objects.get(member=self.member)
+        self.assertFalse(membership.is_coop_member)
+        self.assertEqual(self.NOW.date(), membership.valid_for)
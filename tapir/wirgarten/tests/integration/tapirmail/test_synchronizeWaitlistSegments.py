@@ -0,0 +1,74 @@
+import datetime
+
+from tapir_mail.models import StaticSegment, StaticSegmentRecipient
+
+from tapir.wirgarten.models import WaitingListEntry
+from tapir.wirgarten.tapirmail import (
+    get_waitlist_segment_name,
+    synchronize_waitlist_segments,
+)
+from tapir.wirgarten.tests.test_utils import TapirIntegrationTest
+
+
+class SynchronizeWaitlistSegmentsTest(TapirIntegrationTest):
+    def create_entries(self, *emails):
+        # bulk_create doesn't send the signals that keep the segments in sync
+        WaitingListEntry.objects.bulk_create(
+            [
+                WaitingListEntry(
+                    first_name="Erika",
+                    last_name="Mustermann",
+                    email=email,
+                    type=WaitingListEntry.WaitingListType.HARVEST_SHARES,
+                    privacy_consent=datetime.datetime(
+                        2023, 3, 15, tzinfo=datetime.timezone.utc
+                    ),
+                )
+                for email in emails
+            ]
+        )
+
+    def get_recipients(self):
+        return {
+            recipient.email: recipient
+            for recipient in StaticSegmentRecipient.objects.filter(
+                segment__name=get_waitlist_segment_name(
+                    WaitingListEntry.WaitingListType.HARVEST_SHARES
+                )
+            )
+        }
+
+    def test_synchronizeWaitlistSegments_entriesNotInSegment_recipientsCreated(self):
+        self.create_entries("a@example.com", "b@example.com")
+
+        synchronize_waitlist_segments()
+
+        self.assertEqual(
+            {"a@example.com", "b@example.com"}, self.get_recipients().keys()
+        )
+
+    def test_synchronizeWaitlistSegments_outdatedRecipients_recipientsUpdatedAndDeleted(
+        self,
+    ):
+        self.create_entries("a@example.com")
+        segment = StaticSegment.objects.create(
+            name=get_waitlist_segment_name(
+                WaitingListEntry.WaitingListType.HARVEST_SHARES
+            )
+        )
+        StaticSegmentRecipient.objects.create(
+            segment=segment, email="a@example.com", first_name="Old", last_name="Name"
+        )
+        StaticSegmentRecipient.objects.create(
+            segment=segment,
+            email="gone@example.com",
+            first_name="Gone",
+            last_name="Gone",
+        )
+
+        synchronize_waitlist_segments()
+
+        recipients = self.get_recipients()
+        self.assertEqual({"a@example.com"}, recipients.keys())
+        self.assertEqual("Erika", recipients["a@example.com"].first_name)
+        self.assertEqual("Mustermann", recipients["a@example.com"].last_name)
@@ -0,0 +1,163 @@
+import datetime
+from unittest.mock import patch
+
+from django.conf import settings
+
+from tapir.wirgarten.models import ScheduledTask
+from tapir.wirgarten.service.tasks import schedule_task_unique
+from tapir.wirgarten.tasks import execute_scheduled_task, execute_scheduled_tasks
+from tapir.wirgarten.tests.test_utils import TapirIntegrationTest, mock_timezone
+
+executed_calls = []
+
+
+def successful_task(*args, **kwargs):
+    executed_calls.append((args, kwargs))
+
+
+def failing_task():
+    raise ValueError("Something went wrong")
+
+
+def rescheduling_task():
+    schedule_task_unique(
+        rescheduling_task,
+        eta=TestExecuteScheduledTasks.NOW + datetime.timedelta(days=1),
+    )
+
+
+class TestExecuteScheduledTasks(TapirIntegrationTest):
+    NOW = datetime.datetime(2023, 4, 15, 12, 0, tzinfo=datetime.timezone.utc)
+
+    def setUp(self):
+        super().setUp()
+        mock_timezone(self, self.NOW)
+        executed_calls.clear()
+
+    @staticmethod
+    def create_task(function, eta, **kwargs):
+        return ScheduledTask.objects.create(
+            task_function=f"{__name__}.{function.__name__}", eta=eta, **kwargs
+        )
+
+    @patch("tapir.wirgarten.tasks.execute_scheduled_task.delay")
+    def test_executeScheduledTasks_default_onlyDueTasksAreClaimedAndDispatched(
+        self, mock_delay
+    ):
+        due_task = self.create_task(
+            successful_task, self.NOW - datetime.timedelta(minutes=1), task_args=[1]
+        )
+        future_task = self.create_task(
+            successful_task, self.NOW + datetime.timedelta(minutes=1), task_args=[2]
+        )
+
+        execute_scheduled_tasks()
+
+        mock_delay.assert_called_once_with(due_task.id)
+        due_task.refresh_from_db()
+        future_task.refresh_from_db()
+        self.assertEqual(ScheduledTask.STATUS_IN_PROGRESS, due_task.status)
+        self.assertEqual(ScheduledTask.STATUS_PENDING, future_task.status)
+
+    @patch("tapir.wirgarten.tasks.execute_scheduled_task.delay")
+    def test_executeScheduledTasks_calledTwice_taskIsDispatchedOnce(self, mock_delay):
+        self.create_task(successful_task, self.NOW)
+
+        execute_scheduled_tasks()
+        execute_scheduled_tasks()
+
+        self.assertEqual(1, mock_delay.call_count)
+
+    @patch("tapir.wirgarten.tasks.execute_scheduled_task.delay")
+    def test_executeScheduledTasks_claimTimedOut_taskIsClaimedAgain(self, mock_delay):
+        lost_task = self.create_task(successful_task, self.NOW, task_args=[1])
+        recent_task = self.create_task(successful_task, self.NOW, task_args=[2])
+        ScheduledTask.objects.filter(id=lost_task.id).update(
+            status=ScheduledTask.STATUS_IN_PROGRESS,
+            updated_at=self.NOW
+            - settings.SCHEDULED_TASKS_CLAIM_TIMEOUT
+            - datetime.timedelta(minutes=1),
+        )
+        ScheduledTask.objects.filter(id=recent_task.id).update(
+            status=ScheduledTask.STATUS_IN_PROGRESS, updated_at=self.NOW
+        )
+
+        execute_scheduled_tasks()
+
+        mock_delay.assert_called_once_with(lost_task.id)
+
+    def test_executeScheduledTask_messageDeliveredTwice_functionIsCalledOnce(self):
+        task = self.create_task(
+            successful_task, self.NOW, status=ScheduledTask.STATUS_IN_PROGRESS
+        )
+
+        execute_scheduled_task(task.id)
+        execute_scheduled_task(task.id)
+
+        self.assertEqual(1, len(executed_calls))
+
+    def test_executeScheduledTask_claimedTask_functionIsCalledWithArguments(self):
+        task = self.create_task(
+            successful_task,
+            self.NOW,
+            task_args=[1],
+            task_kwargs={"member_id": "abc"},
+            status=ScheduledTask.STATUS_IN_PROGRESS,
+        )
+
+        execute_scheduled_task(task.id)
+
+        task.refresh_from_db()
+        self.assertEqual(ScheduledTask.STATUS_DONE, task.status)
+        self.assertEqual([((1,), {"member_id": "abc"})], executed_calls)
+
+    def test_executeScheduledTask_notClaimed_functionIsNotCalled(self):
+        task = self.create_task(successful_task, self.NOW)
+
+        execute_scheduled_task(task.id)
+
+        task.refresh_from_db()
+        self.assertEqual(ScheduledTask.STATUS_PENDING, task.status)
+        self.assertEqual([], executed_calls)
+
+    def test_executeScheduledTask_failingTask_isRescheduledWithBackoff(self):
+        task = self.create_task(
+            failing_task,
+            self.NOW,
+            status=ScheduledTask.STATUS_IN_PROGRESS,
+            retry_count=1,
+        )
+
+        execute_scheduled_task(task.id)
+
+        task.refresh_from_db()
+        self.assertEqual(ScheduledTask.STATUS_PENDING, task.status)
+        self.assertEqual(2, task.retry_count)
+        self.assertEqual(self.NOW + ScheduledTask.RETRY_BACKOFF * 2, task.eta)
+        self.assertEqual("Something went wrong", task.error_message)
+
+    def test_executeScheduledTask_failingTaskWithoutRetriesLeft_isFailed(self):
+        task = self.create_task(
+            failing_task,
+            self.NOW,
+            status=ScheduledTask.STATUS_IN_PROGRESS,
+            retry_count=3,
+            max_retries=3,
+        )
+
+        execute_scheduled_task(task.id)
+
+        task.refresh_from_db()
+        self.assertEqual(ScheduledTask.STATUS_FAILED, task.status)
+        self.assertEqual(self.NOW, task.eta)
+
+    def test_executeScheduledTask_rescheduledDuringExecution_keepsNewSchedule(self):
+        task = self.create_task(
+            rescheduling_task, self.NOW, status=ScheduledTask.STATUS_IN_PROGRESS
+        )
+
+        execute_scheduled_task(task.id)
+
+        task.refresh_from_db()
+        self.assertEqual(ScheduledTask.STATUS_PENDING, task.status)
+        self.assertEqual(self.NOW + datetime.timedelta(days=1), task.eta)
@@ -0,0 +1,14 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+from tapir.wirgarten.tests.test_utils import TapirIntegrationTest
+
+
+class TestExplainQueries(TapirIntegrationTest):
+    def test_explainQueries_default_allQueriesCanUseAnIndex(self):
+        out = StringIO()
+
+        call_command("explain_queries", stdout=out)
+
+        self.assertIn("queries can use an index", out.getvalue())
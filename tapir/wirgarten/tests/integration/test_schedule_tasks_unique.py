@@ -0,0 +1,62 @@
+import datetime
+
+from tapir.wirgarten.models import ScheduledTask
+from tapir.wirgarten.service.tasks import schedule_task_unique, schedule_tasks_unique
+from tapir.wirgarten.tests.test_utils import TapirIntegrationTest, mock_timezone
+
+
+def some_task(member_id):
+    pass
+
+
+class TestScheduleTasksUnique(TapirIntegrationTest):
+    NOW = datetime.datetime(2023, 4, 15, 12, 0, tzinfo=datetime.timezone.utc)
+
+    def setUp(self):
+        super().setUp()
+        mock_timezone(self, self.NOW)
+
+    def test_scheduleTasksUnique_differentArguments_createsOneTaskPerCall(self):
+        eta = self.NOW + datetime.timedelta(days=1)
+
+        schedule_tasks_unique(
+            [
+                (some_task, eta, (), {"member_id": "a"}),
+                (some_task, eta, (), {"member_id": "b"}),
+            ]
+        )
+
+        self.assertEqual(2, ScheduledTask.objects.count())
+        self.assertEqual(
+            {"a", "b"},
+            {t.task_kwargs["member_id"] for t in ScheduledTask.objects.all()},
+        )
+
+    def test_scheduleTasksUnique_sameCallInBatch_lastEtaWins(self):
+        eta = self.NOW + datetime.timedelta(days=1)
+        later_eta = self.NOW + datetime.timedelta(days=2)
+
+        schedule_tasks_unique(
+            [
+                (some_task, eta, (), {"member_id": "a"}),
+                (some_task, later_eta, (), {"member_id": "a"}),
+            ]
+        )
+
+        self.assertEqual(1, ScheduledTask.objects.count())
+        self.assertEqual(later_eta, ScheduledTask.objects.get().eta)
+
+    def test_scheduleTaskUnique_taskAlreadyExecuted_taskIsResetToPending(self):
+        schedule_task_unique(some_task, self.NOW, kwargs={"member_id": "a"})
+        ScheduledTask.objects.update(
+            status=ScheduledTask.STATUS_FAILED, retry_count=3, error_message="error"
+        )
+        new_eta = self.NOW + datetime.timedelta(days=7)
+
+        schedule_task_unique(some_task, new_eta, kwargs={"member_id": "a"})
+
+        task = ScheduledTask.objects.get()
+        self.assertEqual(new_eta, task.eta)
+        self.assertEqual(ScheduledTask.STATUS_PENDING, task.status)
+        self.assertEqual(0, task.retry_count)
+        self.assertIsNone(task.error_message)
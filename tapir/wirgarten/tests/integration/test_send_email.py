@@ -0,0 +1,48 @@
+from unittest.mock import patch
+
+from django.core import mail
+
+from tapir.wirgarten.models import EmailOutboxEntry
+from tapir.wirgarten.service.email import (
+    resolve_template_variables,
+    send_email,
+    send_outbox_emails,
+)
+from tapir.wirgarten.tests.factories import MemberFactory
+from tapir.wirgarten.tests.test_utils import TapirIntegrationTest, set_bypass_keycloak
+
+
+class TestSendEmail(TapirIntegrationTest):
+    def setUp(self):
+        super().setUp()
+        set_bypass_keycloak()
+
+    def test_sendEmail_default_emailIsQueuedUntilOutboxIsProcessed(self):
+        member = MemberFactory.create()
+
+        send_email([member.email], "Subject", "Hallo {member.first_name}")
+
+        self.assertEqual(0, len(mail.outbox))
+        entry = EmailOutboxEntry.objects.get()
+        self.assertIn(f"Hallo {member.first_name}", entry.body)
+
+        self.assertEqual(1, send_outbox_emails(limit=10))
+
+        self.assertEqual(1, len(mail.outbox))
+        self.assertEqual([member.email], mail.outbox[0].to)
+        entry.refresh_from_db()
+        self.assertEqual(EmailOutboxEntry.STATUS_SENT, entry.status)
+        self.assertEqual(0, send_outbox_emails(limit=10))
+
+    @patch("tapir.wirgarten.service.email.generate_future_deliveries")
+    def test_resolveTemplateVariables_placeholderNotInContent_isNotComputed(
+        self, mock_generate_future_deliveries
+    ):
+        member = MemberFactory.create()
+
+        variables = resolve_template_variables(
+            "Hallo {member.first_name}, {custom}", [member.email], {"custom": "x"}
+        )
+
+        self.assertEqual({"member": member, "custom": "x"}, variables)
+        mock_generate_future_deliveries.assert_not_called()
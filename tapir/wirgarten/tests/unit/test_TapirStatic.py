@@ -0,0 +1,51 @@
+from unittest.mock import patch
+
+from django.template import Context, Template
+from django.test import override_settings
+
+from tapir.core.storage import TapirStaticFilesStorage, get_static_manifest
+from tapir.wirgarten.tests.test_utils import TapirUnitTest
+
+
+@override_settings(DEBUG=False)
+class TestTapirStatic(TapirUnitTest):
+    def setUp(self):
+        super().setUp()
+        get_static_manifest.cache_clear()
+        self.addCleanup(get_static_manifest.cache_clear)
+        patcher = patch.object(
+            TapirStaticFilesStorage,
+            "load_manifest",
+            return_value={"core/css/base.css": "core/css/base.55e7cbb9ba48.css"},
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def render_static(path: str) -> str:
+        return Template("{% load tapir_static %}{% static path %}").render(
+            Context({"path": path})
+        )
+
+    def test_tapirStatic_pathInManifest_rendersHashedName(self):
+        self.assertEqual(
+            "/static/core/css/base.55e7cbb9ba48.css",
+            self.render_static("core/css/base.css"),
+        )
+
+    def test_tapirStatic_pathNotInManifest_rendersPlainName(self):
+        self.assertEqual(
+            "/static/core/js/missing.js", self.render_static("core/js/missing.js")
+        )
+
+    @override_settings(DEBUG=True)
+    def test_tapirStatic_debug_rendersPlainName(self):
+        self.assertEqual(
+            "/static/core/css/base.css", self.render_static("core/css/base.css")
+        )
+
+    def test_url_pathInManifest_keepsPlainName(self):
+        self.assertEqual(
+            "/static/core/css/base.css",
+            TapirStaticFilesStorage().url("core/css/base.css"),
+        )
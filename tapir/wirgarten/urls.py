@@ -55,6 +55,7 @@ from tapir.wirgarten.views.pickup_location_config import (
     delete_pickup_location,
     get_pickup_location_add_form,
     get_pickup_location_edit_form,
+    get_pickup_location_map_data,
 )
 from tapir.wirgarten.views.product_cfg import (
     ProductCfgView,
@@ -163,6 +164,11 @@ urlpatterns = [
         delete_pickup_location,
         name="pickup_locations_delete",
     ),
+    path(
+        "pickuplocations/mapdata",
+        get_pickup_location_map_data,
+        name="pickup_location_map_data",
+    ),
     path(
         "admin/waitinglist",
         WaitingListView.as_view(),
@@ -1,11 +1,10 @@
-import datetime
 import itertools
 import json
 
 from dateutil.relativedelta import relativedelta
 from django.conf import settings
 from django.contrib.auth.mixins import PermissionRequiredMixin
-from django.db.models import Count, DateField, ExpressionWrapper, F, Max, Sum
+from django.db.models import Count, Max, Sum
 from django.db.models.functions import ExtractYear
 from django.http import JsonResponse
 from django.urls import reverse_lazy
@@ -15,16 +14,21 @@ from django.views.decorators.http import require_GET
 from tapir.configuration.parameter import get_parameter_value
 from tapir.wirgarten.models import (
     CoopShareTransaction,
-    Member,
     Product,
     ProductType,
     QuestionaireCancellationReasonResponse,
-    QuestionaireTrafficSourceOption,
-    QuestionaireTrafficSourceResponse,
     Subscription,
     WaitingListEntry,
 )
 from tapir.wirgarten.parameters import Parameter
+from tapir.wirgarten.service.dashboard_statistics import (
+    KEY_CANCELLED_IN_TRIAL,
+    KEY_NEW_SUBSCRIPTIONS,
+    count_members_with_coop_shares,
+    get_cached_dashboard_context,
+    get_monthly_subscription_statistics,
+    get_monthly_traffic_source_statistics,
+)
 from tapir.wirgarten.service.member import get_next_contract_start_date
 from tapir.wirgarten.service.payment import (
     get_next_payment_date,
@@ -41,6 +45,7 @@ from tapir.wirgarten.service.products import (
     get_product_price,
     get_free_product_capacity,
 )
+from tapir.wirgarten.service.solidarity import get_solidarity_ledger_by_growing_period
 from tapir.wirgarten.utils import format_currency, format_date, get_today
 
 
@@ -69,6 +74,11 @@ class AdminDashboardView(PermissionRequiredMixin, generic.TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        context.update(get_cached_dashboard_context(self.build_dashboard_context))
+        return context
+
+    def build_dashboard_context(self):
+        context = {}
 
         current_growing_period = get_current_growing_period()
         if not current_growing_period:
@@ -102,9 +112,7 @@ class AdminDashboardView(PermissionRequiredMixin, generic.TemplateView):
         self.add_cancellation_reasons_chart_context(context)
         self.add_cancelled_coop_shares_context(context)
 
-        context["active_members"] = len(
-            list(filter(lambda x: x.coop_shares_quantity > 0, Member.objects.all()))
-        )
+        context["active_members"] = count_members_with_coop_shares()
         context["coop_shares_value"] = format_currency(
             (
                 CoopShareTransaction.objects.filter(
@@ -117,9 +125,9 @@ class AdminDashboardView(PermissionRequiredMixin, generic.TemplateView):
             * settings.COOP_SHARE_PRICE
         ).replace(",00", "")
 
-        context["cancellations_during_trial"] = len(
-            Subscription.objects.filter(cancellation_ts__isnull=False)
-        )
+        context["cancellations_during_trial"] = Subscription.objects.filter(
+            cancellation_ts__isnull=False
+        ).count()
 
         waiting_list_counts = {
             r["type"]: r["count"]
@@ -138,6 +146,9 @@ class AdminDashboardView(PermissionRequiredMixin, generic.TemplateView):
         context["solidarity_overplus"] = (
             get_automatically_calculated_solidarity_excess()
         )
+        context["solidarity_by_growing_period"] = (
+            get_solidarity_ledger_by_growing_period()
+        )
         context["status_seperate_coop_shares"] = get_parameter_value(
             Parameter.COOP_SHARES_INDEPENDENT_FROM_HARVEST_SHARES
         )
@@ -208,36 +219,22 @@ class AdminDashboardView(PermissionRequiredMixin, generic.TemplateView):
             get_today() + relativedelta(day=1, months=-i + 1) for i in range(13)
         ][::-1]
 
+        statistics = get_monthly_subscription_statistics(month_labels)
         cancellations_data = [
-            {"label": "Probeverträge", "data": [0] * 13},
-            {"label": "Gekündigte Verträge", "data": [0] * 13},
+            {
+                "label": "Probeverträge",
+                "data": [
+                    statistics[month][KEY_NEW_SUBSCRIPTIONS] for month in month_labels
+                ],
+            },
+            {
+                "label": "Gekündigte Verträge",
+                "data": [
+                    statistics[month][KEY_CANCELLED_IN_TRIAL] for month in month_labels
+                ],
+            },
         ]
 
-        for index, month in enumerate(month_labels):
-            start_of_month = month
-
-            # Calculate the total number of subscriptions in trial - cancelled for this month
-            trial_cancelled_count = (
-                Subscription.objects.filter(start_date=start_of_month)
-                .exclude(cancellation_ts=None)
-                .annotate(
-                    trial_end_date=ExpressionWrapper(
-                        F("start_date") + datetime.timedelta(days=30),
-                        output_field=DateField(),
-                    )
-                )
-                .filter(cancellation_ts__lte=F("trial_end_date"))
-                .count()
-            )
-
-            # Calculate the total number of new subscriptions for this month
-            total_count = Subscription.objects.filter(
-                start_date=start_of_month,
-            ).count()
-
-            cancellations_data[0]["data"][index] = total_count
-            cancellations_data[1]["data"][index] = trial_cancelled_count
-
         # Format the month values
         cancellations_labels = [month.strftime("%m/%y") for month in month_labels]
 
@@ -331,50 +328,10 @@ class AdminDashboardView(PermissionRequiredMixin, generic.TemplateView):
             get_today() + relativedelta(day=1, months=-i) for i in range(13)
         ][::-1]
 
-        # Create an additional queryset for "No Response"
-        no_response = QuestionaireTrafficSourceOption(name="Keine Angabe")
-
-        # Combine actual options and "No Response"
-        options = list(QuestionaireTrafficSourceOption.objects.all()) + [no_response]
-
-        output = []
-
-        for option in options:
-            option_data = {
-                "label": option.name,
-                "data": [0]
-                * 13,  # Initialize data with zeros for each of the 13 months
-            }
-
-            for index, month in enumerate(month_labels):
-                if option != no_response:
-                    response_count = (
-                        QuestionaireTrafficSourceResponse.objects.filter(
-                            sources=option,
-                            timestamp__month=month.month,
-                            timestamp__year=month.year,
-                        )
-                        .distinct()
-                        .count()
-                    )
-                else:
-                    response_count = (
-                        Member.objects.filter(
-                            created_at__month=month.month, created_at__year=month.year
-                        )
-                        .exclude(
-                            id__in=QuestionaireTrafficSourceResponse.objects.filter(
-                                timestamp__month=month.month, timestamp__year=month.year
-                            )
-                            .distinct()
-                            .values_list("member_id", flat=True)
-                        )
-                        .count()
-                    )
-
-                option_data["data"][index] = response_count
-
-            output.append(option_data)
+        output = [
+            {"label": label, "data": counts}
+            for label, counts in get_monthly_traffic_source_statistics(month_labels)
+        ]
 
         # Calculate the total responses per month
         total_responses_per_month = [
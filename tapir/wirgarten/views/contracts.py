@@ -5,7 +5,7 @@ from dateutil.relativedelta import relativedelta
 from django.contrib.auth.decorators import permission_required
 from django.contrib.auth.mixins import PermissionRequiredMixin
 from django.db import transaction
-from django.db.models import OuterRef, Subquery, Sum
+from django.db.models import Sum
 from django.forms import CheckboxInput
 from django.http import HttpResponse, HttpResponseRedirect
 from django.urls import reverse_lazy
@@ -21,13 +21,14 @@ from tapir.wirgarten.models import (
     CoopShareTransaction,
     GrowingPeriod,
     Member,
-    MemberPickupLocation,
     PickupLocation,
     Product,
     ProductType,
     Subscription,
 )
 from tapir.wirgarten.parameters import Parameter
+from tapir.wirgarten.service.delivery import get_member_ids_at_pickup_location
+from tapir.wirgarten.service.member_page_cache import bump_member_versions
 from tapir.wirgarten.service.products import product_type_order_by
 from tapir.wirgarten.utils import format_date, get_now, get_today
 from tapir.wirgarten.views.filters import SecondaryOrderingFilter
@@ -82,12 +83,19 @@ def confirm_new_contracts(request, **kwargs):
     subscription_ids = harvest_and_coop_shares + additional_shares
     now = get_now()
     if len(subscription_ids):
-        Subscription.objects.filter(id__in=subscription_ids).update(admin_confirmed=now)
+        subscriptions = Subscription.objects.filter(id__in=subscription_ids)
+        subscriptions.update(admin_confirmed=now)
+        # queryset updates send no signals
+        bump_member_versions(subscriptions.values_list("member_id", flat=True))
 
     coop_shares = query_dict.pop("new_coop_shares", [])
     if len(coop_shares):
-        CoopShareTransaction.objects.filter(id__in=coop_shares).update(
-            admin_confirmed=now
+        coop_share_transactions = CoopShareTransaction.objects.filter(
+            id__in=coop_shares
+        )
+        coop_share_transactions.update(admin_confirmed=now)
+        bump_member_versions(
+            coop_share_transactions.values_list("member_id", flat=True)
         )
 
     return HttpResponseRedirect(reverse_lazy("wirgarten:new_contracts"))
@@ -152,20 +160,8 @@ class SubscriptionListFilter(FilterSet):
 
     def filter_pickup_location(self, queryset, name, value):
         if value:
-            # Subquery to get the latest MemberPickupLocation id for each Member
-            latest_pickup_location_subquery = Subquery(
-                MemberPickupLocation.objects.filter(
-                    member_id=OuterRef("member_id"),  # references Member.id
-                    valid_from__lte=get_today(),
-                )
-                .order_by("-valid_from")[:1]
-                .values("id")
-            )
-
-            # Filter queryset where MemberPickupLocation.id is in the subquery result and the pickup_location matches the value
             return queryset.filter(
-                member__memberpickuplocation__id=latest_pickup_location_subquery,
-                member__memberpickuplocation__pickup_location_id=value,
+                member_id__in=get_member_ids_at_pickup_location(value)
             )
         else:
             return queryset.all()
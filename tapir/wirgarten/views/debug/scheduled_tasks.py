@@ -39,6 +39,7 @@ class ScheduledTasksListView(
                 "args": t.task_args,
                 "kwargs": t.task_kwargs,
                 "status": t.status,
+                "retry_count": t.retry_count,
                 "created_at": t.created_at,
                 "updated_at": t.updated_at,
             }
@@ -23,6 +23,10 @@ from tapir.wirgarten.models import (
 from tapir.wirgarten.parameters import Parameter
 from tapir.wirgarten.service.email import send_email
 from tapir.wirgarten.service.member import send_order_confirmation
+from tapir.wirgarten.service.member_financial_summary import (
+    refresh_member_financial_summary_on_commit,
+)
+from tapir.wirgarten.service.member_page_cache import bump_member_version
 from tapir.wirgarten.service.products import (
     get_active_subscriptions,
     get_available_product_types,
@@ -115,6 +119,9 @@ def renew_contract_same_conditions(request, **kwargs):
             )
 
     Subscription.objects.bulk_create(new_subs)
+    # bulk_create sends no signals
+    refresh_member_financial_summary_on_commit(member_id)
+    bump_member_version(member_id)
 
     member = Member.objects.get(id=member_id)
     member.sepa_consent = get_now()
@@ -14,15 +14,15 @@ from tapir.wirgarten.models import (
     WaitingListEntry,
 )
 from tapir.wirgarten.parameters import Parameter
-from tapir.wirgarten.service.delivery import generate_future_deliveries
 from tapir.wirgarten.service.member import (
     get_next_contract_start_date,
     get_subscriptions_in_trial_period,
 )
+from tapir.wirgarten.service.member_page_cache import get_member_fragment
 from tapir.wirgarten.service.payment import (
     get_active_subscriptions_grouped_by_product_type,
-    get_next_payment_date,
 )
+from tapir.wirgarten.service.payment_timeline import get_next_payment
 from tapir.wirgarten.service.products import (
     get_active_product_types,
     get_active_subscriptions,
@@ -31,14 +31,18 @@ from tapir.wirgarten.service.products import (
     get_next_growing_period,
 )
 from tapir.wirgarten.utils import format_date, get_today
-from tapir.wirgarten.views.member.list.member_payments import (
-    generate_future_payments,
-    get_previous_payments,
+from tapir.wirgarten.views.member.list.member_deliveries import (
+    get_future_deliveries_fragment,
+)
+from tapir.wirgarten.views.mixin import (
+    MemberPageConditionalGetMixin,
+    PermissionOrSelfRequiredMixin,
 )
-from tapir.wirgarten.views.mixin import PermissionOrSelfRequiredMixin
 
 
-class MemberDetailView(PermissionOrSelfRequiredMixin, generic.DetailView):
+class MemberDetailView(
+    PermissionOrSelfRequiredMixin, MemberPageConditionalGetMixin, generic.DetailView
+):
     model = Member
     template_name = "wirgarten/member/member_detail.html"
     permission_required = Permission.Accounts.VIEW
@@ -108,32 +112,21 @@ class MemberDetailView(PermissionOrSelfRequiredMixin, generic.DetailView):
             )
             for p in get_available_product_types(reference_date=next_month)
         }
-        context["deliveries"] = generate_future_deliveries(self.object)
-
-        # FIXME: it should be easier than this to get the next payments, refactor to service somehow
-        next_due_date = get_next_payment_date()
-
-        persisted_payments = get_previous_payments(self.object.pk)
-        next_payments = persisted_payments.get(next_due_date, [])
+        context["deliveries"] = get_future_deliveries_fragment(self.object)
 
-        projected = generate_future_payments(self.object.id, 2)
-        if len(projected) > 0:
-            projected = projected.get(next_due_date, [])
-            for p in projected:
-                if p["type"] not in [n["type"] for n in next_payments]:
-                    next_payments.append(p)
-
-        context["next_payment"] = (
-            {
-                "due_date": next_due_date,
-                "amount": sum([p["amount"] for p in next_payments]),
-                "mandate_ref": next_payments[0]["mandate_ref"],
-            }
-            if next_payments
-            else None
+        context["next_payment"] = get_member_fragment(
+            self.object.id, "next_payment", lambda: get_next_payment(self.object.id)
         )
 
-        self.add_renewal_notice_context(context, next_month, today)
+        context.update(
+            get_member_fragment(
+                self.object.id,
+                "renewal_notice",
+                lambda: self.get_renewal_notice_context(
+                    context["subscriptions"], next_month, today
+                ),
+            )
+        )
 
         subs_in_trial = get_subscriptions_in_trial_period(self.object.id)
         context["subscriptions_in_trial"] = []
@@ -172,6 +165,12 @@ class MemberDetailView(PermissionOrSelfRequiredMixin, generic.DetailView):
 
         return context
 
+    def get_renewal_notice_context(self, subscriptions, next_month, today):
+        renewal_notice_context = {"subscriptions": subscriptions}
+        self.add_renewal_notice_context(renewal_notice_context, next_month, today)
+        del renewal_notice_context["subscriptions"]
+        return renewal_notice_context
+
     def add_renewal_notice_context(self, context, next_month, today):
         """
         Renewal notice:
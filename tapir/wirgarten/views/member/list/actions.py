@@ -239,7 +239,7 @@ class ExportMembersView(View):
                     format_date(member.coop_entry_date),
                     format_currency(member.coop_shares_total_value),
                     format_currency(member.monthly_payment),
-                    member.pickup_location.name if member.pickup_location else "",
+                    member.pickup_location_name or "",
                 ]
             )
 
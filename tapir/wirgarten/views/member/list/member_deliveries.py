@@ -1,29 +1,63 @@
 from tapir.wirgarten.constants import Permission
-from tapir.wirgarten.models import Deliveries, Member, Subscription
+from tapir.wirgarten.models import Deliveries, Member
 from tapir.wirgarten.service.delivery import generate_future_deliveries
-from tapir.wirgarten.views.mixin import PermissionOrSelfRequiredMixin
+from tapir.wirgarten.service.member_page_cache import get_member_fragment
+from tapir.wirgarten.utils import get_today
+from tapir.wirgarten.views.mixin import (
+    MemberPageConditionalGetMixin,
+    PermissionOrSelfRequiredMixin,
+)
 from django.views import generic
 
 
 def get_previous_deliveries(member: Member):
-    return list(
-        map(
-            lambda x: {
-                "pickup_location": x.pickup_location,
-                "delivery_date": x.delivery_date,
-                "subs": Subscription.objects.filter(
-                    member=x.member,
-                    start_date__lte=x.due_date,
-                    end_date__gt=x.due_date,
-                ),
-            },
-            Deliveries.objects.filter(member=member),
+    return [
+        {
+            "pickup_location": delivery.pickup_location,
+            "delivery_date": delivery.delivery_date.isoformat(),
+            # same structure as the subscriptions of the future deliveries, so that the same template can be used
+            "subs": [
+                {
+                    "quantity": product["quantity"],
+                    "product": {
+                        "name": product["product_name"],
+                        "type": {"name": product["product_type_name"]},
+                    },
+                }
+                for product in delivery.products
+            ],
+        }
+        for delivery in Deliveries.objects.filter(
+            member=member, delivery_date__lt=get_today()
         )
-    )
+        .select_related("pickup_location")
+        .order_by("delivery_date")
+    ]
+
+
+def get_future_deliveries_fragment(member: Member):
+    """
+    generate_future_deliveries from the member page cache. Lazy querysets and iterators are evaluated, so that the result can be cached.
+    """
+
+    def build():
+        return [
+            {
+                **delivery,
+                "subs": list(delivery["subs"].select_related("product__type")),
+                "opening_times": list(delivery["opening_times"]),
+            }
+            for delivery in generate_future_deliveries(member)
+        ]
+
+    return get_member_fragment(member.id, "future_deliveries", build)
 
 
 class MemberDeliveriesView(
-    PermissionOrSelfRequiredMixin, generic.TemplateView, generic.base.ContextMixin
+    PermissionOrSelfRequiredMixin,
+    MemberPageConditionalGetMixin,
+    generic.TemplateView,
+    generic.base.ContextMixin,
 ):
     template_name = "wirgarten/member/member_deliveries.html"
     permission_required = Permission.Accounts.VIEW
@@ -35,8 +69,8 @@ class MemberDeliveriesView(
         member = Member.objects.get(pk=member_id)
 
         context["member"] = member
-        context["deliveries"] = get_previous_deliveries(
-            member
-        ) + generate_future_deliveries(member)
+        context["deliveries"] = get_member_fragment(
+            member.id, "previous_deliveries", lambda: get_previous_deliveries(member)
+        ) + get_future_deliveries_fragment(member)
 
         return context
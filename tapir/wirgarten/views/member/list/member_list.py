@@ -5,7 +5,7 @@ from urllib.parse import parse_qs, urlencode
 from dateutil.relativedelta import relativedelta
 from django.contrib.auth.mixins import PermissionRequiredMixin
 from django.db import models
-from django.db.models import Case, ExpressionWrapper, F, OuterRef, Subquery, Sum, When
+from django.db.models import ExpressionWrapper, F
 from django.db.models.functions import Coalesce, TruncMonth
 from django.forms import CheckboxInput
 from django.forms.widgets import Select
@@ -21,12 +21,10 @@ from django_filters.views import FilterView
 
 from tapir.wirgarten.constants import Permission
 from tapir.wirgarten.models import (
-    CoopShareTransaction,
     Member,
-    MemberPickupLocation,
     PickupLocation,
-    Subscription,
 )
+from tapir.wirgarten.service.delivery import get_member_ids_at_pickup_location
 from tapir.wirgarten.service.products import get_next_growing_period
 from tapir.wirgarten.utils import get_today
 from tapir.wirgarten.views.filters import MultiFieldFilter
@@ -153,22 +151,7 @@ class MemberFilter(FilterSet):
 
     def filter_pickup_location(self, queryset, name, value):
         if value:
-            # Subquery to get the latest MemberPickupLocation id for each Member
-            today = get_today()
-            latest_pickup_location_subquery = Subquery(
-                MemberPickupLocation.objects.filter(
-                    member_id=OuterRef("id"),  # references Member.id
-                    valid_from__lte=today,
-                )
-                .order_by("-valid_from")[:1]
-                .values("id")
-            )
-
-            # Filter queryset where MemberPickupLocation.id is in the subquery result and the pickup_location matches the value
-            return queryset.filter(
-                memberpickuplocation__id=latest_pickup_location_subquery,
-                memberpickuplocation__pickup_location_id=value,
-            )
+            return queryset.filter(id__in=get_member_ids_at_pickup_location(value))
         else:
             return queryset.all()
 
@@ -219,58 +202,13 @@ class MemberListView(PermissionRequiredMixin, FilterView):
         return context
 
     def get_queryset(self):
-        today = get_today()
-        overnext_month = today + relativedelta(months=2)
-
+        # the figures are precalculated in MemberFinancialSummary, see service/member_financial_summary.py
         return Member.objects.annotate(
             coop_shares_total_value=Coalesce(
-                Subquery(
-                    CoopShareTransaction.objects.filter(
-                        member_id=OuterRef("id"),
-                        valid_at__lte=overnext_month,
-                        # I do this to include new members in the list, which will join the coop soon
-                    )
-                    .values("member_id")
-                    .annotate(total_value=Sum(F("quantity") * F("share_price")))
-                    .values("total_value"),
-                    output_field=models.DecimalField(),
-                ),
-                Decimal(0.0),
+                F("financial_summary__coop_shares_total_value"), Decimal(0)
             ),
-            monthly_payment=Subquery(
-                Subscription.objects.filter(
-                    member_id=OuterRef("id"),
-                    start_date__lte=today,
-                    end_date__gte=today,
-                    product__productprice__valid_from__lte=today,
-                )
-                .annotate(
-                    monthly_payment=ExpressionWrapper(
-                        Case(
-                            When(
-                                solidarity_price_absolute__isnull=True,
-                                then=(
-                                    F("product__productprice__price")
-                                    * F("quantity")
-                                    * (1 + F("solidarity_price"))
-                                ),
-                            ),
-                            When(
-                                solidarity_price_absolute__isnull=False,
-                                then=(
-                                    (F("product__productprice__price") * F("quantity"))
-                                    + F("solidarity_price_absolute")
-                                ),
-                            ),
-                            default=0.0,
-                            output_field=models.FloatField(),
-                        ),
-                        output_field=models.FloatField(),
-                    )
-                )
-                .values("member_id")
-                .annotate(total=Sum("monthly_payment"))
-                .values("total"),
-                output_field=models.FloatField(),
+            monthly_payment=Coalesce(
+                F("financial_summary__monthly_payment"), Decimal(0)
             ),
+            pickup_location_name=F("financial_summary__pickup_location__name"),
         )
@@ -1,4 +1,15 @@
+from django.conf import settings
+from django.contrib import messages
 from django.contrib.auth.mixins import PermissionRequiredMixin
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+    quote_etag,
+)
+from django.utils.http import http_date
+
+from tapir.wirgarten.service.member_page_cache import get_member_page_version
 
 
 class PermissionOrSelfRequiredMixin(PermissionRequiredMixin):
@@ -17,3 +28,41 @@ class PermissionOrSelfRequiredMixin(PermissionRequiredMixin):
 
     def get_user_pk(self):
         return self.kwargs["pk"]
+
+
+class MemberPageConditionalGetMixin:
+    """
+    Mixin for pages that only show the data of one member. Sends ETag and Last-Modified headers based on the
+    member page version (see tapir.wirgarten.service.member_page_cache) and answers 304 Not Modified if the
+    browser already has the current page. Must come after the permission mixins, so that they run first.
+
+    Pages with pending flash messages are always rendered and not cached, otherwise the browser would show the
+    messages again on a later 304.
+    """
+
+    def get_member_pk(self):
+        return self.kwargs["pk"]
+
+    def get(self, request, *args, **kwargs):
+        if messages.get_messages(request):
+            response = super().get(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        version, last_modified = get_member_page_version(self.get_member_pk())
+        # the page looks different for admins and for the member itself,
+        # and the forms on it contain the CSRF token of the browser
+        csrf_token = request.COOKIES.get(settings.CSRF_COOKIE_NAME, "")
+        etag = quote_etag(f"{request.user.pk}-{version}-{csrf_token}")
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ("Cookie",))
+        return response
@@ -1,23 +1,34 @@
+import json
+from datetime import date
+
 from django.contrib.auth.decorators import permission_required
 from django.contrib.auth.mixins import PermissionRequiredMixin
-from django.http import HttpResponseRedirect, HttpResponse
-from django.urls import reverse_lazy
+from django.http import HttpResponseBadRequest, HttpResponseRedirect, HttpResponse
+from django.urls import reverse, reverse_lazy
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from django.views import generic
 from django.views.decorators.csrf import csrf_protect
 from django.views.decorators.http import require_http_methods
 
 from tapir.wirgarten.constants import Permission
 from tapir.wirgarten.forms.pickup_location import (
-    get_pickup_locations_map_data,
-    pickup_location_to_dict,
+    build_pickup_locations_map_data,
     PickupLocationEditForm,
 )
 from tapir.wirgarten.models import PickupLocation, PickupLocationCapability
-from tapir.wirgarten.service.delivery import get_active_pickup_location_capabilities
+from tapir.wirgarten.service.member import get_next_contract_start_date
+from tapir.wirgarten.service.pickup_location_map import (
+    get_cached_pickup_location_map_data,
+    get_pickup_location_map_version,
+)
 from tapir.wirgarten.service.products import get_active_product_types
+from tapir.wirgarten.utils import get_today
 from tapir.wirgarten.views.modal import get_form_modal
 
 PAGE_ROOT = reverse_lazy("wirgarten:pickup_locations")
+# browsers may reuse the map data for a minute without asking again, the occupancy doesn't need to be more recent
+MAP_DATA_MAX_AGE = 60
 
 
 class PickupLocationCfgView(PermissionRequiredMixin, generic.TemplateView):
@@ -30,26 +41,62 @@ class PickupLocationCfgView(PermissionRequiredMixin, generic.TemplateView):
 
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(*args, **kwargs)
-        pickup_locations = list(PickupLocation.objects.all().order_by("name"))
-        capabilities = get_active_pickup_location_capabilities().values(
-            "pickup_location_id",
-            "product_type_id",
-            "max_capacity",
-            "product_type__name",
-            "product_type__icon_link",
-        )
-        context["data"] = get_pickup_locations_map_data(
-            pickup_locations=pickup_locations,
-            location_capabilities=capabilities,
+        # the table shows the same data as the map, both come from the cache
+        map_data = json.loads(
+            get_cached_pickup_location_map_data(
+                get_today(), build_pickup_locations_map_data
+            )
         )
+        context["data_url"] = reverse("wirgarten:pickup_location_map_data")
         context["all_product_types"] = get_active_product_types().values("name")
-        context["pickup_locations"] = list(
-            map(lambda x: pickup_location_to_dict(capabilities, x), pickup_locations)
-        )
+        context["pickup_locations"] = [
+            map_data[pickup_location_id]
+            for pickup_location_id in PickupLocation.objects.order_by(
+                "name"
+            ).values_list("id", flat=True)
+            if pickup_location_id in map_data
+        ]
 
         return context
 
 
+@require_http_methods(["GET"])
+def get_pickup_location_map_data(request):
+    """
+    Returns the map data of all pickup locations as JSON. Not restricted: the registration wizard shows the map before login.
+    The optional query parameter reference_date (YYYY-MM-DD) selects the date for which the capabilities are shown, default today.
+    Only today and the next contract start date are accepted, so that the cache can not be filled with arbitrary dates.
+    """
+    today = get_today()
+    try:
+        reference_date = (
+            date.fromisoformat(request.GET["reference_date"])
+            if "reference_date" in request.GET
+            else today
+        )
+    except ValueError:
+        return HttpResponseBadRequest("Invalid reference_date")
+    if reference_date not in (today, get_next_contract_start_date(today)):
+        return HttpResponseBadRequest("Invalid reference_date")
+
+    # no Last-Modified: it would be the same for all reference dates
+    etag = quote_etag(
+        f"{get_pickup_location_map_version()}-{reference_date.isoformat()}"
+    )
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(
+            get_cached_pickup_location_map_data(
+                reference_date, build_pickup_locations_map_data
+            ),
+            content_type="application/json",
+        )
+
+    response["ETag"] = etag
+    patch_cache_control(response, public=True, max_age=MAP_DATA_MAX_AGE)
+    return response
+
+
 @require_http_methods(["GET", "POST"])
 @permission_required(Permission.Coop.MANAGE)
 @csrf_protect
@@ -80,7 +127,7 @@ def get_pickup_location_edit_form(request, **kwargs):
         form=PickupLocationEditForm,
         handler=lambda x: x.save(),
         redirect_url_resolver=lambda x: PAGE_ROOT + "?selected=" + x.id,
-        **kwargs
+        **kwargs,
     )
 
 
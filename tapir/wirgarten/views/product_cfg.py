@@ -1,6 +1,7 @@
 import itertools
 import json
 import re
+from collections import defaultdict
 
 from django.http import HttpResponseRedirect
 from django.urls import reverse_lazy
@@ -22,11 +23,9 @@ from tapir.wirgarten.models import (
     ProductCapacity,
     GrowingPeriod,
     TaxRate,
-    ProductPrice,
 )
 from tapir.wirgarten.service.products import (
     create_product_type_capacity,
-    get_product_price,
     update_product_type_capacity,
     delete_product_type_capacity,
     create_product,
@@ -35,6 +34,7 @@ from tapir.wirgarten.service.products import (
     copy_growing_period,
     create_growing_period,
     update_product,
+    ProductPriceLookup,
 )
 from tapir.wirgarten.utils import get_today
 from tapir.wirgarten.views.modal import get_form_modal
@@ -76,34 +76,34 @@ class ProductCfgView(PermissionRequiredMixin, generic.TemplateView):
             )
         )
 
+        today = get_today()
+        all_products = list(Product.objects.all().order_by("type"))
+        price_lookup = ProductPriceLookup([product.id for product in all_products])
+
         product_prices = {
-            k: list(
-                map(
-                    lambda price: {
-                        "valid_from": price.valid_from,
-                        "price": price.price,
-                    },
-                    list(v)[:2],
-                )
-            )
-            for k, v in itertools.groupby(
-                ProductPrice.objects.all().order_by("product__id", "-valid_from"),
-                lambda pp: pp.product.id,
-            )
+            product_id: [
+                {"valid_from": price.valid_from, "price": price.price}
+                for price in prices[:2]
+            ]
+            for product_id, prices in price_lookup.prices_by_product.items()
         }
 
-        def map_product(product):
-            try:
-                base_product = Product.objects.get(type_id=product.type_id, base=True)
-                base_share_value = get_product_price(base_product).price
-            except Product.DoesNotExist:
-                base_share_value = None
+        base_share_values = {}
+        for product in all_products:
+            if not product.base:
+                continue
+            product_price = price_lookup.get_product_price(product.id, today)
+            base_share_values[product.type_id] = (
+                product_price.price if product_price is not None else None
+            )
 
+        def map_product(product):
+            base_share_value = base_share_values.get(product.type_id)
             price = product_prices.get(product.id, [])
             return {
                 "id": product.id,
                 "name": product.name,
-                "type_id": product.type.id,
+                "type_id": product.type_id,
                 "price": price,
                 "share": (
                     round(price[-1]["price"] / base_share_value, 2)
@@ -116,45 +116,37 @@ class ProductCfgView(PermissionRequiredMixin, generic.TemplateView):
 
         # all products
         context["products"] = sorted(
-            list(
-                map(
-                    map_product,
-                    Product.objects.all().order_by("type"),
-                )
-            ),
+            map(map_product, all_products),
             key=lambda p: p["price"][0]["price"],
         )
+        products_by_type = defaultdict(list)
+        for product in context["products"]:
+            products_by_type[product["type_id"]].append(product)
 
         # growing_periods->product_types
         context["capacities"] = list(
-            ProductCapacity.objects.all().order_by("period", "product_type__name")
+            ProductCapacity.objects.select_related("period", "product_type").order_by(
+                "period", "product_type__name"
+            )
         )
 
         context["pe_c_map"] = json.dumps(
             {
                 k: list(map(lambda c: c.id, v))
                 for k, v in itertools.groupby(
-                    context["capacities"], lambda capacity: capacity.period.id
+                    context["capacities"], lambda capacity: capacity.period_id
                 )
             }
         )
         c_p_map = {
-            capacity.id: list(
-                map(
-                    lambda x: x["id"],
-                    filter(
-                        lambda p: p["type_id"] == capacity.product_type.id
-                        and any(
-                            map(
-                                lambda ppi: ppi["valid_from"]
-                                < capacity.period.end_date,
-                                p["price"],
-                            )
-                        ),
-                        context["products"],
-                    ),
+            capacity.id: [
+                product["id"]
+                for product in products_by_type.get(capacity.product_type_id, [])
+                if any(
+                    price["valid_from"] < capacity.period.end_date
+                    for price in product["price"]
                 )
-            )
+            ]
             for capacity in context["capacities"]
         }
         context["c_p_map"] = json.dumps(c_p_map)
@@ -165,7 +157,7 @@ class ProductCfgView(PermissionRequiredMixin, generic.TemplateView):
                 TaxRate.objects.filter(
                     valid_to=None, product_type__in=ProductType.objects.all()
                 ),
-                lambda t: t.product_type.id,
+                lambda t: t.product_type_id,
             )
         }
 